@@ -1,2 +1,2 @@
-python3.12 src/main.py
+python3.12 src/main.py "$@"
 cd public && python3.12 -m http.server 8888
\ No newline at end of file
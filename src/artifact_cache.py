@@ -0,0 +1,209 @@
+#!/usr/bin/python3.12
+
+"""A content-addressed cache of rendered pages, shareable between machines.
+
+Pages are stored under the sha256 of everything their html depends on: the
+markdown source, the template, the render options and the generator's own
+code (see `generator_version()`). The store is either a directory, which
+may be shared, or an HTTP server answering `GET` and `PUT` on
+`<url>/<key>`, such as artifact_server.py. Every entry carries a digest of
+its key and payload which is checked when it is fetched. A missing,
+unreachable or corrupt store never fails a build: its pages are rendered.
+"""
+
+
+import functools
+import hashlib
+import http.client
+import os
+import sys
+import tempfile
+from typing import Optional
+import urllib.error
+import urllib.request
+
+from config import BuildOptions
+from markdown_to_html import syntax_names
+from sources import SourceTree, open_source, read_file
+
+
+_MAGIC: bytes = b"SSGART1"
+_DIGEST_SIZE: int = hashlib.sha256().digest_size
+# the errors of a store which is missing, unreachable or cut off mid-response
+_STORE_ERRORS: tuple[type[Exception], ...] = (OSError, ValueError, http.client.HTTPException)
+
+
+class CorruptArtifact(Exception):
+    pass
+
+
+class ArtifactStore:
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def put(self, key: str, entry: bytes) -> None:
+        raise NotImplementedError
+
+
+class DirectoryStore(ArtifactStore):
+    def __init__(self, root: str) -> None:
+        self.root: str = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, entry: bytes) -> None:
+        path: str = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # renamed into place, so other builds sharing the store never read half an entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(entry)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+class HTTPStore(ArtifactStore):
+    def __init__(self, url: str, timeout: float = 10) -> None:
+        self.url: str = url.rstrip("/")
+        self.timeout: float = timeout
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with urllib.request.urlopen(f"{self.url}/{key}", timeout=self.timeout) as r:
+                return r.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    def put(self, key: str, entry: bytes) -> None:
+        request = urllib.request.Request(f"{self.url}/{key}", data=entry, method="PUT")
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def open_store(location: str) -> ArtifactStore:
+    if location.startswith(("http://", "https://")):
+        return HTTPStore(location)
+    return DirectoryStore(location)
+
+
+def pack(key: str, payload: bytes) -> bytes:
+    digest: bytes = hashlib.sha256(key.encode() + payload).digest()
+    return _MAGIC + digest + payload
+
+
+def unpack(key: str, entry: bytes) -> bytes:
+    header: int = len(_MAGIC) + _DIGEST_SIZE
+    if not entry.startswith(_MAGIC) or len(entry) < header:
+        raise CorruptArtifact(f"Artifact {key} is not a cache entry")
+    payload: bytes = entry[header:]
+    if hashlib.sha256(key.encode() + payload).digest() != entry[len(_MAGIC) : header]:
+        raise CorruptArtifact(f"Artifact {key} does not match its digest")
+    return payload
+
+
+class ArtifactCache:
+    """Fetches and stores pages, disabling the store after its first failure."""
+
+    def __init__(self, store: ArtifactStore) -> None:
+        self.store: ArtifactStore = store
+        self.broken: bool = False
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def _fail(self, error: Exception) -> None:
+        print(f"Artifact cache disabled for this build: {error}", file=sys.stderr)
+        self.broken = True
+
+    def fetch(self, key: str) -> Optional[bytes]:
+        if self.broken:
+            return None
+        try:
+            entry: Optional[bytes] = self.store.get(key)
+            payload: Optional[bytes] = None if entry is None else unpack(key, entry)
+        except CorruptArtifact as e:
+            # a single bad entry is rendered again, and overwritten
+            print(e, file=sys.stderr)
+            payload = None
+        except _STORE_ERRORS as e:
+            self._fail(e)
+            payload = None
+
+        if payload is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return payload
+
+    def save(self, key: str, payload: bytes) -> None:
+        if self.broken:
+            return
+        try:
+            self.store.put(key, pack(key, payload))
+        except _STORE_ERRORS as e:
+            self._fail(e)
+
+
+@functools.cache
+def generator_version() -> str:
+    """Returns a digest of the generator's code, so any change to it is a new version."""
+    sha = hashlib.sha256()
+    directory: str = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py") and not name.startswith("test_"):
+            with open(os.path.join(directory, name), "rb") as f:
+                sha.update(name.encode() + b"\0" + f.read())
+    return sha.hexdigest()
+
+
+def render_digest(template_html: str, options: BuildOptions) -> str:
+    """Digests everything except its markdown that a page's html depends on.
+
+    Unlike `repr(options)`, this leaves out local paths, so machines with
+    different checkouts of the same site share their pages.
+    """
+    sha = hashlib.sha256()
+    for part in (
+        generator_version(),
+        template_html,
+        options.critical_css,
+        options.stylesheet_href,
+        options.inline_assets_below,
+        options.split_page_bytes,
+        options.split_page_blocks,
+        options.service_worker,
+        syntax_names(),
+    ):
+        sha.update(repr(part).encode() + b"\0")
+    if options.critical_css:
+        sha.update(read_file(options.stylesheet).encode())
+    if options.inline_assets_below > 0:
+        with open_source(options.assets_dir) as assets:
+            assets: SourceTree
+            # only assets below the threshold can end up inside a page
+            for name in assets.walk():
+                if name.endswith("/"):
+                    continue
+                local: Optional[str] = assets.local_path(name)
+                if local is not None and os.path.getsize(local) >= options.inline_assets_below:
+                    continue
+                data: bytes = assets.read_bytes(name)
+                if len(data) < options.inline_assets_below:
+                    sha.update(name.encode() + b"\0" + hashlib.sha256(data).digest())
+    return sha.hexdigest()
+
+
+def page_key(render_inputs: str, markdown: str) -> str:
+    return hashlib.sha256(f"{render_inputs}\0{markdown}".encode()).hexdigest()
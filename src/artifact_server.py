@@ -0,0 +1,94 @@
+#!/usr/bin/python3.12
+
+"""A minimal HTTP artifact store, answering `GET` and `PUT` on `/<key>`.
+
+A local stand-in for a shared cache server, for tests and trying out
+`--artifact-cache http://...`; it has no authentication.
+"""
+
+
+import argparse
+import http.server
+import os
+import re
+import threading
+from typing import Self
+
+from artifact_cache import DirectoryStore
+
+
+_key: re.Pattern = re.compile(r"^/([0-9a-f]{64})$")
+
+
+class ArtifactRequestHandler(http.server.BaseHTTPRequestHandler):
+    server: "ArtifactServer"
+
+    def _key(self) -> str | None:
+        m: re.Match[str] | None = _key.match(self.path)
+        if m is None:
+            self.send_error(400, "Artifact keys are sha256 hex digests")
+            return None
+        return m.group(1)
+
+    def do_GET(self) -> None:
+        key: str | None = self._key()
+        if key is None:
+            return
+        entry: bytes | None = self.server.store.get(key)
+        if entry is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(entry)))
+        self.end_headers()
+        self.wfile.write(entry)
+
+    def do_PUT(self) -> None:
+        key: str | None = self._key()
+        if key is None:
+            return
+        length: int = int(self.headers.get("Content-Length", 0))
+        self.server.store.put(key, self.rfile.read(length))
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ArtifactServer(http.server.ThreadingHTTPServer):
+    def __init__(
+        self, root: str, address: tuple[str, int] = ("127.0.0.1", 0), verbose: bool = False
+    ) -> None:
+        self.store: DirectoryStore = DirectoryStore(root)
+        self.verbose: bool = verbose
+        super().__init__(address, ArtifactRequestHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> Self:
+        """Serves from a background thread, e.g. within tests."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", help="directory to keep the artifacts in")
+    parser.add_argument("--port", type=int, default=8900)
+    args: argparse.Namespace = parser.parse_args()
+
+    os.makedirs(args.root, exist_ok=True)
+    with ArtifactServer(args.root, ("127.0.0.1", args.port), verbose=True) as server:
+        print(f"Serving artifacts from {args.root} at {server.url}")
+        server.serve_forever()
@@ -0,0 +1,71 @@
+#!/usr/bin/python3.12
+
+"""Functionality to inline small static assets as base64 data URIs."""
+
+
+import base64
+import contextvars
+import mimetypes
+import os
+import posixpath
+from typing import Optional
+from urllib.parse import unquote, urlsplit
+
+from sources import SourceTree, open_source
+
+
+class AssetInliner:
+    """Resolves root-relative asset URLs to data URIs below a size threshold.
+
+    Each URL is resolved at most once, so an asset referenced by every page
+    is only read and encoded the first time it is seen. The static tree may
+    be a directory or an archive, see sources.py.
+    """
+
+    def __init__(self, static_dir: str | os.PathLike, threshold: int) -> None:
+        self.static_dir: str = str(static_dir)
+        self.threshold: int = threshold
+        self._sources: dict[str, str] = {}
+
+    def source(self, url: str) -> str:
+        if url not in self._sources:
+            self._sources[url] = self._encode(url) or url
+        return self._sources[url]
+
+    def _encode(self, url: str) -> Optional[str]:
+        parts = urlsplit(url)
+        if parts.scheme or parts.netloc or not parts.path.startswith("/"):
+            return None
+
+        name: str = posixpath.normpath(unquote(parts.path).lstrip("/"))
+        if name == "." or name == ".." or name.startswith("../"):
+            return None
+        try:
+            with open_source(self.static_dir) as static:
+                static: SourceTree
+                if static.size(name) >= self.threshold:
+                    return None
+                payload: bytes = static.read_bytes(name)
+        except (OSError, KeyError):
+            return None
+
+        mimetype: str = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        return f"data:{mimetype};base64,{base64.b64encode(payload).decode('ascii')}"
+
+
+# per context rather than global, so concurrent builds in threads keep their own
+_inliner: contextvars.ContextVar[Optional[AssetInliner]] = contextvars.ContextVar(
+    "asset_inliner", default=None
+)
+
+
+def configure_asset_inlining(static_dir: str | os.PathLike, threshold: int) -> None:
+    """Starts a new build's asset memo; a threshold of 0 disables inlining."""
+    _inliner.set(AssetInliner(static_dir, threshold) if threshold > 0 else None)
+
+
+def asset_source(url: str) -> str:
+    inliner: Optional[AssetInliner] = _inliner.get()
+    if inliner is None:
+        return url
+    return inliner.source(url)
@@ -0,0 +1,97 @@
+#!/usr/bin/python3.12
+
+"""An on-disk cache of parsed markdown, so pages can be rendered without parsing.
+
+Each page's blocks are stored as one `marshal`ed tuple under a name derived
+from the sha256 of its markdown and `PARSER_VERSION`, so a cached tree is
+only ever reused for the exact source, and the exact parser, it came from.
+Changes to rendering (htmlnode.py, textnode.py, templates) need no bump.
+The names of the registered syntaxes are part of the name too, so a tree
+parsed with an extension is not reused without it.
+"""
+
+
+import hashlib
+import marshal
+import os
+import pathlib
+import tempfile
+from typing import Optional
+
+from config import Path
+from markdown_blocks import BlockType
+from markdown_to_html import ParsedBlock, parse_markdown, syntax_names
+from textnode import TextNode, TextType
+
+
+# bump whenever a change to markdown_blocks.py, inline_markdown.py or the
+# parse_* functions of markdown_to_html.py changes what they produce
+PARSER_VERSION: int = 4
+
+_MAGIC: bytes = b"SSGAST"
+
+# types are stored as their index in these, rather than as strings,
+# except the block types of registered syntaxes
+_BLOCK_TYPES: tuple[str, ...] = tuple(t.value for t in BlockType)
+_TEXT_TYPES: tuple[TextType, ...] = tuple(TextType)
+_block_codes: dict[str, int] = {t: i for i, t in enumerate(_BLOCK_TYPES)}
+_text_codes: dict[str, int] = {t.value: i for i, t in enumerate(_TEXT_TYPES)}
+
+type EncodedBlock = tuple[int | str, int, str, tuple[tuple[tuple[str, int, Optional[str]], ...], ...]]
+
+
+def cache_path(cache_dir: Path | str, markdown: str) -> pathlib.Path:
+    digest: str = hashlib.sha256(markdown.encode()).hexdigest()
+    syntaxes: str = hashlib.sha256("\0".join(syntax_names()).encode()).hexdigest()
+    version: str = f"v{PARSER_VERSION}-m{marshal.version}-s{syntaxes[:12]}"
+    return pathlib.Path(cache_dir, "ast", version, digest[:2], f"{digest}.bin")
+
+
+def encode_blocks(blocks: list[ParsedBlock]) -> bytes:
+    encoded: tuple[EncodedBlock, ...] = tuple(
+        (
+            _block_codes.get(block.block_type, block.block_type),
+            block.level,
+            block.info,
+            tuple(
+                tuple((n.text, _text_codes[n.text_type], n.url) for n in part)
+                for part in block.parts
+            ),
+        )
+        for block in blocks
+    )
+    return _MAGIC + marshal.dumps(encoded)
+
+
+def decode_blocks(data: bytes) -> list[ParsedBlock]:
+    if not data.startswith(_MAGIC):
+        raise ValueError("Not a cached markdown tree")
+    encoded: tuple[EncodedBlock, ...] = marshal.loads(data[len(_MAGIC) :])
+    return [
+        ParsedBlock(
+            _BLOCK_TYPES[block_type] if isinstance(block_type, int) else block_type,
+            [[TextNode(t, _TEXT_TYPES[tt], url) for t, tt, url in part] for part in parts],
+            level,
+            info,
+        )
+        for block_type, level, info, parts in encoded
+    ]
+
+
+def load_parsed(markdown: str, cache_dir: Path | str) -> list[ParsedBlock]:
+    """Returns the parsed blocks of `markdown`, parsing it only on a cache miss."""
+
+    cached: pathlib.Path = cache_path(cache_dir, markdown)
+    try:
+        return decode_blocks(cached.read_bytes())
+    except (OSError, ValueError, EOFError, TypeError, IndexError):
+        pass
+
+    blocks: list[ParsedBlock] = parse_markdown(markdown)
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    # written aside and renamed, so a concurrent build never reads half a tree
+    fd, tmp = tempfile.mkstemp(dir=cached.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(encode_blocks(blocks))
+    os.replace(tmp, cached)
+    return blocks
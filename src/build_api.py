@@ -0,0 +1,113 @@
+#!/usr/bin/python3.12
+
+"""A library API which renders pages from memory, for embedding the generator.
+
+    >>> render_site({"index.md": "# Home"}, "<title>{{ Title }}</title>")
+    {'index.html': '<title>Home</title>'}
+
+Nothing is read from or written to the file system, errors are raised as
+`BuildError`s rather than exiting, and calls may run concurrently in threads.
+"""
+
+
+import contextvars
+import posixpath
+from typing import Iterator, Mapping, Optional
+
+from config import BuildOptions
+from critical_css import StylesheetIndex, parse_stylesheet
+from front_matter import split_front_matter
+from generate_webpages import (
+    BuildError,
+    PageError,
+    ParseBudgetExceeded,
+    StylesheetError,
+    extract_title,
+    render_page,
+)
+from site_nav import ContentHierarchy, uses_site_nav
+
+
+__all__ = [
+    "BuildError",
+    "InvalidSourcePath",
+    "PageError",
+    "ParseBudgetExceeded",
+    "StylesheetError",
+    "iter_render_site",
+    "output_path",
+    "render_site",
+]
+
+
+class InvalidSourcePath(BuildError):
+    def __init__(self, source: str) -> None:
+        self.source: str = source
+        super().__init__(f"Source path `{source}` is not relative to the site root")
+
+
+def output_path(source: str) -> str:
+    """Maps a source path such as `majesty/index.md` to `majesty/index.html`."""
+    normalized: str = posixpath.normpath(source)
+    if posixpath.isabs(normalized) or normalized.split("/")[0] in ("..", "."):
+        raise InvalidSourcePath(source)
+    return f"{posixpath.splitext(normalized)[0]}.html"
+
+
+def iter_render_site(
+    sources: Mapping[str, str],
+    template: str,
+    stylesheet: Optional[str] = None,
+    parse_budget: float = 0,
+) -> Iterator[tuple[str, str]]:
+    """Lazily yields `(output path, html)` for each markdown source, in order.
+
+    Each page is only rendered when it is asked for. With `stylesheet`
+    given, its critical rules are inlined into each page. Templates with
+    `{{ Nav }}` or `{{ Breadcrumbs }}` slots get the titles of every page
+    up front.
+    """
+    options = BuildOptions(critical_css=stylesheet is not None, parse_budget=parse_budget)
+    index: Optional[StylesheetIndex] = None
+    if stylesheet is not None:
+        try:
+            index = StylesheetIndex(parse_stylesheet(stylesheet))
+        except ValueError as e:
+            # given as text, the stylesheet has no path of its own
+            raise StylesheetError("<stylesheet>", str(e)) from e
+    hierarchy: Optional[ContentHierarchy] = None
+    if uses_site_nav(template):
+        hierarchy = ContentHierarchy(_titles(sources))
+
+    for source, markdown in sources.items():
+        path: str = output_path(source)
+        slots: Optional[dict[str, str]] = None
+        if hierarchy is not None:
+            slots = hierarchy.slots(posixpath.normpath(source))
+        # a fresh context, so no asset inlining configured by a build in this
+        # thread applies, as it would read the file system
+        page: str = contextvars.Context().run(
+            render_page, markdown, template, options, source, index, slots
+        )
+        yield path, page
+
+
+def _titles(sources: Mapping[str, str]) -> dict[str, str]:
+    titles: dict[str, str] = {}
+    for source, markdown in sources.items():
+        output_path(source)
+        try:
+            titles[posixpath.normpath(source)] = extract_title(split_front_matter(markdown)[1])
+        except ValueError as e:
+            raise PageError(source, str(e)) from e
+    return titles
+
+
+def render_site(
+    sources: Mapping[str, str],
+    template: str,
+    stylesheet: Optional[str] = None,
+    parse_budget: float = 0,
+) -> dict[str, str]:
+    """Renders every markdown source, returning html by output path."""
+    return dict(iter_render_site(sources, template, stylesheet, parse_budget))
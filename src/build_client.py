@@ -0,0 +1,69 @@
+#!/usr/bin/python3.12
+
+"""Asks a running build daemon (daemon.py) to build the website.
+
+Takes the same arguments as main.py. Imports nothing from the generator,
+so starting it costs no more than starting the interpreter.
+"""
+
+
+import json
+import os
+import socket
+import sys
+from typing import Any, TextIO
+
+
+DEFAULT_SOCKET: str = "./.cache/build.sock"
+
+
+def request_build(
+    argv: list[str], socket_path: str = DEFAULT_SOCKET, out: TextIO = sys.stdout
+) -> dict[str, Any]:
+    """Sends a build request, echoing its progress to `out`, and returns the result."""
+    return _request({"argv": argv, "cwd": os.getcwd()}, socket_path, out)
+
+
+def stop_daemon(socket_path: str = DEFAULT_SOCKET) -> dict[str, Any]:
+    return _request({"stop": True}, socket_path, sys.stdout)
+
+
+def _request(request: dict[str, Any], socket_path: str, out: TextIO) -> dict[str, Any]:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socket_path)
+        s.sendall(json.dumps(request).encode() + b"\n")
+        with s.makefile("r") as replies:
+            for line in replies:
+                reply: dict[str, Any] = json.loads(line)
+                if "progress" in reply:
+                    print(reply["progress"], file=out)
+                    continue
+                return reply
+    raise ConnectionError("The build daemon closed the connection")
+
+
+def main(argv: list[str]) -> None:
+    socket_path: str = os.environ.get("SSG_DAEMON_SOCKET", DEFAULT_SOCKET)
+    try:
+        if argv[:1] == ["--stop"]:
+            stop_daemon(socket_path)
+            return
+        reply: dict[str, Any] = request_build(argv, socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        msg: str = (
+            f"No build daemon is listening on {socket_path}; "
+            "start one with `python3.12 src/daemon.py`, or build with main.sh"
+        )
+        sys.exit(msg)
+
+    if reply["status"] != "ok":
+        sys.exit(reply.get("error", "Build failed"))
+    print(
+        f"Built {reply['built']}, skipped {reply['skipped']} unchanged, "
+        f"removed {len(reply['removed'])} in {reply['seconds']:.3f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
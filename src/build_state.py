@@ -0,0 +1,77 @@
+#!/usr/bin/python3.12
+
+"""Functionality to skip work a previous build in the same process already did."""
+
+
+import os
+from typing import Optional
+
+from sources import Path, read_file, split_spec
+
+
+class BuildState:
+    """Remembers what each output file was last built from.
+
+    An output is up to date when it still exists and the key of what it was
+    built from (a source's `stat_key()`, plus anything else it depends on)
+    is unchanged. Outputs which a build no longer produces are stale.
+    """
+
+    def __init__(self) -> None:
+        self._outputs: dict[str, tuple] = {}
+        # the data files each page output included, see data_tables.py
+        self._data: dict[str, tuple[str, ...]] = {}
+        self._seen: set[str] = set()
+        self._templates: dict[str, tuple[tuple, str]] = {}
+        self.builds: int = 0
+        self.built: int = 0
+        self.skipped: int = 0
+
+    def begin(self) -> None:
+        self._seen = set()
+        self.built = 0
+        self.skipped = 0
+
+    def unchanged(self, output: str, key: tuple) -> bool:
+        self._seen.add(output)
+        if self._outputs.get(output) == key and os.path.exists(output):
+            self.skipped += 1
+            return True
+        return False
+
+    def record(self, output: str, key: tuple, data: tuple[str, ...] = ()) -> None:
+        self._seen.add(output)
+        self._outputs[output] = key
+        if data:
+            self._data[output] = data
+        else:
+            self._data.pop(output, None)
+        self.built += 1
+
+    def data(self, output: str) -> tuple[str, ...]:
+        """The data files `output` included when it was last built."""
+        return self._data.get(output, ())
+
+    def finish(self, partial: bool = False) -> list[str]:
+        """Removes the outputs which this build no longer produced.
+
+        A partial build only saw the outputs it selected, so removes none.
+        """
+        stale: list[str] = [] if partial else sorted(set(self._outputs) - self._seen)
+        for output in stale:
+            del self._outputs[output]
+            self._data.pop(output, None)
+            if os.path.isfile(output):
+                os.remove(output)
+        self.builds += 1
+        return stale
+
+    def template(self, template_path: Path | str) -> str:
+        """Returns a template, read again only when its file has changed."""
+        stat: os.stat_result = os.stat(split_spec(template_path)[0])
+        key: tuple = (stat.st_mtime_ns, stat.st_size)
+        cached: Optional[tuple[tuple, str]] = self._templates.get(str(template_path))
+        if cached is None or cached[0] != key:
+            cached = (key, read_file(template_path))
+            self._templates[str(template_path)] = cached
+        return cached[1]
@@ -0,0 +1,182 @@
+#!/usr/bin/python3.12
+
+"""Configuration of the resources and options used to build the website."""
+
+
+import os
+import pathlib
+import sys
+from typing import Any
+
+from sources import Path, split_spec
+
+
+class Resources:
+    _public: str = "./public"
+    _static: str = "./static"
+    _content: str = "./content"
+
+    _markdown_index: str = "./content/index.md"
+    _page_template: str = "./template.html"
+    _html_index: str = ""
+    _cache: str = "./.cache"
+
+    def __init__(self) -> None:
+        self._html_index: str = f"{self._public}/index.html"
+
+    @property
+    def public(self) -> Path:
+        return pathlib.Path(self._public)
+
+    @public.setter
+    def set_public(self, public_dir: str | Path) -> None:
+        if not os.path.exists(public_dir):
+            msg = "Trying to set public resources with nonexistent directory"
+            sys.exit(msg)
+
+        p: Path = pathlib.Path(public_dir).resolve()
+        self._public = str(p)
+
+    @property
+    def static(self) -> Path:
+        return pathlib.Path(self._static)
+
+    @static.setter
+    def set_static(self, static_dir: str | Path) -> None:
+        if not os.path.exists(split_spec(static_dir)[0]):
+            msg = "Trying to set static resources with nonexistent directory"
+            sys.exit(msg)
+
+        p: Path = pathlib.Path(static_dir).resolve()
+        self._static = str(p)
+
+    @property
+    def content(self) -> Path:
+        return pathlib.Path(self._content)
+
+    @content.setter
+    def set_content(self, content_dir: str | Path) -> None:
+        if not os.path.exists(split_spec(content_dir)[0]):
+            msg = "Trying to set content resources with nonexistent directory"
+            sys.exit(msg)
+
+        p: Path = pathlib.Path(content_dir).resolve()
+        self._content = str(p)
+
+    @property
+    def markdown_index(self) -> Path:
+        return pathlib.Path(self._markdown_index)
+
+    @markdown_index.setter
+    def set_markdown_index(self, index_file: str | Path) -> None:
+        if not os.path.exists(index_file):
+            msg: str = f"File {index_file} could not be found"
+            raise FileExistsError(msg)
+
+        p: Path = pathlib.Path(index_file).resolve()
+        self._markdown_index = str(p)
+
+    @property
+    def page_template(self) -> Path:
+        return pathlib.Path(self._page_template)
+
+    @page_template.setter
+    def set_page_template(self, template_file: str | Path) -> None:
+        if not os.path.exists(split_spec(template_file)[0]):
+            msg: str = f"File {template_file} could not be found"
+            raise FileExistsError(msg)
+
+        p: Path = pathlib.Path(template_file).resolve()
+        self._page_template = str(p)
+
+    @property
+    def html_index(self) -> Path:
+        return pathlib.Path(self._html_index)
+
+    @html_index.setter
+    def set_html_index(self, index_file: str | Path) -> None:
+        if not os.path.exists(index_file):
+            msg: str = f"File {index_file} could not be found"
+            raise FileExistsError(msg)
+
+        p: Path = pathlib.Path(index_file).resolve()
+        self._html_index = str(p)
+
+    @property
+    def cache(self) -> Path:
+        return pathlib.Path(self._cache)
+
+
+class BuildOptions:
+    """Optional build features; every feature is disabled by default."""
+
+    # inline the stylesheet rules each page needs into its <head>
+    critical_css: bool = False
+    stylesheet: str = "./static/index.css"
+    stylesheet_href: str = "/index.css"
+
+    # embed images smaller than this many bytes as data URIs; 0 disables
+    inline_assets_below: int = 0
+    assets_dir: str = "./static"
+
+    # keep per-page state on disk rather than in memory, see manifest.py
+    bounded_memory: bool = False
+
+    # fail the build when parsing a page takes longer, in seconds; 0 disables
+    parse_budget: float = 0
+
+    # reuse pages' parsed markdown from cache_dir, see ast_cache.py
+    ast_cache: bool = False
+
+    # directory or http(s) url of a shared cache of rendered pages, see
+    # artifact_cache.py; empty disables
+    artifact_cache: str = ""
+
+    # list each content directory's pages on index pages of this many
+    # entries, sorted by "date" or "title", see sections.py; 0 disables
+    section_pages: int = 0
+    section_sort: str = "date"
+
+    # write sitemap.xml and an Atom feed.xml of this many of the newest
+    # pages, with urls under site_url, see feeds.py; 0 disables the feed
+    site_url: str = ""
+    sitemap: bool = False
+    feed_entries: int = 0
+
+    # hint up to this many linked pages to prefetch and images to preload
+    # in each page's <head>, see link_graph.py; 0 disables
+    resource_hints: int = 0
+
+    # write sw.js precaching outputs up to this many bytes and register it
+    # in every page, see service_worker.py
+    service_worker: bool = False
+    precache_budget: int = 2 << 20
+
+    # split pages whose included csv/tsv table has more rows than this into
+    # several pages, see data_tables.py; 0 disables
+    table_page_rows: int = 0
+
+    # split pages whose markdown blocks add up to more bytes or blocks than
+    # these into parts at headings, see page_split.py; 0 disables
+    split_page_bytes: int = 0
+    split_page_blocks: int = 0
+
+    # trace the memory use of each page, reporting this many pages using the
+    # most, see memory_profile.py; 0 disables
+    memprofile: int = 0
+    # fail the build when a page's memory use peaks above this many bytes;
+    # 0 disables
+    memory_budget: int = 0
+
+    cache_dir: str = "./.cache"
+
+    def __init__(self, **overrides: Any) -> None:
+        for option, value in overrides.items():
+            if not hasattr(type(self), option):
+                raise AttributeError(f"Unknown build option `{option}`")
+            setattr(self, option, value)
+
+    def __repr__(self) -> str:
+        _name: str = type(self).__name__
+        _args: str = ", ".join(f"{k}={v!r}" for k, v in vars(self).items())
+        return f"{_name}({_args})"
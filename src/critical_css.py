@@ -0,0 +1,252 @@
+#!/usr/bin/python3.12
+
+"""Functionality to inline the critical stylesheet rules each page needs."""
+
+
+import hashlib
+import json
+import os
+import pathlib
+import re
+from typing import Iterable, Iterator, Optional
+
+from config import Path
+from sources import read_file, split_spec
+
+
+_comment: re.Pattern = re.compile(r"/\*[\s\S]*?\*/")
+_combinator: re.Pattern = re.compile(r"[\s>+~]+")
+_bracketed: re.Pattern = re.compile(r"\[[^\]]*\]|\([^)]*\)")
+_type_selector: re.Pattern = re.compile(r"^[a-zA-Z][a-zA-Z0-9-]*")
+_opening_tag: re.Pattern = re.compile(r"<([a-zA-Z][a-zA-Z0-9]*)")
+
+# the key of rules which may apply to any page, whatever tags it uses
+ANY_TAG: str = "*"
+
+
+class CSSRule:
+    def __init__(
+        self,
+        selectors: list[str],
+        declarations: str,
+        wrappers: Optional[Iterable[str]] = None,
+        verbatim: bool = False,
+    ) -> None:
+        self.selectors: list[str] = selectors
+        self.declarations: str = declarations
+        self.wrappers: tuple[str, ...] = tuple(wrappers or ())
+        self.verbatim: bool = verbatim
+
+    def __eq__(self, other) -> bool:
+        return vars(self) == vars(other)
+
+    def __repr__(self) -> str:
+        _name: str = type(self).__name__
+        _args: Iterator[str] = (f"{v!r}" for v in vars(self).values())
+        return f"{_name}({', '.join((_args))})"
+
+    def to_css(self, selectors: Optional[list[str]] = None) -> str:
+        if self.verbatim:
+            css: str = self.declarations
+        else:
+            css: str = f"{','.join(selectors or self.selectors)}{{{self.declarations}}}"
+        for wrapper in reversed(self.wrappers):
+            css = f"{wrapper}{{{css}}}"
+        return css
+
+
+class StylesheetIndex:
+    """Rules of a stylesheet indexed by the tag each selector targets."""
+
+    def __init__(self, rules: list[CSSRule]) -> None:
+        self.rules: list[CSSRule] = rules
+        self.by_tag: dict[str, list[tuple[int, str, frozenset[str]]]] = {}
+
+        for position, rule in enumerate(rules):
+            if rule.verbatim:
+                self.by_tag.setdefault(ANY_TAG, []).append((position, "", frozenset()))
+                continue
+            for selector in rule.selectors:
+                key, required = selector_tags(selector)
+                entry: tuple[int, str, frozenset[str]] = (position, selector, required)
+                self.by_tag.setdefault(key, []).append(entry)
+
+    def critical_css(self, tags: Iterable[str]) -> str:
+        """Returns the rules which can match a page using only `tags`."""
+        available: set[str] = {t.lower() for t in tags}
+        matched: dict[int, list[str]] = {}
+        for key in (ANY_TAG, *available):
+            for position, selector, required in self.by_tag.get(key, ()):
+                if required <= available:
+                    matched.setdefault(position, []).append(selector)
+
+        css: list[str] = []
+        for position in sorted(matched):
+            rule: CSSRule = self.rules[position]
+            # keep the stylesheet's own selector order within a rule
+            selectors: list[str] = [s for s in rule.selectors if s in matched[position]]
+            css.append(rule.to_css(selectors))
+        return "".join(css)
+
+    def to_json(self) -> str:
+        rules: list = [
+            [r.selectors, r.declarations, list(r.wrappers), r.verbatim]
+            for r in self.rules
+        ]
+        return json.dumps(rules, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, serialised: str) -> "StylesheetIndex":
+        rules: list[CSSRule] = [CSSRule(*r) for r in json.loads(serialised)]
+        return cls(rules)
+
+
+def selector_tags(selector: str) -> tuple[str, frozenset[str]]:
+    """Returns the index key and the tags required by a single selector.
+
+    The key is the tag of the selector's subject (its last compound), or
+    `ANY_TAG` when the subject does not name a tag, e.g. `.note` or `*`.
+    """
+    compounds: list[str] = _combinator.split(_bracketed.sub("", selector).strip())
+    types: list[str] = []
+    for compound in compounds:
+        m: re.Match[str] | None = _type_selector.match(compound)
+        types.append(m.group().lower() if m else "")
+
+    key: str = types[-1] if types and types[-1] else ANY_TAG
+    return key, frozenset(t for t in types if t)
+
+
+def parse_stylesheet(css: str) -> list[CSSRule]:
+    return _parse_rules(_comment.sub("", css), ())
+
+
+def _parse_rules(css: str, wrappers: tuple[str, ...]) -> list[CSSRule]:
+    rules: list[CSSRule] = []
+    cursor: int = 0
+    while cursor < len(css):
+        opening: int = css.find("{", cursor)
+        statement_end: int = css.find(";", cursor)
+        if statement_end != -1 and (opening == -1 or statement_end < opening):
+            # block-less at-rules such as @import or @charset
+            statement: str = css[cursor : statement_end + 1].strip()
+            if statement.startswith("@"):
+                rules.append(CSSRule([], statement, wrappers, verbatim=True))
+            cursor = statement_end + 1
+            continue
+        if opening == -1:
+            break
+
+        closing: int = _matching_brace(css, opening)
+        prelude: str = " ".join(css[cursor:opening].split())
+        body: str = css[opening + 1 : closing]
+        cursor = closing + 1
+
+        if prelude.startswith(("@media", "@supports")):
+            rules.extend(_parse_rules(body, (*wrappers, prelude)))
+        elif prelude.startswith("@"):
+            verbatim: str = f"{prelude}{{{' '.join(body.split())}}}"
+            rules.append(CSSRule([], verbatim, wrappers, verbatim=True))
+        elif prelude:
+            rules.append(CSSRule(_split_selectors(prelude), _minify(body), wrappers))
+
+    return rules
+
+
+def _matching_brace(css: str, opening: int) -> int:
+    depth: int = 0
+    quote: str = ""
+    for i in range(opening, len(css)):
+        char: str = css[i]
+        if quote:
+            if char == quote and css[i - 1] != "\\":
+                quote = ""
+        elif char in "\"'":
+            quote = char
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+
+    raise ValueError("Invalid stylesheet: unbalanced braces")
+
+
+def _split_selectors(prelude: str) -> list[str]:
+    selectors: list[str] = []
+    depth: int = 0
+    start: int = 0
+    for i, char in enumerate(prelude):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+    selectors.append(prelude[start:].strip())
+    return [s for s in selectors if s]
+
+
+def _minify(declarations: str) -> str:
+    return ";".join(d.strip() for d in declarations.split(";") if d.strip())
+
+
+_indexes: dict[tuple[str, int, int], StylesheetIndex] = {}
+
+
+def load_stylesheet_index(stylesheet: Path, cache_dir: Optional[Path]) -> StylesheetIndex:
+    """Parses a stylesheet at most once per build, and once per revision on disk."""
+
+    stat: os.stat_result = os.stat(split_spec(stylesheet)[0])
+    memo_key: tuple[str, int, int] = (str(stylesheet), stat.st_mtime_ns, stat.st_size)
+    if memo_key in _indexes:
+        return _indexes[memo_key]
+
+    css: bytes = read_file(stylesheet).encode()
+    digest: str = hashlib.sha256(css).hexdigest()
+    cached: pathlib.Path | None = None
+    index: StylesheetIndex | None = None
+    if cache_dir is not None:
+        cached = pathlib.Path(cache_dir) / "critical_css" / f"{digest}.json"
+        try:
+            index = StylesheetIndex.from_json(cached.read_text())
+        except (OSError, ValueError, TypeError):
+            index = None
+
+    if index is None:
+        index = StylesheetIndex(parse_stylesheet(css.decode()))
+        if cached is not None:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            cached.write_text(index.to_json())
+
+    _indexes[memo_key] = index
+    return index
+
+
+def template_tags(template_html: str) -> set[str]:
+    return {t.lower() for t in _opening_tag.findall(template_html)}
+
+
+def inline_critical_css(page_html: str, critical_css: str, href: str) -> str:
+    """Inlines `critical_css` and defers loading of the full stylesheet."""
+
+    style: str = f"<style>{critical_css}</style>"
+    link: re.Pattern = re.compile(
+        rf"<link\b[^>]*\bhref=[\"']?{re.escape(href)}[\"']?[^>]*>", re.IGNORECASE
+    )
+    deferred: str = (
+        f'<link rel="preload" href="{href}" as="style" '
+        "onload=\"this.onload=null;this.rel='stylesheet'\">"
+        f'<noscript><link rel="stylesheet" href="{href}"></noscript>'
+    )
+
+    m: re.Match[str] | None = link.search(page_html)
+    if m and "stylesheet" in m.group().lower():
+        return f"{page_html[: m.start()]}{style}{deferred}{page_html[m.end() :]}"
+
+    head_end: int = page_html.lower().find("</head>")
+    if head_end == -1:
+        return style + page_html
+    return f"{page_html[:head_end]}{style}{page_html[head_end:]}"
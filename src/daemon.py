@@ -0,0 +1,169 @@
+#!/usr/bin/python3.12
+
+"""A long-lived build server, which keeps what it built between builds.
+
+Clients (see build_client.py) send one JSON line over a Unix socket:
+`{"argv": [...], "cwd": "..."}` to build with the arguments main.py takes,
+or `{"stop": true}`. The server answers with `{"progress": ...}` lines for
+the build's messages and a final line with its `status` and counts. Only
+pages and static files whose sources (or template and options) changed
+since the previous build are written again, and outputs whose sources were
+removed are deleted.
+"""
+
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Optional
+
+from build_state import BuildState
+from generate_webpages import BuildError
+from main import SOURCE_ERRORS, build, configure
+
+
+DEFAULT_SOCKET: str = "./.cache/build.sock"
+
+
+class _ProgressStream(io.TextIOBase):
+    """Forwards each line printed during a build to the client."""
+
+    def __init__(self, send) -> None:
+        self._send = send
+        self._line: str = ""
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        self._line += s
+        *lines, self._line = self._line.split("\n")
+        for line in lines:
+            self._send({"progress": line})
+        return len(s)
+
+    def flush(self) -> None:
+        if self._line:
+            self._send({"progress": self._line})
+            self._line = ""
+
+
+class BuildServer(socketserver.UnixStreamServer):
+    """Serves builds one at a time, keeping a `BuildState` per output directory."""
+
+    def __init__(self, socket_path: str) -> None:
+        self.socket_path: str = socket_path
+        self.cwd: str = os.getcwd()
+        self.states: dict[str, BuildState] = {}
+        self.build_lock = threading.Lock()
+        super().__init__(socket_path, _BuildHandler)
+
+    def build(self, argv: list[str], send) -> dict[str, Any]:
+        with self.build_lock:
+            started: float = time.perf_counter()
+            progress = _ProgressStream(send)
+            reply: dict[str, Any] = {"status": "ok"}
+            state: Optional[BuildState] = None
+            try:
+                with (
+                    contextlib.redirect_stdout(progress),
+                    contextlib.redirect_stderr(progress),
+                ):
+                    res, args, options = configure(argv)
+                    if args.archive is not None:
+                        raise SystemExit("The build daemon only writes to directories")
+                    state = self.states.setdefault(str(res.public.resolve()), BuildState())
+                    state.begin()
+                    build(res, args, options, state)
+                    reply["removed"] = state.finish(partial=args.only is not None)
+            except BuildError as e:
+                reply = {"status": "failed", "error": f"Build failed: {e}"}
+            except SOURCE_ERRORS as e:
+                reply = {"status": "failed", "error": str(e)}
+            except SystemExit as e:
+                reply = {"status": "failed", "error": str(e.code)}
+            except Exception:
+                reply = {"status": "failed", "error": traceback.format_exc()}
+            finally:
+                progress.flush()
+
+            if state is not None:
+                reply["built"] = state.built
+                reply["skipped"] = state.skipped
+            reply["seconds"] = round(time.perf_counter() - started, 6)
+            return reply
+
+    def server_close(self) -> None:
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.socket_path)
+
+
+class _BuildHandler(socketserver.StreamRequestHandler):
+    server: BuildServer
+
+    def send(self, message: dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(message).encode() + b"\n")
+        self.wfile.flush()
+
+    def handle(self) -> None:
+        try:
+            request: dict[str, Any] = json.loads(self.rfile.readline())
+        except ValueError:
+            self.send({"status": "failed", "error": "Malformed request"})
+            return
+
+        if request.get("stop"):
+            self.send({"status": "stopped"})
+            threading.Thread(target=self.server.shutdown).start()
+            return
+
+        cwd: Optional[str] = request.get("cwd")
+        if cwd is not None and os.path.realpath(cwd) != os.path.realpath(self.server.cwd):
+            msg: str = f"The build daemon serves {self.server.cwd}, not {cwd}"
+            self.send({"status": "failed", "error": msg})
+            return
+
+        self.send(self.server.build(list(request.get("argv", [])), self.send))
+
+
+def serve(socket_path: str = DEFAULT_SOCKET) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+    if os.path.exists(socket_path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(socket_path)
+            except OSError:
+                # left behind by a daemon which did not shut down cleanly
+                os.remove(socket_path)
+            else:
+                sys.exit(f"A build daemon is already listening on {socket_path}")
+
+    with BuildServer(socket_path) as server:
+        print(f"Build daemon listening on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--socket",
+        default=os.environ.get("SSG_DAEMON_SOCKET", DEFAULT_SOCKET),
+        help=f"Unix socket to listen on (default {DEFAULT_SOCKET})",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    serve(parse_args().socket)
@@ -0,0 +1,196 @@
+#!/usr/bin/python3.12
+
+"""Csv and tsv files included in pages as tables.
+
+A block `{{ Table data/report.csv }}` names a data file relative to the
+page's own directory in the content tree. Rather than building a node per
+cell, the block renders as a marker, and `write_page` streams the table's
+rows into the output writer in place of it, so a table of any size is
+never held in memory. The first row is the table's header.
+
+With `rows_per_page`, a page whose table has more rows than that is split
+into several: `report.html`, `report-2.html`, ..., each with the page's
+other content, a slice of the table under the same header, and links to
+its neighbours. Only the first table over the limit is split; the page's
+other tables appear on its first page.
+"""
+
+
+import csv
+import html
+import io
+import itertools
+import posixpath
+import secrets
+from typing import Iterable, Iterator, Optional
+
+from output import OutputWriter
+from sources import SourceTree
+
+
+DELIMITERS: dict[str, str] = {".csv": ",", ".tsv": "\t"}
+TABLE_TAGS: frozenset[str] = frozenset({"table", "thead", "tbody", "tr", "th", "td"})
+
+# random per process, so no page text, which may contain NUL, can be mistaken for it
+_MARKER: str = f"\x00{secrets.token_hex(16)}\x00"
+_MARKER_PREFIX: str = "table:"
+# rows are written to the output in batches of this many
+_BATCH_ROWS: int = 256
+
+
+def table_marker(path: str) -> str:
+    return f"{_MARKER}{_MARKER_PREFIX}{path}{_MARKER}"
+
+
+def has_tables(page_html: str) -> bool:
+    return _MARKER in page_html
+
+
+def strip_tables(page_html: str) -> str:
+    """Drops the table markers of a page rendered without its content tree."""
+    parts: list[str] = page_html.split(_MARKER)
+    return "".join(parts[::2])
+
+
+def is_data_file(name: str) -> bool:
+    return posixpath.splitext(name)[1] in DELIMITERS
+
+
+def data_name(page_source: str, path: str) -> str:
+    """The name in the content tree of the data file `path` included by `page_source`."""
+    return posixpath.normpath(posixpath.join(posixpath.dirname(page_source), path))
+
+
+def split_page_name(dest: str, number: int) -> str:
+    """The output of page `number` of a split page, `report-2.html` of `report.html`."""
+    if number == 1:
+        return dest
+    stem, extension = posixpath.splitext(dest)
+    return f"{stem}-{number}{extension}"
+
+
+class DataTable:
+    """A data file in the content tree, read a row at a time."""
+
+    def __init__(self, content: SourceTree, page_source: str, path: str) -> None:
+        name: str = data_name(page_source, path)
+        if posixpath.isabs(path) or name == ".." or name.startswith("../"):
+            raise ValueError(f"Table data {path} is outside the content tree")
+        if not is_data_file(name):
+            raise ValueError(f"Table data {path} is not a .csv or .tsv file")
+        try:
+            content.stat_key(name)
+        except (OSError, KeyError) as e:
+            raise ValueError(f"Table data {path} not found") from e
+        self.content: SourceTree = content
+        self.name: str = name
+        self._count: Optional[int] = None
+
+    def __repr__(self) -> str:
+        return f"DataTable({self.name!r})"
+
+    def rows(self) -> Iterator[list[str]]:
+        delimiter: str = DELIMITERS[posixpath.splitext(self.name)[1]]
+        local: Optional[str] = self.content.local_path(self.name)
+        try:
+            if local is None:
+                text = io.StringIO(self.content.read_text(self.name))
+                yield from csv.reader(text, delimiter=delimiter)
+                return
+            with open(local, newline="") as f:
+                yield from csv.reader(f, delimiter=delimiter)
+        except csv.Error as e:
+            raise ValueError(f"Table data {self.name}: {e}") from e
+
+    def count(self) -> int:
+        """The number of rows below the header."""
+        if self._count is None:
+            self._count = max(sum(1 for _ in self.rows()) - 1, 0)
+        return self._count
+
+    def chunks(self) -> Iterator[bytes]:
+        rows: Iterator[list[str]] = self.rows()
+        return render_table(next(rows, None), rows)
+
+
+def render_table(header: Optional[list[str]], rows: Iterable[list[str]]) -> Iterator[bytes]:
+    """Renders a table as it reads its rows, a batch of rows per chunk."""
+    cells: str = "".join(f"<th>{html.escape(c, quote=False)}</th>" for c in header or ())
+    yield f"<table><thead><tr>{cells}</tr></thead><tbody>".encode()
+    batch: list[str] = []
+    for row in rows:
+        cells = "".join(f"<td>{html.escape(c, quote=False)}</td>" for c in row)
+        batch.append(f"<tr>{cells}</tr>")
+        if len(batch) == _BATCH_ROWS:
+            yield "".join(batch).encode()
+            batch.clear()
+    yield ("".join(batch) + "</tbody></table>").encode()
+
+
+def _pager(dest: str, number: int, count: int) -> str:
+    links: list[str] = []
+    if number > 1:
+        href: str = posixpath.basename(split_page_name(dest, number - 1))
+        links.append(f"<a href='{html.escape(href)}'>Previous</a>")
+    links.append(f"Page {number} of {count}")
+    if number < count:
+        href: str = posixpath.basename(split_page_name(dest, number + 1))
+        links.append(f"<a href='{html.escape(href)}'>Next</a>")
+    return f"<nav class='table-pages'>{' | '.join(links)}</nav>"
+
+
+def write_page(
+    writer: OutputWriter,
+    dest: str,
+    page_html: str,
+    content: SourceTree,
+    source: str,
+    rows_per_page: int = 0,
+) -> list[str]:
+    """Writes a rendered page, streaming its tables in, returning every output written.
+
+    Raises ValueError for a table whose data file is missing or invalid.
+    """
+    parts: list[str] = page_html.split(_MARKER)
+    if len(parts) == 1:
+        writer.write_bytes(dest, page_html.encode())
+        return [dest]
+
+    tables: list[DataTable] = [
+        DataTable(content, source, marker.removeprefix(_MARKER_PREFIX))
+        for marker in parts[1::2]
+    ]
+    split: Optional[int] = None
+    count: int = 1
+    if rows_per_page > 0:
+        split = next((i for i, t in enumerate(tables) if t.count() > rows_per_page), None)
+        if split is not None:
+            count = -(-tables[split].count() // rows_per_page)
+            # the pages are written in order, so share a single read of the file
+            rows: Iterator[list[str]] = tables[split].rows()
+            header: Optional[list[str]] = next(rows, None)
+
+    def page_chunks(number: int) -> Iterator[bytes]:
+        for i, text in enumerate(parts):
+            if i % 2 == 0:
+                yield text.encode()
+            elif i // 2 == split:
+                yield from render_table(header, itertools.islice(rows, rows_per_page))
+                yield _pager(dest, number, count).encode()
+            elif number == 1:
+                yield from tables[i // 2].chunks()
+
+    outputs: list[str] = []
+    for number in range(1, count + 1):
+        page_dest: str = split_page_name(dest, number)
+        writer.write_stream(page_dest, page_chunks(number))
+        outputs.append(page_dest)
+    return outputs
+
+
+def keep_split_pages(writer: OutputWriter, dest: str) -> None:
+    """Keeps the further pages of a split page which is unchanged."""
+    number: int = 2
+    while writer.exists(split_page_name(dest, number)):
+        writer.keep(split_page_name(dest, number))
+        number += 1
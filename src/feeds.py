@@ -0,0 +1,161 @@
+#!/usr/bin/python3.12
+
+"""`sitemap.xml` and an Atom `feed.xml`, generated from the metadata index.
+
+Sitemaps are written one shard at a time, each of at most `SITEMAP_MAX_URLS`
+urls, with `sitemap.xml` becoming a sitemap index once there is more than
+one; each shard is streamed into the output as it is generated. The feed
+holds the newest entries, picked with a bounded heap. Like the section
+pages, each output is keyed by its contents and rewritten only once those
+change.
+"""
+
+
+import hashlib
+import heapq
+import posixpath
+from typing import Callable, Iterable, Iterator
+from xml.sax.saxutils import escape, quoteattr
+
+from output import OutputWriter
+from sections import MetadataIndex, PageMetadata
+from site_nav import page_url
+
+
+# the sitemap protocol's limit of urls per file
+SITEMAP_MAX_URLS: int = 50_000
+SITEMAP_NS: str = "http://www.sitemaps.org/schemas/sitemap/0.9"
+ATOM_NS: str = "http://www.w3.org/2005/Atom"
+
+_XML_DECLARATION: str = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+
+def absolute_url(site_url: str, source: str) -> str:
+    return site_url.rstrip("/") + page_url(source)
+
+
+def _write_if_changed(
+    writer: OutputWriter,
+    path: str,
+    text: Callable[[], Iterable[str]],
+    previous: dict[str, str],
+    outputs: dict[str, str],
+) -> None:
+    """Streams the output `text()` generates, hashing it as it is written.
+
+    When an earlier build wrote `path`, `text()` is first generated once
+    just to be hashed, and the output kept if it is unchanged.
+    """
+    if path in previous and writer.exists(path):
+        sha = hashlib.sha256()
+        for chunk in text():
+            sha.update(chunk.encode())
+        if sha.hexdigest() == previous[path]:
+            outputs[path] = previous[path]
+            writer.keep(path)
+            return
+    print(f"Generating {path}")
+    sha = hashlib.sha256()
+
+    def chunks() -> Iterator[bytes]:
+        for chunk in text():
+            data: bytes = chunk.encode()
+            sha.update(data)
+            yield data
+
+    writer.write_stream(path, chunks())
+    outputs[path] = sha.hexdigest()
+
+
+def _urlset(pages: list[PageMetadata], site_url: str) -> Iterator[str]:
+    yield _XML_DECLARATION
+    yield f'<urlset xmlns="{SITEMAP_NS}">\n'
+    for meta in pages:
+        lastmod: str = f"<lastmod>{meta.lastmod}</lastmod>" if meta.lastmod else ""
+        yield f"<url><loc>{escape(absolute_url(site_url, meta.source))}</loc>{lastmod}</url>\n"
+    yield "</urlset>\n"
+
+
+def write_sitemap(
+    metadata: MetadataIndex,
+    site_url: str,
+    writer: OutputWriter,
+    max_urls: int = SITEMAP_MAX_URLS,
+) -> dict[str, str]:
+    """Writes the sitemap shards which changed, returning every shard's key."""
+    outputs: dict[str, str] = {}
+    sources: list[str] = sorted(metadata.pages)
+    if len(sources) <= max_urls:
+        pages: list[PageMetadata] = [metadata.pages[s][1] for s in sources]
+        sitemap: Callable[[], Iterator[str]] = lambda: _urlset(pages, site_url)
+        _write_if_changed(writer, "sitemap.xml", sitemap, metadata.outputs, outputs)
+        return outputs
+
+    shards: list[tuple[str, str]] = []
+    for start in range(0, len(sources), max_urls):
+        pages: list[PageMetadata] = [
+            metadata.pages[s][1] for s in sources[start : start + max_urls]
+        ]
+        name: str = f"sitemap-{start // max_urls + 1}.xml"
+        shard: Callable[[], Iterator[str]] = lambda: _urlset(pages, site_url)
+        _write_if_changed(writer, name, shard, metadata.outputs, outputs)
+        shards.append((name, max((p.lastmod for p in pages), default="")))
+
+    lines: list[str] = [_XML_DECLARATION, f'<sitemapindex xmlns="{SITEMAP_NS}">\n']
+    for name, lastmod in shards:
+        loc: str = escape(f"{site_url.rstrip('/')}/{name}")
+        modified: str = f"<lastmod>{lastmod}</lastmod>" if lastmod else ""
+        lines.append(f"<sitemap><loc>{loc}</loc>{modified}</sitemap>\n")
+    lines.append("</sitemapindex>\n")
+    _write_if_changed(writer, "sitemap.xml", lambda: lines, metadata.outputs, outputs)
+    return outputs
+
+
+def _published(meta: PageMetadata) -> str:
+    # front matter dates take precedence over when the file last changed
+    return meta.date or meta.lastmod
+
+
+def newest_entries(metadata: MetadataIndex, count: int) -> list[PageMetadata]:
+    """The `count` newest pages besides directory indexes, holding at most `count` at once."""
+    return heapq.nlargest(
+        count,
+        (
+            meta
+            for _, meta in metadata.pages.values()
+            if posixpath.basename(meta.source) != "index.md"
+        ),
+        key=lambda m: (_published(m), m.source),
+    )
+
+
+def write_feed(
+    metadata: MetadataIndex, site_url: str, count: int, writer: OutputWriter
+) -> dict[str, str]:
+    """Writes `feed.xml` with the `count` newest pages, if it changed."""
+    site: str = site_url.rstrip("/")
+    home = metadata.pages.get("index.md")
+    title: str = home[1].title if home is not None else site
+    entries: list[PageMetadata] = newest_entries(metadata, count)
+    updated: str = max((m.lastmod for m in entries), default="") or "1970-01-01T00:00:00Z"
+
+    lines: list[str] = [
+        _XML_DECLARATION,
+        f'<feed xmlns="{ATOM_NS}">\n',
+        f"<title>{escape(title)}</title>\n",
+        f"<id>{escape(site)}/</id>\n",
+        f"<link href={quoteattr(site + '/')}/>\n",
+        f"<link rel=\"self\" href={quoteattr(site + '/feed.xml')}/>\n",
+        f"<updated>{updated}</updated>\n",
+        f"<author><name>{escape(title)}</name></author>\n",
+    ]
+    for meta in entries:
+        url: str = absolute_url(site_url, meta.source)
+        lines.append(
+            f"<entry><title>{escape(meta.title)}</title><id>{escape(url)}</id>"
+            f"<link href={quoteattr(url)}/><updated>{meta.lastmod or updated}</updated></entry>\n"
+        )
+    lines.append("</feed>\n")
+    outputs: dict[str, str] = {}
+    _write_if_changed(writer, "feed.xml", lambda: lines, metadata.outputs, outputs)
+    return outputs
@@ -0,0 +1,28 @@
+#!/usr/bin/python3.12
+
+"""Front matter: `key: value` lines between `---` fences at the top of a page.
+
+    ---
+    date: 2024-05-01
+    title: Crowning
+    ---
+    # The crowning
+"""
+
+
+def split_front_matter(markdown: str) -> tuple[dict[str, str], str]:
+    """Returns a page's front matter and the markdown after it."""
+    if not markdown.startswith("---\n"):
+        return {}, markdown
+    end: int = markdown.find("\n---", 3)
+    while end != -1 and markdown[end + 4 : end + 5] not in ("", "\n"):
+        end = markdown.find("\n---", end + 4)
+    if end == -1:
+        return {}, markdown
+
+    fields: dict[str, str] = {}
+    for line in markdown[4:end].splitlines():
+        key, sep, value = line.partition(":")
+        if sep and key.strip() and not key.lstrip().startswith("#"):
+            fields[key.strip().lower()] = value.strip().strip("\"'")
+    return fields, markdown[end + 5 :]
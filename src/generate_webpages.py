@@ -3,136 +3,669 @@
 """Functionality to generate static webpage(s) from resource files."""
 
 
-from collections import defaultdict
+import datetime
+import hashlib
+import itertools
 import os
 import pathlib
-import re
-import shutil
-import sys
-from typing import TypeVar
-
+import posixpath
+import time
+from typing import Iterable, Iterator, Optional, TypeVar
+
+from artifact_cache import ArtifactCache, open_store, page_key, render_digest
+from assets import configure_asset_inlining
+from ast_cache import load_parsed
+from build_state import BuildState
+from config import BuildOptions, Path
+from critical_css import (
+    StylesheetIndex,
+    inline_critical_css,
+    load_stylesheet_index,
+    template_tags,
+)
+from data_tables import (
+    TABLE_TAGS,
+    has_tables,
+    data_name,
+    keep_split_pages,
+    strip_tables,
+    write_page,
+)
+from feeds import write_feed, write_sitemap
+from front_matter import split_front_matter
 from htmlnode import ParentNode
-from markdown_to_html import markdown_to_html_node
+from link_graph import BACKLINKS_SLOT, LinkGraph, LinkRecorder, insert_head
+from markdown_blocks import TABLE_OPEN, markdown_to_blocks, table_include
+from markdown_to_html import (
+    ParsedBlock,
+    TableOfContents,
+    blocks_to_html_node,
+    parse_markdown,
+)
+from memory_profile import MemoryProfiler, PageMemory, measure, memory_profiling
+from output import OutputWriter, open_writer
+from page_split import (
+    PagePart,
+    SharedContents,
+    page_parts,
+    part_name,
+    plan_parts,
+    split_budget,
+)
+from sections import MetadataIndex, section_key
+from service_worker import register_service_worker
+from site_nav import ContentHierarchy, content_hierarchy, uses_site_nav
+from sources import (
+    SourceTree,
+    join_spec,
+    open_source,
+    paths_to_create,
+    read_file,
+    split_spec,
+)
 
 
-type Path = os.PathLike | pathlib.Path
 ErrType = TypeVar("ErrType", bound=Exception)
 
 
-def extract_title(markdown: str) -> str:
-    lines: list[str] = markdown.split("\n")
-    for line in lines:
-        h1_heading: re.Match[str] | None = re.match(r"# (?P<heading>.+)", line)
-        if h1_heading:
-            extracted_title: str = h1_heading["heading"].strip()
-            return extracted_title
-
-    raise Exception("Invalid markdown: no h1 header found")
-
-
-def generate_page(from_path, template_path, dest_path) -> None:
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-
-    with open(from_path, "r") as f, open(template_path) as t:
-        markdown_content: str = f.read()
-        template_html: str = t.read()
-
-    page_title: str = extract_title(markdown_content)
-    html_nodes: ParentNode = markdown_to_html_node(markdown_content)
-    html_content: str = html_nodes.to_html()
+class BuildError(Exception):
+    """Base of the errors a build raises, rather than exiting."""
 
-    template_html: str = template_html.replace("{{ Title }}", page_title)
-    template_html: str = template_html.replace("{{ Content }}", html_content)
 
-    p: Path = pathlib.Path(dest_path).resolve()
-    p.parent.mkdir(parents=True, exist_ok=True)
-    with open(str(p), "w") as f:
-        f.write(template_html)
+class PageError(BuildError):
+    def __init__(self, source: str, reason: str) -> None:
+        self.source: str = source
+        self.reason: str = reason
+        super().__init__(f"{source}: {reason}")
 
-    return
 
+class TemplateError(BuildError):
+    pass
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path) -> None:
-    content_list: list[str] = list_directory(dir_path_content)
-    to_replicate: dict[str, list[tuple[str, str]]] = paths_to_create(
-        dir_path_content, dest_dir_path, content_list
-    )
 
-    dirs_to_create: list[tuple[str, str]] | None = to_replicate.get("dirs")
-    if dirs_to_create:
-        for d in dirs_to_create:
-            new_dir: str = d[1]
-            make_dir(new_dir)  # TODO log the newly created directories
+class StylesheetError(BuildError):
+    def __init__(self, path: str, reason: str) -> None:
+        self.path: str = path
+        self.reason: str = reason
+        super().__init__(f"Stylesheet {path}: {reason}")
 
-    files_to_copy: list[tuple[str, str]] | None = to_replicate.get("files")
-    if files_to_copy:
-        for file in files_to_copy:
-            file_source: str = file[0]
 
-            if not file_source.endswith(".md"):
-                continue
+class MemoryBudgetExceeded(BuildError):
+    def __init__(self, source: str, peak: int, budget: int, stage: str) -> None:
+        self.source: str = source
+        self.peak: int = peak
+        self.budget: int = budget
+        self.stage: str = stage
+        msg: str = (
+            f"Building {source} took {peak} bytes at its peak, during {stage}, "
+            f"over the per-page memory budget of {budget} bytes"
+        )
+        super().__init__(msg)
 
-            file_dest: str = file[1][:-2] + "html"
-
-            # TODO log the newly created directories
-            generate_page(file_source, template_path, file_dest)
 
+class ParseBudgetExceeded(BuildError):
+    def __init__(self, source: str, seconds: float, budget: float) -> None:
+        self.source: str = source
+        self.seconds: float = seconds
+        self.budget: float = budget
+        msg: str = (
+            f"Parsing {source} took {seconds:.3f}s, "
+            f"over the per-page parse budget of {budget:.3f}s"
+        )
+        super().__init__(msg)
 
-def list_directory(directory: str, filepaths: list[str] = []) -> list[str]:
-    # TODO needs to go in tertiary file
 
-    target_dir: str = str(pathlib.Path(directory).resolve())
-    for node in os.listdir(target_dir):
-        node: str
-        nodepath: str = os.path.join(target_dir, node)
-        if is_file(node):
-            filepaths.append(nodepath)
-        else:
-            filepaths.append(nodepath + "/")
-            list_directory(nodepath, filepaths)
-
-    return filepaths
-
-
-def paths_to_create(
-    source: str, destination: str, source_tree: list[str]
-) -> dict[str, list[tuple[str, str]]]:
-    # TODO needs to go in tertiary file
-
-    dest: str = str(pathlib.Path(destination).resolve())
-    src: str = str(pathlib.Path(source).resolve())
+def extract_title(markdown: str) -> str:
+    # jumps between lines starting with "# " rather than matching every line
+    text: str = "\n" + markdown
+    heading_start: int = text.find("\n# ")
+    while heading_start != -1:
+        line_end: int = text.find("\n", heading_start + 1)
+        h1_heading: str = text[heading_start + 3 : None if line_end == -1 else line_end]
+        if h1_heading:
+            extracted_title: str = h1_heading.strip()
+            return extracted_title
+        heading_start = text.find("\n# ", heading_start + 1)
 
-    if not (os.path.isdir(dest) and os.path.isdir(src)):
-        msg = "Both source and destination must be directories"
-        sys.exit(msg)
+    raise ValueError("Invalid markdown: no h1 header found")
 
-    paths: dict = defaultdict(list)
-    for p in source_tree:
-        pathdiff: str = os.path.relpath(p, src)
-        new_path: str = os.path.join(dest, pathdiff)
-        old_path: str = str(pathlib.Path(p).resolve())
 
-        if is_file(new_path):
-            paths["files"].append((old_path, new_path))
-        else:
-            paths["dirs"].append((old_path, new_path))
+def generate_page(
+    from_path, template_path, dest_path, options=None, writer=None
+) -> None:
+    options: BuildOptions = options or BuildOptions()
+    writer: OutputWriter = writer or open_writer(".")
+    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
 
-    return paths
+    with open(from_path, "r") as f:
+        markdown_content: str = f.read()
+    template_html: str = read_file(template_path)
 
+    p: Path = pathlib.Path(dest_path).resolve()
+    # tables name their data files relative to the page
+    with open_source(os.path.dirname(os.path.abspath(from_path))) as content:
+        _render_and_write(
+            writer,
+            str(p),
+            markdown_content,
+            template_html,
+            options,
+            content,
+            os.path.basename(from_path),
+            str(from_path),
+        )
 
-def is_file(filepath: str) -> bool:
-    # TODO needs to go in tertiary file
-    filename: str = pathlib.Path(filepath).name
-    if re.match(r".+\..+", filename):
-        return True
-    return False
+    return
 
 
-def make_dir(directory: str) -> None:
-    # TODO needs to go in tertiary file
-    pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+def render_page(
+    markdown_content: str,
+    template_html: str,
+    options=None,
+    source: str = "<page>",
+    stylesheet_index=None,
+    slots=None,
+    links=None,
+    stream_tables=False,
+) -> str:
+    """Renders a page's html.
+
+    With `stream_tables`, included tables are left as markers for
+    `data_tables.write_page` to stream in; otherwise they are dropped.
+    """
+    return next(
+        render_parts(
+            markdown_content,
+            template_html,
+            options,
+            source,
+            stylesheet_index,
+            slots,
+            links,
+            stream_tables,
+        )
+    )[1]
+
+
+def render_parts(
+    markdown_content: str,
+    template_html: str,
+    options=None,
+    source: str = "<page>",
+    stylesheet_index=None,
+    slots=None,
+    links=None,
+    stream_tables=False,
+    dest: Optional[str] = None,
+    memory: Optional[PageMemory] = None,
+) -> Iterator[tuple[str, str]]:
+    """Renders a page as `render_page`, yielding each output and its html.
+
+    Given the page's output `dest`, a page over its split budget is
+    rendered one part at a time (page_split.py); otherwise it is one part.
+    Given `memory`, the parse and render stages are measured into it.
+    """
+    options: BuildOptions = options or BuildOptions()
+
+    front_matter, markdown_content = split_front_matter(markdown_content)
+    try:
+        with measure(memory, "parse"):
+            parse_started: float = time.perf_counter()
+            page_title: str = extract_title(markdown_content)
+            if options.ast_cache:
+                blocks: list[ParsedBlock] = load_parsed(markdown_content, options.cache_dir)
+            else:
+                blocks: list[ParsedBlock] = parse_markdown(markdown_content)
+            parse_seconds: float = time.perf_counter() - parse_started
+    except ValueError as e:
+        raise PageError(source, str(e)) from e
+    if options.parse_budget and parse_seconds > options.parse_budget:
+        raise ParseBudgetExceeded(source, parse_seconds, options.parse_budget)
+
+    ranges: list[tuple[int, int]] = [(0, len(blocks))]
+    if dest is not None:
+        try:
+            max_bytes, max_blocks = split_budget(
+                options.split_page_bytes, options.split_page_blocks, front_matter
+            )
+        except ValueError as e:
+            raise PageError(source, str(e)) from e
+        sizes: Iterable[int] = itertools.repeat(0)
+        if max_bytes > 0:
+            sizes = (len(b.encode()) for b in markdown_to_blocks(markdown_content))
+        ranges = plan_parts(blocks, sizes, max_bytes, max_blocks)
+    parts: list[PagePart] = page_parts(dest or source, ranges)
+    contents: Optional[SharedContents] = None
+    if len(parts) > 1:
+        contents = SharedContents(blocks, parts)
+
+    # fragments shared between pages, such as the site nav
+    for slot, fragment in (slots or {}).items():
+        template_html: str = template_html.replace(slot, fragment)
+    hints: str = ""
+    if links is not None:
+        links: LinkRecorder
+        hints = links.record(blocks, page_title)
+    index: Optional[StylesheetIndex] = None
+    if options.critical_css:
+        try:
+            index = stylesheet_index or load_stylesheet_index(
+                options.stylesheet, options.cache_dir
+            )
+        except ValueError as e:
+            raise StylesheetError(str(options.stylesheet), str(e)) from e
+    shared_tags: set[str] = template_tags(template_html)
+
+    for part in parts:
+        with measure(memory, "render"):
+            toc: TableOfContents = (
+                TableOfContents() if contents is None else contents.part_toc(part)
+            )
+            try:
+                html_nodes: ParentNode = blocks_to_html_node(blocks[part.start : part.stop], toc)
+                html_content: str = html_nodes.to_html()
+            except ValueError as e:
+                raise PageError(source, str(e)) from e
+            table_tags: frozenset[str] = frozenset()
+            if has_tables(html_content):
+                table_tags = TABLE_TAGS
+                if not stream_tables:
+                    html_content: str = strip_tables(html_content)
+            page_html: str = template_html
+            page_tags: set[str] = html_nodes.tags() | table_tags | shared_tags
+
+            has_toc_slot: bool = "{{ Toc }}" in page_html
+            toc_html: str = ""
+            if has_toc_slot or contents is not None:
+                toc_node: Optional[ParentNode] = (
+                    toc.to_html_node() if contents is None else contents.to_html_node(part)
+                )
+                if toc_node is not None:
+                    page_tags |= toc_node.tags()
+                    toc_html = toc_node.to_html()
+            title: str = page_title
+            if contents is not None:
+                if not has_toc_slot:
+                    # without a slot for it, the shared contents lead each part
+                    html_content = toc_html + html_content
+                html_content += part.pager()
+                page_tags.add("nav")
+                if part.number > 1:
+                    title = f"{page_title} (part {part.number} of {part.count})"
+            page_html: str = page_html.replace("{{ Toc }}", toc_html)
+            page_html: str = page_html.replace("{{ Title }}", title)
+            page_html: str = page_html.replace("{{ Content }}", html_content)
+            if hints:
+                page_html: str = insert_head(page_html, hints)
+
+            if index is not None:
+                page_html: str = inline_critical_css(
+                    page_html, index.critical_css(page_tags), options.stylesheet_href
+                )
+            if options.service_worker:
+                page_html: str = register_service_worker(page_html)
+
+        yield part.output, page_html
+
+
+def generate_pages_recursive(
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    options=None,
+    writer=None,
+    state=None,
+    only=None,
+) -> None:
+    options: BuildOptions = options or BuildOptions()
+    writer: OutputWriter = writer or open_writer(dest_dir_path)
+    configure_asset_inlining(options.assets_dir, options.inline_assets_below)
+
+    if state is None:
+        template_html: str = read_file(template_path)
+    else:
+        state: BuildState
+        template_html: str = state.template(template_path)
+    # checked even when `only` selects no pages, as every page depends on it
+    validate_template(template_html, template_path)
+
+    with (
+        open_source(dir_path_content) as content,
+        memory_profiling(options.memprofile, options.memory_budget) as profiler,
+    ):
+        content: SourceTree
+        profiler: Optional[MemoryProfiler]
+        hierarchy: Optional[ContentHierarchy] = None
+        if uses_site_nav(template_html):
+            hierarchy = content_hierarchy(
+                str(dir_path_content), collect_titles(content, dir_path_content)
+            )
+        # anything besides its source which a page's html depends on
+        page_inputs: tuple = (
+            template_html,
+            repr(options),
+            _stylesheet_key(options),
+            _assets_key(options),
+            hierarchy and hierarchy.signature,
+        )
+        cache: Optional[ArtifactCache] = None
+        if options.artifact_cache:
+            cache = ArtifactCache(open_store(options.artifact_cache))
+            render_inputs: str = render_digest(template_html, options)
+            if hierarchy is not None:
+                render_inputs = f"{render_inputs}:{hierarchy.signature}"
+        metadata: Optional[MetadataIndex] = None
+        if options.section_pages > 0 or options.sitemap or options.feed_entries > 0:
+            metadata_path: str = os.path.join(options.cache_dir, "metadata.json")
+            metadata = MetadataIndex.load(metadata_path)
+        backlinks: bool = BACKLINKS_SLOT in template_html
+        graph: Optional[LinkGraph] = None
+        if options.resource_hints > 0 or backlinks:
+            graph_path: str = os.path.join(options.cache_dir, "link-graph.json")
+            graph = LinkGraph.load(graph_path)
+        # the pages of this build, only kept for the indexes which need them
+        seen: set[str] = set()
+        track_seen: bool = graph is not None or metadata is not None
+
+        for file_source, file_dest in paths_to_create(content, dest_dir_path, only):
+            if file_source.endswith("/"):
+                writer.make_dir(file_dest)  # TODO log the newly created directories
+                continue
 
+            if not file_source.endswith(".md"):
+                continue
 
-def copy_file(source: str, destination: str) -> None:
-    # TODO needs to go in tertiary file
-    shutil.copyfile(source, destination)
+            file_dest: str = file_dest[:-2] + "html"
+            from_path: str = join_spec(dir_path_content, file_source)
+            if track_seen:
+                seen.add(file_source)
+            if state is not None or metadata is not None or graph is not None:
+                stat_key: tuple = content.stat_key(file_source)
+            # pages missing from the link graph are parsed again to add them
+            linked: bool = graph is None or graph.current(file_source, stat_key)
+            if state is not None:
+                key: tuple = (stat_key, page_inputs, _data_key(content, state.data(file_dest)))
+                if state.unchanged(file_dest, key) and linked:
+                    _keep_page(writer, file_dest, options)
+                    if metadata is not None and not metadata.current(file_source, stat_key):
+                        markdown_content: str = content.read_text(file_source)
+                        _index_page(
+                            metadata, content, file_source, stat_key, markdown_content, from_path
+                        )
+                    continue
+
+            memory: Optional[PageMemory] = None
+            if profiler is not None:
+                memory = PageMemory(from_path)
+            # TODO log the newly created directories
+            with measure(memory, "read"):
+                markdown_content: str = content.read_text(file_source)
+            if metadata is not None and not metadata.current(file_source, stat_key):
+                _index_page(
+                    metadata, content, file_source, stat_key, markdown_content, from_path
+                )
+            slots: dict[str, str] = _page_slots(file_source, hierarchy, graph if backlinks else None)
+            # pages streaming tables in are too large to be worth sharing, and
+            # resource hints depend on the link graph of the whole site
+            shared: bool = (
+                cache is not None
+                and linked
+                and options.resource_hints == 0
+                and TABLE_OPEN not in markdown_content
+            )
+            if shared:
+                artifact: str = page_key(
+                    render_inputs + slots.get(BACKLINKS_SLOT, ""), markdown_content
+                )
+                cached: Optional[bytes] = cache.fetch(artifact)
+                if cached is not None:
+                    print(f"Fetched page {file_dest} from the artifact cache")
+                    writer.write_bytes(file_dest, cached)
+                    if state is not None:
+                        state.record(file_dest, key, ())
+                    continue
+
+            print(f"Generating page from {from_path} to {file_dest} using {template_path}")
+            page_html: Optional[str] = _render_and_write(
+                writer,
+                file_dest,
+                markdown_content,
+                template_html,
+                options,
+                content,
+                file_source,
+                from_path,
+                slots,
+                graph and LinkRecorder(graph, file_source, stat_key, options.resource_hints),
+                memory,
+            )
+            # only once written, so a page which failed is built again next time
+            if state is not None:
+                data: tuple[str, ...] = _table_data(markdown_content, file_source)
+                key = (stat_key, page_inputs, _data_key(content, data))
+                state.record(file_dest, key, data)
+            if shared and page_html is not None:
+                cache.save(artifact, page_html.encode())
+            if memory is not None:
+                profiler.finish(memory)
+                if options.memory_budget > 0 and memory.peak > options.memory_budget:
+                    raise MemoryBudgetExceeded(
+                        from_path, memory.peak, options.memory_budget, memory.peak_stage
+                    )
+
+        if graph is not None:
+            if only is None:
+                graph.retain(seen)
+            if backlinks:
+                # pages rendered before a page linking to them was parsed, or
+                # skipped as unchanged, may show outdated backlinks
+                for file_source in graph.stale_backlinks(seen):
+                    from_path: str = join_spec(dir_path_content, file_source)
+                    file_dest: str = f"{file_source[:-2]}html"
+                    print(f"Updating the backlinks of {file_dest}")
+                    _render_and_write(
+                        writer,
+                        file_dest,
+                        content.read_text(file_source),
+                        template_html,
+                        options,
+                        content,
+                        file_source,
+                        from_path,
+                        _page_slots(file_source, hierarchy, graph),
+                        LinkRecorder(
+                            graph, file_source, graph.edges[file_source][0], options.resource_hints
+                        ),
+                    )
+            graph.save(graph_path)
+
+        if metadata is not None:
+            if only is None:
+                metadata.retain(seen)
+            outputs: dict[str, str] = {}
+            if options.section_pages > 0:
+                outputs |= generate_section_pages(
+                    metadata, template_html, page_inputs, options, writer, hierarchy
+                )
+            if options.sitemap:
+                outputs |= write_sitemap(metadata, options.site_url, writer)
+            if options.feed_entries > 0:
+                outputs |= write_feed(metadata, options.site_url, options.feed_entries, writer)
+            metadata.outputs = outputs
+            metadata.save(metadata_path)
+
+
+def _render_and_write(
+    writer: OutputWriter,
+    dest: str,
+    markdown_content: str,
+    template_html: str,
+    options: BuildOptions,
+    content: SourceTree,
+    source: str,
+    from_path: str,
+    slots: Optional[dict[str, str]] = None,
+    links: Optional[LinkRecorder] = None,
+    memory: Optional[PageMemory] = None,
+) -> Optional[str]:
+    """Renders a page and writes each of its parts, returning its html unless it was split."""
+    parts: Iterator[tuple[str, str]] = render_parts(
+        markdown_content, template_html, options, from_path, None, slots, links, True, dest, memory
+    )
+    for output, page_html in parts:
+        with measure(memory, "write"):
+            _write_page(writer, output, page_html, content, source, options, from_path)
+    return page_html if output == dest else None
+
+
+def _keep_page(writer: OutputWriter, dest: str, options: BuildOptions) -> None:
+    """Keeps an unchanged page's outputs: its parts, and their split tables."""
+    number: int = 1
+    while number == 1 or writer.exists(part_name(dest, number)):
+        writer.keep(part_name(dest, number))
+        if options.table_page_rows > 0:
+            keep_split_pages(writer, part_name(dest, number))
+        number += 1
+
+
+def _write_page(
+    writer: OutputWriter,
+    dest: str,
+    page_html: str,
+    content: SourceTree,
+    source: str,
+    options: BuildOptions,
+    from_path: str,
+) -> None:
+    try:
+        write_page(writer, dest, page_html, content, source, options.table_page_rows)
+    except ValueError as e:
+        raise PageError(from_path, str(e)) from e
+
+
+def _page_slots(
+    source: str, hierarchy: Optional[ContentHierarchy], graph: Optional[LinkGraph]
+) -> dict[str, str]:
+    slots: dict[str, str] = {} if hierarchy is None else hierarchy.slots(source)
+    if graph is not None:
+        slots[BACKLINKS_SLOT] = graph.backlinks_html(source)
+    return slots
+
+
+def _index_page(
+    metadata: MetadataIndex,
+    content: SourceTree,
+    source: str,
+    stat_key: tuple,
+    markdown: str,
+    from_path: str,
+) -> None:
+    front_matter, body = split_front_matter(markdown)
+    try:
+        title: str = extract_title(body)
+    except ValueError as e:
+        raise PageError(from_path, str(e)) from e
+    # the time a page last changed is its file's mtime, or else the first
+    # build which saw its current contents
+    local: Optional[str] = content.local_path(source)
+    changed: float = os.stat(local).st_mtime if local is not None else time.time()
+    lastmod: str = datetime.datetime.fromtimestamp(changed, datetime.UTC).strftime(
+        "%Y-%m-%dT%H:%M:%SZ"
+    )
+    digest: str = hashlib.sha256(markdown.encode()).hexdigest()
+    metadata.add(source, stat_key, title, front_matter, lastmod, digest)
+
+
+def generate_section_pages(
+    metadata: MetadataIndex,
+    template_html: str,
+    page_inputs: tuple,
+    options: BuildOptions,
+    writer: OutputWriter,
+    hierarchy: Optional[ContentHierarchy] = None,
+) -> dict[str, str]:
+    """Writes the listing pages whose entries changed, returning every page's key."""
+    outputs: dict[str, str] = {}
+    for page in metadata.sections(options.section_pages, options.section_sort):
+        key: str = section_key(page, page_inputs)
+        outputs[page.output] = key
+        if metadata.outputs.get(page.output) == key and writer.exists(page.output):
+            writer.keep(page.output)
+            continue
+
+        print(f"Generating section page {page.output}")
+        slots: dict[str, str] = {BACKLINKS_SLOT: ""}
+        if hierarchy is not None:
+            slots |= hierarchy.slots(posixpath.join(page.directory, "index.md"))
+        page_html: str = render_page(
+            page.markdown(), template_html, options, source=page.output, slots=slots
+        )
+        writer.write_bytes(page.output, page_html.encode())
+    return outputs
+
+
+# the title of each page by content tree and source, with the stat key it was read at
+_titles: dict[tuple[str, str], tuple[tuple, str]] = {}
+
+
+def collect_titles(content: SourceTree, root) -> dict[str, str]:
+    """Returns the title of every page, reading only pages changed since the last call."""
+    titles: dict[str, str] = {}
+    for name in content.walk():
+        if not name.endswith(".md"):
+            continue
+        memo_key: tuple[str, str] = (str(root), name)
+        stat_key: tuple = content.stat_key(name)
+        known: Optional[tuple[tuple, str]] = _titles.get(memo_key)
+        if known is None or known[0] != stat_key:
+            try:
+                body: str = split_front_matter(content.read_text(name))[1]
+                known = (stat_key, extract_title(body))
+            except ValueError as e:
+                raise PageError(join_spec(root, name), str(e)) from e
+            _titles[memo_key] = known
+        titles[name] = known[1]
+    return titles
+
+
+def validate_template(template_html: str, template_path: Path | str) -> None:
+    if "{{ Content }}" not in template_html:
+        raise TemplateError(f"Template {template_path} has no {{{{ Content }}}} slot")
+
+
+def _stylesheet_key(options: BuildOptions) -> Optional[tuple]:
+    if not options.critical_css:
+        return None
+    stat: os.stat_result = os.stat(split_spec(options.stylesheet)[0])
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _table_data(markdown_content: str, source: str) -> tuple[str, ...]:
+    """The data files a page includes as tables, by name in the content tree."""
+    if TABLE_OPEN not in markdown_content:
+        return ()
+    paths: Iterator[Optional[str]] = map(table_include, markdown_to_blocks(markdown_content))
+    return tuple(sorted({data_name(source, path) for path in paths if path is not None}))
+
+
+def _data_key(content: SourceTree, data: tuple[str, ...]) -> Optional[str]:
+    """Digests the data files a page includes, so a change to one re-renders the page."""
+    if not data:
+        return None
+    keys: list[tuple] = []
+    for name in data:
+        try:
+            keys.append((name, content.stat_key(name)))
+        except (OSError, KeyError):
+            keys.append((name, None))
+    return hashlib.sha256(repr(keys).encode()).hexdigest()
+
+
+def _assets_key(options: BuildOptions) -> Optional[str]:
+    """Digests the inlinable assets; unlike hash(), the digest is the same in every run."""
+    if options.inline_assets_below <= 0:
+        return None
+    with open_source(options.assets_dir) as assets:
+        assets: SourceTree
+        keys: list[tuple] = [(n, assets.stat_key(n)) for n in assets.walk() if n[-1] != "/"]
+    return hashlib.sha256(repr(keys).encode()).hexdigest()
@@ -0,0 +1,245 @@
+#!/usr/bin/python3.12
+
+"""Syntax highlighting of fenced code blocks by a small built-in tokenizer.
+
+The language comes from the fence's info string (```` ```python ````).
+Each language is scanned once for comments, strings, numbers and
+keywords, finding the closer of each string or block comment by search
+rather than by regex backtracking, so hostile code highlights in linear
+time. Everything else, and code in unknown languages, is escaped
+and left as is. Tokens become `<span class='tok-...'>`s for a stylesheet
+to color. Docs repeat the same snippets across many pages, so highlighted
+html is cached by language and the sha256 of the code.
+"""
+
+
+import collections
+import hashlib
+import html
+import re
+import threading
+from typing import Iterator, Optional
+
+
+CACHE_ENTRIES: int = 4096
+
+
+def _keywords(words: str) -> str:
+    return r"\b(?:" + "|".join(words.split()) + r")\b"
+
+
+_NUMBER: str = r"\b(?:0[xXoObB][0-9a-fA-F_]+|\d[\d_]*(?:\.\d+)?(?:[eE][+-]?\d+)?)\b"
+_LINE_COMMENT: str = r"//[^\n]*"
+_HASH_COMMENT: str = r"#[^\n]*"
+
+
+class Delimited:
+    """A token running from an opener to its closer, such as a string or block comment.
+
+    An escaped closer does not close it, nor, unless `multiline`, does a
+    later line: a token left unclosed ends with its line, or with the code.
+    """
+
+    def __init__(
+        self, kind: str, closer: str, escapes: bool = True, multiline: bool = False
+    ) -> None:
+        self.kind: str = kind
+        self.closer: str = closer
+        self.multiline: bool = multiline
+        stops: list[str] = [re.escape(closer)]
+        if escapes:
+            stops.insert(0, r"\\[\s\S]")
+        if not multiline:
+            stops.append(r"\n")
+        self._stops: re.Pattern = re.compile("|".join(stops))
+
+    def __repr__(self) -> str:
+        return f"Delimited({self.kind!r}, {self.closer!r})"
+
+    def end(self, code: str, start: int) -> int:
+        """The end of the token whose opener ends at `start`.
+
+        Each search resumes where the last one stopped, so the token's text
+        is scanned once, closed or not.
+        """
+        position: int = start
+        while (stop := self._stops.search(code, position)) is not None:
+            if stop.group() == self.closer:
+                return stop.end()
+            if stop.group() == "\n":
+                return stop.start()
+            position = stop.end()
+        return len(code)
+
+
+class Language:
+    """The tokens of a language: those its pattern matches, and delimited ones by opener.
+
+    Tokens are found by a single left to right scan. Rather than matching
+    a delimited token as a whole, which backtracks over unclosed ones, the
+    pattern only matches its opener and `Delimited.end` finds its closer.
+    """
+
+    def __init__(
+        self,
+        comment: str,
+        delimited: dict[str, Delimited],
+        keywords: str,
+        number: str = _NUMBER,
+        prefix: str = "",
+    ) -> None:
+        self.delimited: dict[str, Delimited] = delimited
+        # the longest opener first, so ''' is not taken for '
+        openers: list[str] = sorted(delimited, key=len, reverse=True)
+        groups: list[str] = []
+        if openers:
+            alternatives: str = "|".join(re.escape(opener) for opener in openers)
+            groups.append(f"{prefix}(?P<open>{alternatives})")
+        for name, pattern in (("comment", comment), ("number", number)):
+            if pattern:
+                groups.append(f"(?P<{name}>{pattern})")
+        groups.append(f"(?P<keyword>{_keywords(keywords)})")
+        self.pattern: re.Pattern = re.compile("|".join(groups))
+
+    def __repr__(self) -> str:
+        return f"Language({list(self.delimited)})"
+
+    def tokens(self, code: str) -> Iterator[tuple[int, int, str]]:
+        """Yields the `(start, end, kind)` of each token in `code`, in order."""
+        position: int = 0
+        while (match := self.pattern.search(code, position)) is not None:
+            start, end = match.span()
+            kind: str = match.lastgroup
+            if kind == "open":
+                token: Delimited = self.delimited[match.group("open")]
+                kind, end = token.kind, token.end(code, end)
+            if end > start:
+                yield start, end, kind
+            position = max(end, start + 1)
+
+
+def _strings(*quotes: str, multiline: bool = False) -> dict[str, Delimited]:
+    return {quote: Delimited("string", quote, multiline=multiline) for quote in quotes}
+
+
+_BLOCK_COMMENT: dict[str, Delimited] = {
+    "/*": Delimited("comment", "*/", escapes=False, multiline=True)
+}
+
+_PYTHON: Language = Language(
+    _HASH_COMMENT,
+    _strings('"', "'") | _strings('"""', "'''", multiline=True),
+    "False None True and as assert async await break class continue def del elif else "
+    "except finally for from global if import in is lambda match case nonlocal not or "
+    "pass raise return try while with yield self",
+    prefix=r"[rRbBfFuU]{0,2}",
+)
+_JAVASCRIPT: Language = Language(
+    _LINE_COMMENT,
+    _BLOCK_COMMENT | _strings('"', "'") | _strings("`", multiline=True),
+    "async await break case catch class const continue debugger default delete do else "
+    "export extends false finally for function if import in instanceof interface let new "
+    "null return super switch this throw true try type typeof undefined var void while "
+    "with yield",
+)
+_C_LIKE: Language = Language(
+    _LINE_COMMENT,
+    _BLOCK_COMMENT | _strings('"', "'"),
+    "auto bool break case catch char class const continue default defer do double else "
+    "enum extern false fn float for func go if impl import int interface let long loop "
+    "match mod mut new nil null package private protected pub public return self short "
+    "signed sizeof static struct super switch this throw true try type typedef union "
+    "unsigned use var void while",
+)
+_SHELL: Language = Language(
+    r"(?<![\w$])#[^\n]*",
+    _strings('"') | {"'": Delimited("string", "'", escapes=False, multiline=True)},
+    "if then else elif fi for while until do done case esac in function return export "
+    "local readonly echo cd exit set unset source",
+    number="",
+)
+_JSON: Language = Language("", _strings('"'), "true false null")
+_CSS: Language = Language(
+    "",
+    _BLOCK_COMMENT | _strings('"', "'"),
+    "important inherit initial none auto",
+    r"#[0-9a-fA-F]{3,8}\b|\b\d+(?:\.\d+)?(?:px|em|rem|%|vh|vw|s|ms)?",
+)
+
+LANGUAGES: dict[str, Language] = {
+    "python": _PYTHON,
+    "py": _PYTHON,
+    "javascript": _JAVASCRIPT,
+    "js": _JAVASCRIPT,
+    "typescript": _JAVASCRIPT,
+    "ts": _JAVASCRIPT,
+    "c": _C_LIKE,
+    "cpp": _C_LIKE,
+    "java": _C_LIKE,
+    "go": _C_LIKE,
+    "rust": _C_LIKE,
+    "bash": _SHELL,
+    "sh": _SHELL,
+    "shell": _SHELL,
+    "json": _JSON,
+    "css": _CSS,
+}
+
+
+def language_of(info: str) -> str:
+    """The language named by a fence's info string, e.g. `python` of `python title=a.py`."""
+    return info.split(maxsplit=1)[0].lower() if info.strip() else ""
+
+
+def tokenize(code: str, language: str) -> str:
+    """Returns `code` as escaped html, its tokens wrapped in spans."""
+    tokens: Optional[Language] = LANGUAGES.get(language)
+    if tokens is None:
+        return html.escape(code, quote=False)
+
+    out: list[str] = []
+    position: int = 0
+    for start, end, kind in tokens.tokens(code):
+        out.append(html.escape(code[position:start], quote=False))
+        out.append(f"<span class='tok-{kind}'>{html.escape(code[start:end], quote=False)}</span>")
+        position = end
+    out.append(html.escape(code[position:], quote=False))
+    return "".join(out)
+
+
+class HighlightCache:
+    """A thread-safe LRU of highlighted html by language and code digest."""
+
+    def __init__(self, max_entries: int = CACHE_ENTRIES) -> None:
+        self.max_entries: int = max_entries
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: collections.OrderedDict[tuple[str, bytes], str] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"HighlightCache({len(self._entries)} entries, {self.hits} hits, {self.misses} misses)"
+
+    def highlight(self, code: str, language: str) -> str:
+        key: tuple[str, bytes] = (language, hashlib.sha256(code.encode()).digest())
+        with self._lock:
+            cached: Optional[str] = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+        highlighted: str = tokenize(code, language)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = highlighted
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return highlighted
+
+
+_cache = HighlightCache()
+
+
+def highlight(code: str, info: str = "") -> str:
+    """Highlights a code block given its fence's info string, through the shared cache."""
+    return _cache.highlight(code, language_of(info))
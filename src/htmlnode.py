@@ -36,6 +36,18 @@ class HTMLNode:
         attrs: Iterator[str] = (f"{k}={v!r}" for k, v in self.props.items())
         return "" or " ".join(("", *attrs))
 
+    def tags(self) -> set[str]:
+        """Collects the tags used by this node and all of its descendants."""
+        _tags: set[str] = set()
+        stack: list[Node] = [self]
+        while stack:
+            node: Node = stack.pop()
+            if node.tag is not None:
+                _tags.add(node.tag)
+            if node.children:
+                stack.extend(node.children)
+        return _tags
+
 
 class LeafNode(HTMLNode):
 
@@ -3,13 +3,14 @@
 """Functionality to parse raw markdown into a sequence of TextNode objects."""
 
 from enum import Enum
-import re
-from typing import Pattern
+from typing import Callable, Iterator
 
 from textnode import TextNode, TextType
 
 
 type NodeList = list[TextNode]
+type Span = tuple[int, int, str, str]
+type Splitter = Callable[[NodeList], NodeList]
 
 
 class Patterns(Enum):
@@ -20,18 +21,58 @@ class Patterns(Enum):
     # LINKS
     # This is text with a link [to boot dev](https://www.boot.dev) and [to youtube](https://www.youtube.com/@bootdotdev)
 
+    # the grammar matched by `scan_spans()`, which is linear-time where
+    # backtracking these patterns is quadratic on unclosed brackets
     IMAGE = r"!\[(?P<alt>.+?)\]\((?P<src>.+?)\)"
     LINK = r"\[(?P<anchor>.*?)\]\((?P<src>.+?)\)"
 
 
-match_image: Pattern = re.compile(Patterns.IMAGE.value)
-match_link: Pattern = re.compile(Patterns.LINK.value)
+def scan_spans(text: str, pattern: Patterns) -> Iterator[Span]:
+    """Yields `(start, end, label, url)` of each match of an IMAGE or LINK.
+
+    Every `str.find()` resumes past the position its previous search reached,
+    so text is scanned a bounded number of times whatever its brackets.
+    """
+
+    opener: str = "![" if pattern is Patterns.IMAGE else "["
+    min_label: int = 1 if pattern is Patterns.IMAGE else 0
+
+    # cached positions of the next newline, `](` and `)`
+    newline: int = -1
+    bracket: int = -1
+    paren: int = -1
+
+    cursor: int = 0
+    while (start := text.find(opener, cursor)) != -1:
+        label: int = start + len(opener)
+        cursor = start + 1
+
+        if newline < label:
+            newline = _find(text, "\n", label)
+        if bracket < label + min_label:
+            bracket = _find(text, "](", label + min_label)
+        if bracket >= newline:
+            continue
+
+        if paren < bracket + 3:
+            paren = _find(text, ")", bracket + 3)
+        if paren >= newline:
+            continue
+
+        yield start, paren + 1, text[label:bracket], text[bracket + 2 : paren]
+        cursor = paren + 1
+
+
+def _find(text: str, sub: str, start: int) -> int:
+    """Like `str.find()`, but a missing `sub` is found at the end of `text`."""
+    position: int = text.find(sub, start)
+    return len(text) if position == -1 else position
 
 
 def extract_markdown_images(text) -> list[tuple[str, str]]:
     images: list[tuple[str, str]] = []
-    for match in re.finditer(match_image, text):
-        image_alt_url: tuple = (match.group("alt"), match.group("src"))
+    for _, _, alt, src in scan_spans(text, Patterns.IMAGE):
+        image_alt_url: tuple = (alt, src)
         images.append(image_alt_url)
 
     return images
@@ -39,43 +80,24 @@ def extract_markdown_images(text) -> list[tuple[str, str]]:
 
 def extract_markdown_links(text) -> list[tuple[str, str]]:
     links: list[tuple[str, str]] = []
-    for match in re.finditer(match_link, text):
-        link_anchor_url: tuple = (match.group("anchor"), match.group("src"))
+    for _, _, anchor, src in scan_spans(text, Patterns.LINK):
+        link_anchor_url: tuple = (anchor, src)
         links.append(link_anchor_url)
 
     return links
 
 
 def split_nodes_image(old_nodes: NodeList) -> NodeList:
+    return _split_nodes_spans(old_nodes, Patterns.IMAGE, TextType.IMAGE)
 
-    inlined_nodes: NodeList = []
-    for node in old_nodes:
-        if node.text_type != TextType.TEXT.value:
-            inlined_nodes.append(node)
-            continue
-
-        node_text: str = node.text
-        cached_start: int = 0
-        split_nodes: NodeList = []
-        for m in re.finditer(match_image, node_text):
-            if m.start() != cached_start:
-                text_node = TextNode(node_text[cached_start : m.start()], TextType.TEXT)
-                split_nodes.append(text_node)
 
-            image_node = TextNode(m.group("alt"), TextType.IMAGE, m.group("src"))
-            split_nodes.append(image_node)
-
-            cached_start: int = m.end()
-
-        if cached_start < len(node_text):
-            split_nodes.append(TextNode(node_text[cached_start:], TextType.TEXT))
-
-        inlined_nodes.extend(split_nodes)
-
-    return inlined_nodes
+def split_nodes_link(old_nodes: NodeList) -> NodeList:
+    return _split_nodes_spans(old_nodes, Patterns.LINK, TextType.LINK)
 
 
-def split_nodes_link(old_nodes: NodeList) -> NodeList:
+def _split_nodes_spans(
+    old_nodes: NodeList, pattern: Patterns, text_type: TextType
+) -> NodeList:
 
     inlined_nodes: NodeList = []
     for node in old_nodes:
@@ -86,15 +108,14 @@ def split_nodes_link(old_nodes: NodeList) -> NodeList:
         node_text: str = node.text
         cached_start: int = 0
         split_nodes: NodeList = []
-        for m in re.finditer(match_link, node_text):
-            if m.start() != cached_start:
-                text_node = TextNode(node_text[cached_start : m.start()], TextType.TEXT)
+        for start, end, label, url in scan_spans(node_text, pattern):
+            if start != cached_start:
+                text_node = TextNode(node_text[cached_start:start], TextType.TEXT)
                 split_nodes.append(text_node)
 
-            image_node = TextNode(m.group("anchor"), TextType.LINK, m.group("src"))
-            split_nodes.append(image_node)
+            split_nodes.append(TextNode(label, text_type, url))
 
-            cached_start: int = m.end()
+            cached_start: int = end
 
         if cached_start < len(node_text):
             split_nodes.append(TextNode(node_text[cached_start:], TextType.TEXT))
@@ -135,15 +156,43 @@ def split_nodes_delimiter(
 def text_to_textnodes(text) -> NodeList:
 
     nodes: NodeList = [TextNode(text, TextType.TEXT)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
+    # a syntax whose trigger is not in the text has nothing to split
+    for _, trigger, split in _inline_syntaxes:
+        if trigger in text:
+            nodes = split(nodes)
 
     return nodes
 
 
+def register_inline(name: str, trigger: str, split: Splitter) -> None:
+    """Adds an inline syntax, or replaces the one of the same name.
+
+    `split(nodes)` runs after the syntaxes before it, on text which
+    contains `trigger`, and splits the TEXT nodes among `nodes` like
+    `split_nodes_delimiter()`; nodes of other types pass through.
+    """
+    unregister_inline(name)
+    _inline_syntaxes.append((name, trigger, split))
+
+
+def unregister_inline(name: str) -> None:
+    _inline_syntaxes[:] = [s for s in _inline_syntaxes if s[0] != name]
+
+
+def inline_names() -> list[str]:
+    return [name for name, _, _ in _inline_syntaxes]
+
+
+# the built-in syntaxes, in the order they are split out of the text
+_inline_syntaxes: list[tuple[str, str, Splitter]] = [
+    ("bold", "**", lambda nodes: split_nodes_delimiter(nodes, "**", TextType.BOLD)),
+    ("code", "`", lambda nodes: split_nodes_delimiter(nodes, "`", TextType.CODE)),
+    ("italic", "*", lambda nodes: split_nodes_delimiter(nodes, "*", TextType.ITALIC)),
+    ("image", "![", split_nodes_image),
+    ("link", "[", split_nodes_link),
+]
+
+
 if __name__ == "__main__":
     from pprint import pprint
 
@@ -0,0 +1,211 @@
+#!/usr/bin/python3.12
+
+"""The site's link graph, and the resource hints derived from it.
+
+Each page's internal links and images are read off its parsed blocks while
+it renders. The graph is kept in the cache dir by source and stat key, so
+an incremental build replaces only the edges of the pages it parses, and
+the number of pages linking to each url is kept up to date as edges
+change.
+
+With a cap of N, each page gets `<link rel="prefetch">` for up to N of the
+pages it links to, the most linked-to across the site first, and
+`<link rel="preload">` for its first N images. Ranks are those known when
+the page renders; hints are advisory, so pages are not rendered again only
+because ranks shifted.
+
+The graph also keeps the inverse, the pages linking to each url, for the
+`{{ Backlinks }}` template slot. Backlinks are not advisory: the graph
+remembers the backlinks each page was rendered with, and after the build's
+pages have rendered, `stale_backlinks` names those to render again.
+"""
+
+
+import hashlib
+import html
+import json
+import os
+import tempfile
+from typing import Iterable, Optional
+from urllib.parse import urljoin, urlsplit
+
+from htmlnode import LeafNode, ParentNode
+from markdown_blocks import BlockType
+from site_nav import page_url
+from textnode import TextType
+
+
+BACKLINKS_SLOT: str = "{{ Backlinks }}"
+
+
+class PageLinks:
+    def __init__(self, pages: list[str], images: list[str]) -> None:
+        # site-absolute urls, in the order they first appear
+        self.pages: list[str] = pages
+        self.images: list[str] = images
+
+    def __repr__(self) -> str:
+        return f"PageLinks({vars(self)})"
+
+
+def internal_url(base: str, url: str) -> Optional[str]:
+    """Resolves `url` against page url `base`, or None if it leaves the site."""
+    resolved = urlsplit(urljoin(base, url.strip()))
+    if resolved.scheme or resolved.netloc or not resolved.path:
+        return None
+    path: str = resolved.path
+    return path.removesuffix("index.html") if path.endswith("/index.html") else path
+
+
+def outgoing_links(blocks: Iterable, source: str) -> PageLinks:
+    """Collects the internal pages and images linked from a page's parsed blocks."""
+    base: str = page_url(source)
+    pages: dict[str, None] = {}
+    images: dict[str, None] = {}
+    for block in blocks:
+        if block.block_type == BlockType.CODE.value:
+            continue
+        for part in block.parts:
+            for node in part:
+                if node.text_type not in (TextType.LINK.value, TextType.IMAGE.value):
+                    continue
+                url: Optional[str] = internal_url(base, node.url or "")
+                if url is None:
+                    continue
+                if node.text_type == TextType.IMAGE.value:
+                    images.setdefault(url)
+                elif url != base:
+                    pages.setdefault(url)
+    return PageLinks(list(pages), list(images))
+
+
+class LinkGraph:
+    def __init__(self) -> None:
+        # outgoing links and title by source, with the stat key they were read at
+        self.edges: dict[str, tuple[tuple, PageLinks, str]] = {}
+        # the sources linking to each url
+        self.backlinks: dict[str, set[str]] = {}
+        # the key of the backlinks each page was last rendered with
+        self.rendered: dict[str, str] = {}
+
+    def __repr__(self) -> str:
+        return f"LinkGraph({len(self.edges)} pages, {len(self.backlinks)} targets)"
+
+    @classmethod
+    def load(cls, path: str) -> "LinkGraph":
+        graph = cls()
+        try:
+            with open(path) as f:
+                data: dict = json.load(f)
+            for source, (stat_key, pages, images, title) in data["pages"].items():
+                graph.update(source, tuple(stat_key), PageLinks(pages, images), title)
+            graph.rendered = dict(data["rendered"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls()
+        return graph
+
+    def save(self, path: str) -> None:
+        data: dict = {
+            "pages": {
+                source: [list(stat_key), links.pages, links.images, title]
+                for source, (stat_key, links, title) in self.edges.items()
+            },
+            "rendered": self.rendered,
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def current(self, source: str, stat_key: tuple) -> bool:
+        known: Optional[tuple[tuple, PageLinks, str]] = self.edges.get(source)
+        return known is not None and known[0] == tuple(stat_key)
+
+    def in_degree(self, url: str) -> int:
+        return len(self.backlinks.get(url, ()))
+
+    def update(self, source: str, stat_key: tuple, links: PageLinks, title: str) -> None:
+        """Replaces a page's outgoing edges."""
+        self._remove(source)
+        self.edges[source] = (tuple(stat_key), links, title)
+        for url in links.pages:
+            self.backlinks.setdefault(url, set()).add(source)
+
+    def _remove(self, source: str) -> None:
+        known: Optional[tuple[tuple, PageLinks, str]] = self.edges.pop(source, None)
+        if known is None:
+            return
+        for url in known[1].pages:
+            sources: set[str] = self.backlinks[url]
+            sources.discard(source)
+            if not sources:
+                del self.backlinks[url]
+
+    def retain(self, sources: set[str]) -> None:
+        """Drops the edges of pages which are no longer in the content tree."""
+        for source in [s for s in self.edges if s not in sources]:
+            self._remove(source)
+            self.rendered.pop(source, None)
+
+    def hints(self, links: PageLinks, cap: int) -> str:
+        """Renders the prefetch and preload `<link>`s for a page's links."""
+        order: dict[str, int] = {url: i for i, url in enumerate(links.pages)}
+        likely: list[str] = sorted(links.pages, key=lambda u: (-self.in_degree(u), order[u]))
+        tags: list[str] = [
+            f'<link rel="prefetch" href="{html.escape(url)}">' for url in likely[:cap]
+        ]
+        tags += [
+            f'<link rel="preload" href="{html.escape(url)}" as="image">'
+            for url in links.images[:cap]
+        ]
+        return "".join(tags)
+
+    def _linking(self, source: str) -> list[tuple[str, str]]:
+        sources: set[str] = self.backlinks.get(page_url(source), set())
+        return sorted((self.edges[s][2], s) for s in sources)
+
+    def backlinks_key(self, source: str) -> str:
+        return hashlib.sha256(repr(self._linking(source)).encode()).hexdigest()
+
+    def backlinks_html(self, source: str) -> str:
+        """Renders the list of pages linking to `source`, recording it as rendered."""
+        linking: list[tuple[str, str]] = self._linking(source)
+        self.rendered[source] = self.backlinks_key(source)
+        if not linking:
+            return ""
+        items: list[ParentNode] = [
+            ParentNode("li", [LeafNode("a", title, {"href": page_url(s)})])
+            for title, s in linking
+        ]
+        return ParentNode("ul", items, {"class": "backlinks"}).to_html()
+
+    def stale_backlinks(self, sources: Iterable[str]) -> list[str]:
+        """The `sources` whose backlinks changed since they were rendered."""
+        return sorted(s for s in sources if self.rendered.get(s) != self.backlinks_key(s))
+
+
+class LinkRecorder:
+    """Records a page's links in the graph as it renders, returning its hints."""
+
+    def __init__(self, graph: LinkGraph, source: str, stat_key: tuple, cap: int) -> None:
+        self.graph: LinkGraph = graph
+        self.source: str = source
+        self.stat_key: tuple = stat_key
+        self.cap: int = cap
+
+    def __repr__(self) -> str:
+        return f"LinkRecorder({self.source!r}, cap={self.cap})"
+
+    def record(self, blocks: Iterable, title: str) -> str:
+        links: PageLinks = outgoing_links(blocks, self.source)
+        self.graph.update(self.source, self.stat_key, links, title)
+        return self.graph.hints(links, self.cap) if self.cap > 0 else ""
+
+
+def insert_head(page_html: str, tags: str) -> str:
+    """Inserts `tags` at the end of a page's `<head>`, or at its start without one."""
+    end: int = page_html.find("</head>")
+    if end == -1:
+        return tags + page_html
+    return page_html[:end] + tags + page_html[end:]
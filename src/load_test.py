@@ -0,0 +1,145 @@
+#!/usr/bin/python3.12
+
+"""A local load test of render_server.py, reporting requests per second.
+
+Starts a render server on the site's sources (main.py's defaults, or its
+options) and requests every page over keep-alive connections: once cold,
+then warm, warm with gzip, revalidating with `If-None-Match`, and ranges of
+a static file.
+
+    python3.12 src/load_test.py [--requests N] [--concurrency C] [main.py options]
+"""
+
+
+import argparse
+import collections
+import concurrent.futures
+import http.client
+import itertools
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+from main import configure
+from render_server import RenderServer
+from sources import SourceTree, open_source
+
+
+class LoadResult:
+    def __init__(self, name: str, requests: int, seconds: float, statuses: dict[int, int]) -> None:
+        self.name: str = name
+        self.requests: int = requests
+        self.seconds: float = seconds
+        self.statuses: dict[int, int] = statuses
+
+    @property
+    def per_second(self) -> float:
+        return self.requests / self.seconds if self.seconds else float("inf")
+
+    def __str__(self) -> str:
+        statuses: str = ", ".join(f"{n}x{s}" for s, n in sorted(self.statuses.items()))
+        return f"{self.name:<14} {self.requests:>7} requests {self.per_second:>10.0f}/s  ({statuses})"
+
+
+def run_load(
+    url: str,
+    requests: list[tuple[str, dict[str, str]]],
+    concurrency: int,
+    name: str = "load",
+) -> LoadResult:
+    """Sends `requests` (path and headers) from `concurrency` keep-alive clients."""
+    host: str = urlsplit(url).netloc
+    shares: list[list[tuple[str, dict[str, str]]]] = [
+        requests[i::concurrency] for i in range(concurrency)
+    ]
+
+    def client(share: list[tuple[str, dict[str, str]]]) -> collections.Counter:
+        statuses: collections.Counter = collections.Counter()
+        connection = http.client.HTTPConnection(host, timeout=30)
+        try:
+            for path, headers in share:
+                connection.request("GET", path, headers=headers)
+                response: http.client.HTTPResponse = connection.getresponse()
+                response.read()
+                statuses[response.status] += 1
+        finally:
+            connection.close()
+        return statuses
+
+    started: float = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        counts: list[collections.Counter] = list(pool.map(client, shares))
+    seconds: float = time.perf_counter() - started
+    return LoadResult(name, len(requests), seconds, dict(sum(counts, collections.Counter())))
+
+
+def page_paths(content: SourceTree) -> list[str]:
+    return [
+        f"/{name.removesuffix('index.md')}" if name.endswith("index.md") else f"/{name[:-3]}.html"
+        for name in content.walk()
+        if name.endswith(".md")
+    ]
+
+
+def load_test(
+    server: RenderServer, requests: int, concurrency: int, static: Optional[str] = None
+) -> list[LoadResult]:
+    pages: list[str] = page_paths(server.content)
+    if not pages:
+        raise ValueError("The content tree has no pages to request")
+
+    def repeat(headers_of) -> list[tuple[str, dict[str, str]]]:
+        return [(p, headers_of(p)) for p in itertools.islice(itertools.cycle(pages), requests)]
+
+    results: list[LoadResult] = [
+        run_load(server.url, [(p, {}) for p in pages], concurrency, "cold"),
+        run_load(server.url, repeat(lambda p: {}), concurrency, "warm"),
+        run_load(server.url, repeat(lambda p: {"Accept-Encoding": "gzip"}), concurrency, "warm gzip"),
+        run_load(
+            server.url,
+            repeat(lambda p: {"If-None-Match": server.page(_source_of(p)).etag}),
+            concurrency,
+            "revalidate",
+        ),
+    ]
+    if static is not None and server.static_size(static) > 0:
+        size: int = server.static_size(static)
+        ranges: list[tuple[str, dict[str, str]]] = [
+            (f"/{static}", {"Range": f"bytes={i % size}-{i % size + 1023}"})
+            for i in range(requests)
+        ]
+        results.append(run_load(server.url, ranges, concurrency, "static range"))
+    return results
+
+
+def _source_of(path: str) -> str:
+    name: str = path.lstrip("/")
+    return f"{name}index.md" if not name or name.endswith("/") else f"{name[:-5]}.md"
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        epilog="Other arguments are passed on to main.py, e.g. --content",
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args, build_argv = parser.parse_known_args(argv)
+    res, _, options = configure(build_argv)
+
+    with open_source(res.static) as static_tree:
+        static_files: list[str] = [n for n in static_tree.walk() if not n.endswith("/")]
+
+    server = RenderServer(res.content, res.static, res.page_template, options).start()
+    try:
+        for result in load_test(
+            server, args.requests, args.concurrency, static_files[0] if static_files else None
+        ):
+            print(result)
+        print(f"{server.renders} renders, {server.pages.size} bytes cached")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,198 +3,348 @@
 """Generates a static html website from markdown."""
 
 
-from collections import defaultdict
+import argparse
+import contextlib
 import os
-import pathlib
-import re
-import shutil
 import sys
 
-from generate_webpages import Path, generate_pages_recursive
+from build_state import BuildState
+from config import BuildOptions, Resources
+from generate_webpages import BuildError, Path, generate_pages_recursive
+from output import ARCHIVE_FORMATS, DirectoryWriter, OutputWriter, open_writer
+from sections import SORT_ORDERS
+from service_worker import write_service_worker
+from sources import SourceTree, UnsafeMemberError, join_spec, open_source, paths_to_create
 
 
-class Resources:
-    # TODO should be moved such that
-    # from config import Resources
+# errors in the sources given, reported without a traceback
+SOURCE_ERRORS: tuple[type[Exception], ...] = (
+    NotADirectoryError,
+    FileNotFoundError,
+    UnsafeMemberError,
+)
 
-    _public: str = "./public"
-    _static: str = "./static"
-    _content: str = "./content"
 
-    _markdown_index: str = "./content/index.md"
-    _page_template: str = "./template.html"
-    _html_index: str = ""
-
-    def __init__(self) -> None:
-        self._html_index: str = f"{self._public}/index.html"
-
-    @property
-    def public(self) -> Path:
-        return pathlib.Path(self._public)
-
-    @public.setter
-    def set_public(self, public_dir: str | Path) -> None:
-        if not os.path.exists(public_dir):
-            msg = "Trying to set public resources with nonexistent directory"
-            sys.exit(msg)
-
-        p: Path = pathlib.Path(public_dir).resolve()
-        self._public = str(p)
-
-    @property
-    def static(self) -> Path:
-        return pathlib.Path(self._static)
-
-    @static.setter
-    def set_static(self, static_dir: str | Path) -> None:
-        if not os.path.exists(static_dir):
-            msg = "Trying to set static resources with nonexistent directory"
-            sys.exit(msg)
-
-        p: Path = pathlib.Path(static_dir).resolve()
-        self._static = str(p)
-
-    @property
-    def content(self) -> Path:
-        return pathlib.Path(self._content)
-
-    @content.setter
-    def set_content(self, content_dir: str | Path) -> None:
-        if not os.path.exists(content_dir):
-            msg = "Trying to set content resources with nonexistent directory"
-            sys.exit(msg)
-
-        p: Path = pathlib.Path(content_dir).resolve()
-        self._content = str(p)
-
-    @property
-    def markdown_index(self) -> Path:
-        return pathlib.Path(self._markdown_index)
-
-    @markdown_index.setter
-    def set_markdown_index(self, index_file: str | Path) -> None:
-        if not os.path.exists(index_file):
-            msg: str = f"File {index_file} could not be found"
-            raise FileExistsError(msg)
-
-        p: Path = pathlib.Path(index_file).resolve()
-        self._markdown_index = str(p)
-
-    @property
-    def page_template(self) -> Path:
-        return pathlib.Path(self._page_template)
-
-    @page_template.setter
-    def set_page_template(self, template_file: str | Path) -> None:
-        if not os.path.exists(template_file):
-            msg: str = f"File {template_file} could not be found"
-            raise FileExistsError(msg)
-
-        p: Path = pathlib.Path(template_file).resolve()
-        self._page_template = str(p)
-
-    @property
-    def html_index(self) -> Path:
-        return pathlib.Path(self._html_index)
-
-    @html_index.setter
-    def set_html_index(self, index_file: str | Path) -> None:
-        if not os.path.exists(index_file):
-            msg: str = f"File {index_file} could not be found"
-            raise FileExistsError(msg)
-
-        p: Path = pathlib.Path(index_file).resolve()
-        self._html_index = str(p)
-
-
-def main() -> None:
-    res = Resources()
-    make_public(res.static, res.public)
-    # generate_page(res.markdown_index, res.page_template, res.html_index)
-    generate_pages_recursive(res.content, res.page_template, res.public)
-
-
-def make_public(static_source: Path, public_source: Path) -> None:
-    if not clean_start(public_source):
-        msg = "Website's public resources could not be generated"
-        sys.exit(msg)
-
-    static_dir: str = str(pathlib.Path(static_source).resolve())
-    public_dir: str = str(pathlib.Path(public_source).resolve())
-
-    static_list: list[str] = list_directory(static_dir)
-    to_replicate: dict[str, list[tuple[str, str]]] = paths_to_create(
-        static_dir, public_dir, static_list
-    )
-
-    dirs_to_create: list[tuple[str, str]] | None = to_replicate.get("dirs")
-    if dirs_to_create:
-        for d in dirs_to_create:
-            new_dir: str = d[1]
-            make_dir(new_dir)  # TODO log the newly created directories
-
-    files_to_copy: list[tuple[str, str]] | None = to_replicate.get("files")
-    if files_to_copy:
-        for file in files_to_copy:
-            file_source: str = file[0]
-            file_dest: str = file[1]
-            copy_file(file_source, file_dest)  # TODO log the newly created files
-
-
-def clean_start(public_dest: Path) -> bool:
+def main(argv: list[str] | None = None) -> None:
+    res, args, options = configure(argv)
     try:
-        # assert directory_depth(public_dest) == 1
-        shutil.rmtree(public_dest)
-        os.mkdir(public_dest)
-        return True
-    except AssertionError:
-        msg = "Public directory cleanup assertion checks failed"
-        sys.exit(msg)
-        return False
-    except:  # TODO naked exception should be better handled
-        return False
-
-
-def list_directory(directory: str, filepaths: list[str] = []) -> list[str]:
-    # TODO needs to go in tertiary file
+        build(res, args, options)
+    except BuildError as e:
+        sys.exit(f"Build failed: {e}")
+    except SOURCE_ERRORS as e:
+        sys.exit(str(e))
+
+
+def build(
+    res: Resources,
+    args: argparse.Namespace,
+    options: BuildOptions,
+    state: BuildState | None = None,
+) -> None:
+    """Builds the site as configured, for main() and the build daemon alike.
+
+    Failures are raised as `BuildError`s or `SOURCE_ERRORS`, and invalid
+    arguments exit. With `state`, outputs whose sources are unchanged since
+    the build it was last used for are kept as they are.
+    """
+    content_only, static_only = selection(args.only, res)
 
-    target_dir: str = str(pathlib.Path(directory).resolve())
-    for node in os.listdir(target_dir):
-        node: str
-        nodepath: str = os.path.join(target_dir, node)
-        if is_file(node):
-            filepaths.append(nodepath)
+    try:
+        writer: OutputWriter = open_writer(
+            res.public, args.archive, args.archive_format, options.bounded_memory
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+
+    # progress messages must not end up inside an archive streamed to stdout
+    progress = sys.stderr if args.archive == "-" else sys.stdout
+    with writer, contextlib.redirect_stdout(progress):
+        make_public(res.static, res.public, writer, state, static_only)
+        # generate_page(res.markdown_index, res.page_template, res.html_index)
+        generate_pages_recursive(
+            res.content,
+            res.page_template,
+            res.public,
+            options,
+            writer,
+            state,
+            content_only,
+        )
+
+        if isinstance(writer, DirectoryWriter):
+            if options.service_worker:
+                write_service_worker(
+                    writer, options.cache_dir, options.precache_budget, args.only is not None
+                )
+            # a partial build leaves outputs outside its selection alone
+            if args.only is None:
+                writer.prune()
+            writer.write_changes(args.changes or res.cache / "changes.json")
+
+
+def configure(
+    argv: list[str] | None = None,
+) -> tuple[Resources, argparse.Namespace, BuildOptions]:
+    res = Resources()
+    args: argparse.Namespace = parse_args(argv)
+    if args.content:
+        res.set_content = args.content
+    if args.static:
+        res.set_static = args.static
+    if args.template:
+        res.set_page_template = args.template
+    if args.public:
+        res.set_public = args.public
+    return res, args, build_options(args, res)
+
+
+def selection(
+    only: list[str] | None, res: Resources
+) -> tuple[list[str] | None, list[str] | None]:
+    """Splits `--only` paths into names within the content and static trees.
+
+    Returns None for a tree when the build is not partial.
+    """
+    if only is None:
+        return None, None
+
+    content_only: list[str] = []
+    static_only: list[str] = []
+    trees: list[tuple[str, list[str]]] = [
+        (os.path.abspath(res.content), content_only),
+        (os.path.abspath(res.static), static_only),
+    ]
+    for path in only:
+        selected: str = os.path.abspath(path)
+        for root, names in trees:
+            if selected == root or selected.startswith(root + os.sep):
+                names.append(os.path.relpath(selected, root).replace(os.sep, "/"))
+                break
         else:
-            filepaths.append(nodepath + "/")
-            list_directory(nodepath, filepaths)
-
-    return filepaths
+            sys.exit(f"--only {path} is not within {res.content} or {res.static}")
+    # selecting a whole tree is the same as not restricting it
+    return (
+        None if "." in content_only else content_only,
+        None if "." in static_only else static_only,
+    )
 
 
-def paths_to_create(
-    source: str, destination: str, source_tree: list[str]
-) -> dict[str, list[tuple[str, str]]]:
-    # TODO needs to go in tertiary file
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        epilog="Sources may be zip or tar(.gz) archives, e.g. site.zip!content",
+    )
+    parser.add_argument("--content", help="markdown source tree")
+    parser.add_argument("--static", help="static resources tree")
+    parser.add_argument("--template", help="html page template")
+    parser.add_argument("--public", help="output directory")
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        action="extend",
+        metavar="PATH",
+        help="build only these content or static files and directories, "
+        "e.g. content/majesty, leaving other outputs untouched",
+    )
+    parser.add_argument(
+        "--critical-css",
+        action="store_true",
+        help="inline the stylesheet rules each page uses, load the rest async",
+    )
+    parser.add_argument(
+        "--inline-assets-below",
+        type=int,
+        default=0,
+        metavar="BYTES",
+        help="embed images smaller than BYTES as base64 data URIs",
+    )
+    parser.add_argument(
+        "--archive",
+        metavar="PATH",
+        help="write the site into a zip or tar(.gz) archive (`-` for stdout)",
+    )
+    parser.add_argument(
+        "--archive-format",
+        choices=ARCHIVE_FORMATS,
+        help="archive format, when it cannot be inferred from PATH",
+    )
+    parser.add_argument(
+        "--bounded-memory",
+        action="store_true",
+        help="cap memory use of --archive builds regardless of site size (see manifest.py)",
+    )
+    parser.add_argument(
+        "--parse-budget",
+        type=float,
+        default=0,
+        metavar="SECONDS",
+        help="fail the build when a page takes longer than SECONDS to parse",
+    )
+    parser.add_argument(
+        "--ast-cache",
+        action="store_true",
+        help="reuse parsed markdown of unchanged pages from earlier builds",
+    )
+    parser.add_argument(
+        "--artifact-cache",
+        default=os.environ.get("SSG_ARTIFACT_CACHE", ""),
+        metavar="DIR|URL",
+        help="fetch and store rendered pages in a shared directory or http store",
+    )
+    parser.add_argument(
+        "--section-pages",
+        type=int,
+        default=0,
+        metavar="N",
+        help="generate index pages listing N pages each for every content directory",
+    )
+    parser.add_argument(
+        "--section-sort",
+        choices=SORT_ORDERS,
+        default="date",
+        help="order of section index pages, newest front-matter date first or by title",
+    )
+    parser.add_argument(
+        "--site-url",
+        default="",
+        metavar="URL",
+        help="public url of the site, e.g. https://example.com, for --sitemap and --feed",
+    )
+    parser.add_argument(
+        "--sitemap",
+        action="store_true",
+        help="write sitemap.xml, split into a sitemap index past 50,000 pages",
+    )
+    parser.add_argument(
+        "--feed",
+        type=int,
+        default=0,
+        metavar="N",
+        help="write an Atom feed.xml of the N newest pages",
+    )
+    parser.add_argument(
+        "--resource-hints",
+        type=int,
+        default=0,
+        metavar="N",
+        help="prefetch up to N linked pages and preload the first N images of each page",
+    )
+    parser.add_argument(
+        "--service-worker",
+        action="store_true",
+        help="write a service worker precaching the site for offline use",
+    )
+    parser.add_argument(
+        "--precache-budget",
+        type=int,
+        default=BuildOptions.precache_budget,
+        metavar="BYTES",
+        help="precache outputs up to BYTES in total, fetching the rest at runtime",
+    )
+    parser.add_argument(
+        "--table-page-rows",
+        type=int,
+        default=0,
+        metavar="N",
+        help="split pages whose included table has over N rows into several pages",
+    )
+    parser.add_argument(
+        "--split-page-bytes",
+        type=int,
+        default=0,
+        metavar="BYTES",
+        help="split pages of over BYTES of markdown into parts at headings",
+    )
+    parser.add_argument(
+        "--split-page-blocks",
+        type=int,
+        default=0,
+        metavar="N",
+        help="split pages of over N markdown blocks into parts at headings",
+    )
+    parser.add_argument(
+        "--memprofile",
+        type=int,
+        nargs="?",
+        const=10,
+        default=0,
+        metavar="N",
+        help="trace the memory each page's stages use and report the N largest pages (default 10)",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        default=0,
+        metavar="BYTES",
+        help="fail the build when building a page takes over BYTES of memory at its peak",
+    )
+    parser.add_argument(
+        "--changes",
+        metavar="PATH",
+        help="where to write the json list of added, changed and removed "
+        "output files (default .cache/changes.json)",
+    )
+    args: argparse.Namespace = parser.parse_args(argv)
+    if (args.sitemap or args.feed) and not args.site_url:
+        parser.error("--sitemap and --feed need --site-url")
+    if args.service_worker and args.archive:
+        parser.error("--service-worker needs a directory output, not --archive")
+    return args
+
+
+def build_options(args: argparse.Namespace, res: Resources) -> BuildOptions:
+    return BuildOptions(
+        critical_css=args.critical_css,
+        stylesheet=join_spec(res.static, "index.css"),
+        inline_assets_below=args.inline_assets_below,
+        assets_dir=str(res.static),
+        bounded_memory=args.bounded_memory,
+        parse_budget=args.parse_budget,
+        ast_cache=args.ast_cache,
+        artifact_cache=args.artifact_cache,
+        section_pages=args.section_pages,
+        section_sort=args.section_sort,
+        site_url=args.site_url,
+        sitemap=args.sitemap,
+        feed_entries=args.feed,
+        resource_hints=args.resource_hints,
+        service_worker=args.service_worker,
+        precache_budget=args.precache_budget,
+        table_page_rows=args.table_page_rows,
+        split_page_bytes=args.split_page_bytes,
+        split_page_blocks=args.split_page_blocks,
+        memprofile=args.memprofile,
+        memory_budget=args.memory_budget,
+        cache_dir=str(res.cache),
+    )
 
-    dest: str = str(pathlib.Path(destination).resolve())
-    src: str = str(pathlib.Path(source).resolve())
 
-    if not (os.path.isdir(dest) and os.path.isdir(src)):
-        msg = "Both source and destination must be directories"
-        sys.exit(msg)
+def make_public(
+    static_source: Path,
+    public_source: Path,
+    writer: OutputWriter | None = None,
+    state: BuildState | None = None,
+    only: list[str] | None = None,
+) -> None:
+    writer = writer or open_writer(public_source)
 
-    paths: dict = defaultdict(list)
-    for p in source_tree:
-        pathdiff: str = os.path.relpath(p, src)
-        new_path: str = os.path.join(dest, pathdiff)
-        old_path: str = str(pathlib.Path(p).resolve())
+    with open_source(static_source) as static:
+        static: SourceTree
+        for file_source, file_dest in paths_to_create(static, public_source, only):
+            if file_source.endswith("/"):
+                writer.make_dir(file_dest)  # TODO log the newly created directories
+                continue
 
-        if is_file(new_path):
-            paths["files"].append((old_path, new_path))
-        else:
-            paths["dirs"].append((old_path, new_path))
+            if state is not None:
+                key: tuple = static.stat_key(file_source)
+                if state.unchanged(file_dest, key):
+                    writer.keep(file_dest)
+                    continue
 
-    return paths
+            # TODO log the newly created files
+            writer.copy_from(static, file_source, file_dest)
+            if state is not None:
+                state.record(file_dest, key)
 
 
 def directory_depth(directory: Path) -> int:
@@ -202,23 +352,5 @@ def directory_depth(directory: Path) -> int:
     return len(list(os.walk(directory)))
 
 
-def is_file(filepath: str) -> bool:
-    # TODO needs to go in tertiary file
-    filename: str = pathlib.Path(filepath).name
-    if re.match(r".+\..+", filename):
-        return True
-    return False
-
-
-def make_dir(directory: str) -> None:
-    # TODO needs to go in tertiary file
-    pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
-
-
-def copy_file(source: str, destination: str) -> None:
-    # TODO needs to go in tertiary file
-    shutil.copyfile(source, destination)
-
-
 if __name__ == "__main__":
     main()
@@ -0,0 +1,117 @@
+#!/usr/bin/python3.12
+
+"""On-disk manifests, written in any order and read back sorted by key.
+
+Bounded-memory builds (`--bounded-memory`) record their output entries in
+a `SortedManifest` instead of in memory. Records are sorted in runs of
+`RUN_SIZE` and the runs are merged lazily when the manifest is read; once
+there are `MERGE_WIDTH` runs they are merged into one, so reading never has
+more than `MERGE_WIDTH` runs open. A bounded-memory archive build holds at
+most:
+
+* `RUN_SIZE` manifest records (about 2 MB for typical page paths),
+* a read buffer for each of at most `MERGE_WIDTH` runs,
+* the largest single page or static file being rendered or copied,
+* one sorted directory listing per level of the deepest source path,
+* the member index of any zip or tar source, and, for zip output, one
+  central directory record per entry, which the zip format requires.
+
+Everything else streams from the source walker to the renderer to the writer.
+
+The bound only holds for archive output (`--archive`). A directory build
+also keeps, for each output, its path, to prune what it did not produce,
+and its sha256, for the service worker's precache list; indexes such as
+sections.py and link_graph.py keep an entry per page too.
+"""
+
+
+import heapq
+import itertools
+import json
+import operator
+import os
+import tempfile
+from typing import Iterator, Optional
+
+
+RUN_SIZE: int = 10_000
+MERGE_WIDTH: int = 64
+
+
+class SortedManifest:
+    def __init__(
+        self,
+        run_size: int = RUN_SIZE,
+        directory: Optional[str] = None,
+        merge_width: int = MERGE_WIDTH,
+    ) -> None:
+        self.run_size: int = run_size
+        self.merge_width: int = merge_width
+        self._tmp = tempfile.TemporaryDirectory(prefix="manifest-", dir=directory)
+        self._buffer: list[tuple[str, str]] = []
+        self._runs: list[str] = []
+        self._merges: int = 0
+
+    def __enter__(self) -> "SortedManifest":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add(self, key: str, value: str) -> None:
+        self._buffer.append((key, value))
+        if len(self._buffer) >= self.run_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        run: str = os.path.join(self._tmp.name, f"{len(self._runs):06d}.jsonl")
+        with open(run, "w") as f:
+            # sorting is stable, so records with equal keys keep their order
+            for record in sorted(self._buffer, key=operator.itemgetter(0)):
+                f.write(json.dumps(record) + "\n")
+        self._runs.append(run)
+        self._buffer = []
+        if len(self._runs) >= self.merge_width:
+            self._merge()
+
+    def _merge(self) -> None:
+        """Merges every run into one, which keeps records with equal keys in order."""
+        self._merges += 1
+        merged: str = os.path.join(self._tmp.name, f"merged-{self._merges:06d}.jsonl")
+        with open(merged, "w") as f:
+            for record in self._merged():
+                f.write(json.dumps(record) + "\n")
+        for run in self._runs:
+            os.remove(run)
+        self._runs = [merged]
+
+    def _merged(self) -> Iterator[tuple[str, str]]:
+        runs: list[Iterator[tuple[str, str]]] = [_read_run(r) for r in self._runs]
+        return heapq.merge(*runs, key=operator.itemgetter(0))
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        """Yields every record sorted by key, in insertion order for equal keys."""
+        self._flush()
+        yield from self._merged()
+
+    def latest(self) -> Iterator[tuple[str, str]]:
+        """Yields the last record added for each key, sorted by key."""
+        for key, records in itertools.groupby(self, key=operator.itemgetter(0)):
+            value: str = ""
+            for _, value in records:
+                pass
+            yield key, value
+
+    def close(self) -> None:
+        self._buffer = []
+        self._runs = []
+        self._tmp.cleanup()
+
+
+def _read_run(run: str) -> Iterator[tuple[str, str]]:
+    with open(run) as f:
+        for line in f:
+            key, value = json.loads(line)
+            yield key, value
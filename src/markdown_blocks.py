@@ -4,6 +4,7 @@
 
 from enum import StrEnum, unique
 import re
+from typing import Callable, Optional
 
 
 @unique
@@ -14,6 +15,12 @@ class BlockType(StrEnum):
     QUOTE = "quote"
     UNORDERED_LIST = "unordered_list"
     ORDERED_LIST = "ordered_list"
+    TABLE = "table"
+
+
+# a block including a csv or tsv file as a table: {{ Table data/report.csv }}
+TABLE_OPEN: str = "{{ Table "
+TABLE_CLOSE: str = " }}"
 
 
 def markdown_to_blocks(markdown: str) -> list[str]:
@@ -22,20 +29,100 @@ def markdown_to_blocks(markdown: str) -> list[str]:
     return blocks
 
 
+class BlockSyntaxes:
+    """The block types a block can be, by the first character of its text.
+
+    Each syntax declares the characters a block of its type can start
+    with, and a matcher for the rest. The syntaxes are compiled into a
+    table from first character to the matchers to try, so a block is only
+    checked against the syntaxes which could match it, and one which none
+    could (most paragraphs) costs one lookup however many are registered.
+    Later registrations are tried first, so an extension can take over a
+    part of a built-in syntax.
+    """
+
+    def __init__(self) -> None:
+        self._syntaxes: list[tuple[str, str, Callable[[str], bool]]] = []
+        self._dispatch: Optional[dict[str, tuple[tuple[str, Callable[[str], bool]], ...]]] = None
+
+    def __repr__(self) -> str:
+        return f"BlockSyntaxes({[name for name, _, _ in self._syntaxes]})"
+
+    def register(self, name: str, triggers: str, match: Callable[[str], bool]) -> None:
+        if not triggers:
+            raise ValueError(f"Block syntax `{name}` has no leading characters")
+        self.unregister(name)
+        self._syntaxes.insert(0, (name, triggers, match))
+        self._dispatch = None
+
+    def unregister(self, name: str) -> None:
+        self._syntaxes = [s for s in self._syntaxes if s[0] != name]
+        self._dispatch = None
+
+    def names(self) -> list[str]:
+        return [name for name, _, _ in self._syntaxes]
+
+    def _compile(self) -> dict[str, tuple[tuple[str, Callable[[str], bool]], ...]]:
+        dispatch: dict[str, list[tuple[str, Callable[[str], bool]]]] = {}
+        for name, triggers, match in self._syntaxes:
+            for char in dict.fromkeys(triggers):
+                dispatch.setdefault(char, []).append((name, match))
+        self._dispatch = {char: tuple(syntaxes) for char, syntaxes in dispatch.items()}
+        return self._dispatch
+
+    def classify(self, block: str) -> str:
+        dispatch = self._dispatch if self._dispatch is not None else self._compile()
+        for name, match in dispatch.get(block[:1], ()):
+            if match(block):
+                return name
+        return BlockType.PARAGRAPH.value
+
+
 def block_to_block_type(block: str) -> str:
+    return BLOCK_SYNTAXES.classify(block)
+
+
+def _is_heading(block: str) -> bool:
+    return re.match(r"^#{1,6} \S+", block) is not None
+
+
+def _is_quote(block: str) -> bool:
+    return all(re.match(r"^>", line) for line in block.split("\n"))
+
+
+def _is_unordered_list(block: str) -> bool:
+    return all(re.match(r"[*|-] ", line) for line in block.split("\n"))
+
+
+def _is_ordered_list(block: str) -> bool:
+    return all(line.startswith(f"{n}. ") for n, line in enumerate(block.split("\n"), 1))
+
+
+def is_code_fence(block: str) -> bool:
+    # same as matching ^```[\s\S]*?```$ on a stripped block, without the regex
+    return len(block) >= 6 and block.startswith("```") and block.endswith("```")
+
+
+def table_include(block: str) -> str | None:
+    """The data file a table include block names, or None if it is not one."""
+    if not (block.startswith(TABLE_OPEN) and block.endswith(TABLE_CLOSE)):
+        return None
+    path: str = block[len(TABLE_OPEN) : -len(TABLE_CLOSE)].strip()
+    return path if path and "\n" not in path else None
+
+
+def _is_table_include(block: str) -> bool:
+    return table_include(block) is not None
+
 
-    if re.match(r"^#{1,6} \S+", block):
-        return BlockType.HEADING.value
-    if re.match(r"^```[\s\S]*?```$", block):
-        return BlockType.CODE.value
-    if all(re.match(r"^>", line) for line in block.split("\n")):
-        return BlockType.QUOTE.value
-    if all(re.match(r"[*|-] ", line) for line in block.split("\n")):
-        return BlockType.UNORDERED_LIST.value
-    if all(line.startswith(f"{n}. ") for n, line in enumerate(block.split("\n"), 1)):
-        return BlockType.ORDERED_LIST.value
-
-    return BlockType.PARAGRAPH.value
+# the built-in syntaxes, paragraphs being the blocks none of them match
+BLOCK_SYNTAXES: BlockSyntaxes = BlockSyntaxes()
+BLOCK_SYNTAXES.register(BlockType.ORDERED_LIST.value, "1", _is_ordered_list)
+BLOCK_SYNTAXES.register(BlockType.UNORDERED_LIST.value, "*|-", _is_unordered_list)
+BLOCK_SYNTAXES.register(BlockType.QUOTE.value, ">", _is_quote)
+BLOCK_SYNTAXES.register(BlockType.TABLE.value, TABLE_OPEN[0], _is_table_include)
+BLOCK_SYNTAXES.register(BlockType.CODE.value, "`", is_code_fence)
+BLOCK_SYNTAXES.register(BlockType.HEADING.value, "#", _is_heading)
 
 
 if __name__ == "__main__":
@@ -5,11 +5,26 @@
 
 from enum import StrEnum, unique
 import re
+from typing import Callable, Iterable, Iterator, Optional
 
-from htmlnode import LeafNode, ParentNode
-from inline_markdown import text_to_textnodes
-from markdown_blocks import BlockType, markdown_to_blocks, block_to_block_type
-from textnode import TextNode, text_node_to_html_node
+from data_tables import table_marker
+from highlight import highlight, language_of
+from htmlnode import HTMLNode, LeafNode, ParentNode
+from inline_markdown import inline_names, text_to_textnodes
+from markdown_blocks import (
+    BLOCK_SYNTAXES,
+    BlockType,
+    markdown_to_blocks,
+    block_to_block_type,
+    is_code_fence,
+    table_include,
+)
+from textnode import TextNode, TextType, text_node_to_html_node
+
+
+_non_slug: re.Pattern = re.compile(r"[^\w\s-]")
+
+type Renderer = Callable[[ParsedBlock, Optional[TableOfContents]], HTMLNode]
 
 
 @unique
@@ -24,55 +39,186 @@ class BlockTag(StrEnum):
     ORDERED_LIST = "ol"
 
 
-def markdown_to_html_node(markdown: str) -> ParentNode:
+class ParsedBlock:
+    """A markdown block, parsed into its type and the inline text of each part.
+
+    Paragraphs, quotes, headings and code blocks have a single part; lists
+    have one per item. A code block's part is one literal text node, and its
+    `info` the fence's info string; a table include has no parts, and its
+    `info` is the data file. This is what renderers build HTML from, and
+    what the AST cache (ast_cache.py) stores.
+    """
+
+    def __init__(
+        self,
+        block_type: str,
+        parts: list[list[TextNode]],
+        level: int = 0,
+        info: str = "",
+    ) -> None:
+        self.block_type: str = block_type
+        self.parts: list[list[TextNode]] = parts
+        self.level: int = level
+        self.info: str = info
+
+    def __eq__(self, other) -> bool:
+        return vars(self) == vars(other)
+
+    def __repr__(self) -> str:
+        _name: str = type(self).__name__
+        _args: Iterator[str] = (f"{v!r}" for v in vars(self).values())
+        return f"{_name}({', '.join((_args))})"
+
+
+class TableOfContents:
+    """The headings of a page, collected while its html tree is built.
+
+    Each heading gets a slug id which is unique within the page: repeated
+    headings are numbered `-1`, `-2`, ... in order, so ids stay stable as
+    long as the headings before them do. `taken` are ids already used, by
+    earlier parts of a page which is split (page_split.py).
+    """
+
+    def __init__(self, taken: Iterable[str] = ()) -> None:
+        self.entries: list[tuple[int, str, str]] = []
+        self._slugs: set[str] = set(taken)
+
+    def __repr__(self) -> str:
+        _name: str = type(self).__name__
+        return f"{_name}({self.entries!r})"
+
+    def add(self, level: int, text: str) -> str:
+        """Records a heading, returning its id."""
+        base: str = slugify(text)
+        slug: str = base
+        n: int = 0
+        while slug in self._slugs:
+            n += 1
+            slug = f"{base}-{n}"
+        self._slugs.add(slug)
+        self.entries.append((level, text, slug))
+        return slug
+
+    def to_html_node(self, hrefs: Optional[dict[str, str]] = None) -> Optional[ParentNode]:
+        """Nests the headings into lists of links by level.
+
+        Links go to `#id` on the same page, or to `hrefs[id]` if given.
+        """
+        if not self.entries:
+            return None
+
+        tag: str = BlockTag.UNORDERED_LIST.value
+        root = ParentNode(tag=tag, children=[])
+        # the open lists, each with its level and the last item added to it
+        stack: list[tuple[int, ParentNode, Optional[ParentNode]]] = [
+            (self.entries[0][0], root, None)
+        ]
+        for level, text, slug in self.entries:
+            while len(stack) > 1 and level < stack[-1][0]:
+                stack.pop()
+            list_level, list_node, last_item = stack[-1]
+            if level > list_level and last_item is not None:
+                nested = ParentNode(tag=tag, children=[])
+                last_item.children.append(nested)
+                stack.append((level, nested, None))
+                list_node = nested
+
+            href: str = (hrefs or {}).get(slug, f"#{slug}")
+            link = LeafNode(tag="a", value=text, props={"href": href})
+            item = ParentNode(tag=BlockTag.LIST.value, children=[link])
+            list_node.children.append(item)
+            stack[-1] = (stack[-1][0], list_node, item)
+
+        return ParentNode(tag="nav", children=[root], props={"class": "toc"})
+
+
+def slugify(text: str) -> str:
+    slug: str = "-".join(_non_slug.sub("", text.lower()).split())
+    return slug or "section"
+
+
+def markdown_to_html_node(markdown: str, toc: Optional[TableOfContents] = None) -> ParentNode:
+    return blocks_to_html_node(parse_markdown(markdown), toc)
+
+
+def parse_markdown(markdown: str) -> list[ParsedBlock]:
+    return [parse_block(block) for block in markdown_to_blocks(markdown)]
+
+
+def blocks_to_html_node(
+    blocks: list[ParsedBlock], toc: Optional[TableOfContents] = None
+) -> ParentNode:
+    toc = toc if toc is not None else TableOfContents()
     children: list[ParentNode] = []
-    blocks: list[str] = markdown_to_blocks(markdown)
     for block in blocks:
-        html_nodes: ParentNode = block_to_html_node(block)
+        html_nodes: ParentNode = block_to_html_node(block, toc)
         children.append(html_nodes)
 
     return ParentNode(tag="div", children=children)
 
 
-def block_to_html_node(block: str) -> ParentNode:
-    # if block has text, block node will be a parent node
-    # can block not have text? Img?
-
-    block_type: str = block_to_block_type(block)
-    if block_type == BlockType.PARAGRAPH.value:
-        return paragraph_to_html_node(block)
-    if block_type == BlockType.QUOTE.value:
-        return quote_to_html_node(block)
-    if block_type == BlockType.UNORDERED_LIST.value:
-        return unordered_list_to_html_node(block)
-    if block_type == BlockType.HEADING.value:
-        return heading_to_html_node(block)
-    if block_type == BlockType.CODE.value:
-        return code_to_html_node(block)
-    if block_type == BlockType.ORDERED_LIST.value:
-        return ordered_list_to_html_node(block)
-    raise ValueError("Invalid block type")
-
-
-def text_to_html_nodes(text) -> list[LeafNode]:
-    text_nodes: list[TextNode] = text_to_textnodes(text)
+def parse_block(block: str) -> ParsedBlock:
+    return _parsers[block_to_block_type(block)](block)
+
+
+def block_to_html_node(
+    block: ParsedBlock, toc: Optional[TableOfContents] = None
+) -> HTMLNode:
+    render: Optional[Renderer] = _renderers.get(block.block_type)
+    if render is None:
+        raise ValueError("Invalid block type")
+    return render(block, toc)
+
+
+def register_block(
+    name: str,
+    triggers: str,
+    match: Callable[[str], bool],
+    parse: Callable[[str], ParsedBlock],
+    render: Renderer,
+) -> None:
+    """Adds a block syntax, or replaces the one of the same name.
+
+    Blocks starting with one of the `triggers` characters for which
+    `match(block)` is true are parsed by `parse`, which returns a
+    ParsedBlock of type `name`, and rendered by `render(block, toc)`.
+    Name a syntax after its version, e.g. `admonition-2`, when what it
+    parses changes, as parsed pages are cached by the names registered.
+    """
+    BLOCK_SYNTAXES.register(name, triggers, match)
+    _parsers[name] = parse
+    _renderers[name] = render
+
+
+def unregister_block(name: str) -> None:
+    BLOCK_SYNTAXES.unregister(name)
+    _parsers.pop(name, None)
+    _renderers.pop(name, None)
+
+
+def syntax_names() -> tuple[str, ...]:
+    """The block and inline syntaxes registered, which cached pages depend on."""
+    return (*BLOCK_SYNTAXES.names(), "|", *inline_names())
+
+
+def text_to_html_nodes(text_nodes: list[TextNode]) -> list[LeafNode]:
     html_nodes: list[LeafNode] = [text_node_to_html_node(tn) for tn in text_nodes]
     return html_nodes
 
 
-def paragraph_to_html_node(block: str) -> ParentNode:
-    tag: str = BlockTag.PARAGRAPH.value
-
+def parse_paragraph(block: str) -> ParsedBlock:
     lines: list[str] = block.split("\n")
     paragraph: str = " ".join(lines)
-    children: list[LeafNode] = text_to_html_nodes(paragraph)
+    return ParsedBlock(BlockType.PARAGRAPH.value, [text_to_textnodes(paragraph)])
 
-    return ParentNode(tag=tag, children=children)
 
+def paragraph_to_html_node(block: ParsedBlock) -> ParentNode:
+    tag: str = BlockTag.PARAGRAPH.value
+    children: list[LeafNode] = text_to_html_nodes(block.parts[0])
+    return ParentNode(tag=tag, children=children)
 
-def quote_to_html_node(block: str) -> ParentNode:
-    tag: str = BlockTag.QUOTE.value
 
+def parse_quote(block: str) -> ParsedBlock:
     formatted_lines: list[str] = []
     for line in block.split("\n"):
         if not line.startswith(">"):
@@ -81,44 +227,89 @@ def quote_to_html_node(block: str) -> ParentNode:
             formatted_lines.append(line.lstrip("> ").strip())
 
     formatted_block: str = " ".join(formatted_lines)
-    children: list[LeafNode] = text_to_html_nodes(formatted_block)
+    return ParsedBlock(BlockType.QUOTE.value, [text_to_textnodes(formatted_block)])
+
 
+def quote_to_html_node(block: ParsedBlock) -> ParentNode:
+    tag: str = BlockTag.QUOTE.value
+    children: list[LeafNode] = text_to_html_nodes(block.parts[0])
     return ParentNode(tag=tag, children=children)
 
 
-def heading_to_html_node(block: str) -> ParentNode:
-    basetag: str = BlockTag.HEADING.value
+def parse_heading(block: str) -> ParsedBlock:
     m: re.Match[str] | None = re.match(r"^#{1,6}", block)
     if not m:
         raise ValueError("Invalid markdown: header cannot be coerced to HTML")
-    tag: str = f"{basetag}{m.end()}"
 
     header_text: str = block.lstrip("#").strip()
-    children: list[LeafNode] = text_to_html_nodes(header_text)
+    return ParsedBlock(
+        BlockType.HEADING.value, [text_to_textnodes(header_text)], level=m.end()
+    )
 
-    return ParentNode(tag=tag, children=children)
 
+def heading_text(block: ParsedBlock) -> str:
+    """A heading's text without its inline markup, which its id is made from."""
+    return "".join(n.text for n in block.parts[0])
 
-def code_to_html_node(block: str) -> ParentNode:
-    tag: str = BlockTag.PREFORMATTED.value
-    subtag: str = BlockTag.CODE.value
 
-    m: re.Match[str] | None = re.match(r"^```(?P<code>[\s\S]*?)```$", block)
-    if not m:
+def heading_to_html_node(
+    block: ParsedBlock, toc: Optional[TableOfContents] = None
+) -> ParentNode:
+    basetag: str = BlockTag.HEADING.value
+    tag: str = f"{basetag}{block.level}"
+    children: list[LeafNode] = text_to_html_nodes(block.parts[0])
+
+    toc = toc if toc is not None else TableOfContents()
+    heading_id: str = toc.add(block.level, heading_text(block))
+    return ParentNode(tag=tag, children=children, props={"id": heading_id})
+
+
+def parse_code(block: str) -> ParsedBlock:
+    if not is_code_fence(block):
         raise ValueError("Valid code could not be extracted from codeblock")
 
-    extracted_code: str = m.group("code")
-    children: list[LeafNode] = text_to_html_nodes(extracted_code)
-    subnodes = ParentNode(tag=subtag, children=children)
+    # an info string (```` ```python ````) runs up to the first newline;
+    # the code itself is literal text, without inline markdown
+    info: str = ""
+    extracted_code: str = block[3:-3]
+    newline: int = extracted_code.find("\n")
+    if newline != -1:
+        info = extracted_code[:newline].strip()
+        extracted_code = extracted_code[newline + 1 :]
+    return ParsedBlock(
+        BlockType.CODE.value, [[TextNode(extracted_code, TextType.TEXT)]], info=info
+    )
+
+
+def code_to_html_node(block: ParsedBlock) -> ParentNode:
+    tag: str = BlockTag.PREFORMATTED.value
+    subtag: str = BlockTag.CODE.value
+
+    code: str = "".join(n.text for n in block.parts[0])
+    language: str = language_of(block.info)
+    props: Optional[dict[str, str]] = (
+        {"class": f"language-{language}"} if language else None
+    )
+    highlighted = LeafNode(tag=None, value=highlight(code, block.info))
+    subnodes = ParentNode(tag=subtag, children=[highlighted], props=props)
 
     return ParentNode(tag=tag, children=[subnodes])
 
 
-def unordered_list_to_html_node(block: str) -> ParentNode:
-    tag: str = BlockTag.UNORDERED_LIST.value
-    subtag: str = BlockTag.LIST.value
+def parse_table(block: str) -> ParsedBlock:
+    path: Optional[str] = table_include(block)
+    if path is None:
+        raise ValueError("Invalid markdown: table include names no data file")
+    return ParsedBlock(BlockType.TABLE.value, [], info=path)
 
-    list_subnodes: list[ParentNode] = []
+
+def table_to_html_node(block: ParsedBlock) -> LeafNode:
+    # the rows are streamed into the page as it is written (data_tables.py)
+    return LeafNode(tag=None, value=table_marker(block.info))
+
+
+def parse_unordered_list(block: str) -> ParsedBlock:
+    items: list[list[TextNode]] = []
     for line in block.split("\n"):
         if line.startswith("* "):
             fmt_line: str = line.lstrip("* ").strip()
@@ -127,26 +318,60 @@ def unordered_list_to_html_node(block: str) -> ParentNode:
         else:
             msg = "Invalid markdown: list elements could not be coerced"
             raise ValueError(msg)
+        items.append(text_to_textnodes(fmt_line))
 
-        line_children: list[LeafNode] = text_to_html_nodes(fmt_line)
-        list_subnodes.append(ParentNode(tag=subtag, children=line_children))
+    return ParsedBlock(BlockType.UNORDERED_LIST.value, items)
 
-    return ParentNode(tag=tag, children=list_subnodes)
 
+def unordered_list_to_html_node(block: ParsedBlock) -> ParentNode:
+    return _list_to_html_node(BlockTag.UNORDERED_LIST.value, block)
 
-def ordered_list_to_html_node(block: str) -> ParentNode:
-    tag: str = BlockTag.ORDERED_LIST.value
-    subtag: str = BlockTag.LIST.value
 
-    list_subnodes: list[ParentNode] = []
+def parse_ordered_list(block: str) -> ParsedBlock:
+    items: list[list[TextNode]] = []
     for line in block.split("\n"):
         fmt_line: str = re.sub(r"^\d\. ", "", line).strip()
-        line_children: list[LeafNode] = text_to_html_nodes(fmt_line)
+        items.append(text_to_textnodes(fmt_line))
+
+    return ParsedBlock(BlockType.ORDERED_LIST.value, items)
+
+
+def ordered_list_to_html_node(block: ParsedBlock) -> ParentNode:
+    return _list_to_html_node(BlockTag.ORDERED_LIST.value, block)
+
+
+def _list_to_html_node(tag: str, block: ParsedBlock) -> ParentNode:
+    subtag: str = BlockTag.LIST.value
+
+    list_subnodes: list[ParentNode] = []
+    for item in block.parts:
+        line_children: list[LeafNode] = text_to_html_nodes(item)
         list_subnodes.append(ParentNode(tag=subtag, children=line_children))
 
     return ParentNode(tag=tag, children=list_subnodes)
 
 
+# the built-in syntaxes, see register_block()
+_parsers: dict[str, Callable[[str], ParsedBlock]] = {
+    BlockType.PARAGRAPH.value: parse_paragraph,
+    BlockType.QUOTE.value: parse_quote,
+    BlockType.UNORDERED_LIST.value: parse_unordered_list,
+    BlockType.HEADING.value: parse_heading,
+    BlockType.CODE.value: parse_code,
+    BlockType.ORDERED_LIST.value: parse_ordered_list,
+    BlockType.TABLE.value: parse_table,
+}
+_renderers: dict[str, Renderer] = {
+    BlockType.PARAGRAPH.value: lambda block, toc: paragraph_to_html_node(block),
+    BlockType.QUOTE.value: lambda block, toc: quote_to_html_node(block),
+    BlockType.UNORDERED_LIST.value: lambda block, toc: unordered_list_to_html_node(block),
+    BlockType.HEADING.value: heading_to_html_node,
+    BlockType.CODE.value: lambda block, toc: code_to_html_node(block),
+    BlockType.ORDERED_LIST.value: lambda block, toc: ordered_list_to_html_node(block),
+    BlockType.TABLE.value: lambda block, toc: table_to_html_node(block),
+}
+
+
 if __name__ == "__main__":
     from pprint import pprint
 
@@ -162,3 +387,4 @@ This is a paragraph of text. It has some **bold** and *italic* words inside of i
 
     html: ParentNode = markdown_to_html_node(markdown)
     pprint(html)
+
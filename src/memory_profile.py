@@ -0,0 +1,164 @@
+#!/usr/bin/python3.12
+
+"""Per-page memory use of a build, for `--memprofile` and `--memory-budget`.
+
+While profiling, tracemalloc traces the build. Each page's read, parse,
+render and write stages are measured between two snapshots:
+
+- A stage's net allocation is what it allocated and still held when it
+  ended, with the source line which allocated the most of it.
+- A page's peak is the most memory traced at any point while it was
+  built, above what was traced when its build started.
+- The process's peak RSS is recorded after each page. It is a high water
+  mark, so it only goes up; the page at which it jumped is the one to look at.
+
+A page's stages repeat when it is split into parts, and are added up.
+Snapshots copy every trace, so profiling slows a build down considerably.
+"""
+
+
+import contextlib
+import heapq
+import itertools
+import sys
+import tracemalloc
+from typing import ContextManager, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # not on Windows, where peak RSS is not reported
+    resource = None
+
+
+STAGES: tuple[str, ...] = ("read", "parse", "render", "write")
+
+# the profiler's own allocations, such as the snapshots being compared
+_OWN_TRACES: tuple[tracemalloc.Filter, ...] = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+class PageMemory:
+    def __init__(self, source: str) -> None:
+        self.source: str = source
+        self.net: dict[str, int] = dict.fromkeys(STAGES, 0)
+        # the source line which allocated most of each stage's net allocation
+        self.sites: dict[str, str] = {}
+        self.peak: int = 0
+        self.peak_stage: str = ""
+        self.peak_rss: int = 0
+
+    def __repr__(self) -> str:
+        return f"PageMemory({vars(self)})"
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        held: int = sum(self.net.values())
+        before: tracemalloc.Snapshot = tracemalloc.take_snapshot().filter_traces(_OWN_TRACES)
+        tracemalloc.reset_peak()
+        started: int = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            peak: int = tracemalloc.get_traced_memory()[1]
+            after: tracemalloc.Snapshot = tracemalloc.take_snapshot().filter_traces(_OWN_TRACES)
+            growth: list[tracemalloc.StatisticDiff] = after.compare_to(before, "lineno")
+            self.net[name] += sum(diff.size_diff for diff in growth)
+            if growth and growth[0].size_diff > 0:
+                self.sites[name] = str(growth[0].traceback[0])
+            if held + peak - started > self.peak:
+                self.peak = held + peak - started
+                self.peak_stage = name
+
+    def summary(self) -> str:
+        stages: str = ", ".join(f"{stage} {_size(self.net[stage], True)}" for stage in STAGES)
+        line: str = (
+            f"{self.source}: peak {_size(self.peak)} in {self.peak_stage or 'no stage'}, "
+            f"RSS {_size(self.peak_rss)}; net {stages}"
+        )
+        if self.peak_stage in self.sites:
+            line += f"; most allocated at {self.sites[self.peak_stage]}"
+        return line
+
+
+def measure(page: Optional[PageMemory], stage: str) -> ContextManager:
+    """Measures a stage of `page`, or nothing when the build is not profiled."""
+    return contextlib.nullcontext() if page is None else page.stage(stage)
+
+
+class MemoryProfiler:
+    """The pages of a build using the most memory, the top `top` of them."""
+
+    def __init__(self, top: int) -> None:
+        self.top: int = top
+        self.pages: int = 0
+        # a min-heap of the largest pages, the counter breaking ties
+        self._largest: list[tuple[int, int, PageMemory]] = []
+        self._counter: Iterator[int] = itertools.count()
+
+    def __repr__(self) -> str:
+        return f"MemoryProfiler({self.pages} pages, top {self.top})"
+
+    def finish(self, page: PageMemory) -> None:
+        page.peak_rss = peak_rss()
+        self.pages += 1
+        if self.top <= 0:
+            return
+        entry: tuple[int, int, PageMemory] = (page.peak, next(self._counter), page)
+        if len(self._largest) < self.top:
+            heapq.heappush(self._largest, entry)
+        else:
+            heapq.heappushpop(self._largest, entry)
+
+    def largest(self) -> list[PageMemory]:
+        return [page for _, _, page in sorted(self._largest, reverse=True)]
+
+    def report(self) -> str:
+        lines: list[str] = [
+            f"Peak memory of the {len(self._largest)} largest of {self.pages} pages "
+            f"(build RSS peak {_size(peak_rss())}):"
+        ]
+        lines.extend(f"  {page.summary()}" for page in self.largest())
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def memory_profiling(top: int, budget: int) -> Iterator[Optional[MemoryProfiler]]:
+    """Traces allocations while profiling or checking a budget, printing the report at the end.
+
+    The report is printed even when the build fails, as that is when it
+    is wanted most.
+    """
+    if top <= 0 and budget <= 0:
+        yield None
+        return
+    started: bool = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    profiler = MemoryProfiler(top)
+    try:
+        yield profiler
+    finally:
+        if started:
+            tracemalloc.stop()
+        if top > 0:
+            print(profiler.report())
+
+
+def peak_rss() -> int:
+    """The most memory the process has had resident, in bytes; 0 where unknown."""
+    if resource is None:
+        return 0
+    max_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _size(n: int, signed: bool = False) -> str:
+    sign: str = "+" if signed and n > 0 else ""
+    for unit in ("B", "KiB", "MiB"):
+        if abs(n) < 1024:
+            return f"{sign}{n:.0f}{unit}" if unit == "B" else f"{sign}{n:.1f}{unit}"
+        n /= 1024
+    return f"{sign}{n:.1f}GiB"
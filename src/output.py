@@ -0,0 +1,494 @@
+#!/usr/bin/python3.12
+
+"""Writers for the website's generated output: a directory tree or an archive."""
+
+
+import contextlib
+import filecmp
+import gzip
+import hashlib
+import io
+import json
+import os
+import pathlib
+import shutil
+import sys
+import tarfile
+import tempfile
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional, Self
+import zipfile
+
+from config import Path
+from manifest import SortedManifest
+from sources import SourceTree, ZipSource
+
+
+# zip timestamps cannot predate 1980, so that is the fixed epoch for both formats
+ARCHIVE_EPOCH: int = 315532800
+ARCHIVE_FORMATS: tuple[str, ...] = ("zip", "tar", "tar.gz")
+
+# directories are None, files copied from disk their path, archive members
+# their source and name, and anything else the bytes written
+type Entry = bytes | str | tuple[SourceTree, str] | None
+
+
+class OutputWriter:
+    """Writes output files given as paths within (or relative to) `root`."""
+
+    writes_to_disk: bool = False
+
+    def __init__(self, root: Path | str = ".") -> None:
+        self.root: pathlib.Path = pathlib.Path(root).resolve()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        # a failed build must not leave output which looks complete
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def name(self, path: Path | str) -> str:
+        # plain string operations, as pathlib interns every path component
+        p: str = os.fspath(path)
+        if os.path.isabs(p):
+            p = os.path.relpath(os.path.abspath(p), self.root)
+            if p == os.pardir or p.startswith(os.pardir + os.sep):
+                raise ValueError(f"{path} is not within {self.root}")
+        return p.replace(os.sep, "/")
+
+    def make_dir(self, path: Path | str) -> None:
+        raise NotImplementedError
+
+    def write_bytes(self, path: Path | str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def write_stream(self, path: Path | str, chunks: Iterable[bytes]) -> None:
+        """Writes a file given in chunks, e.g. as it is rendered."""
+        self.write_bytes(path, b"".join(chunks))
+
+    def copy_file(self, source: Path | str, path: Path | str) -> None:
+        raise NotImplementedError
+
+    def keep(self, path: Path | str) -> None:
+        """Marks an output as produced by this build, as it is up to date."""
+        return
+
+    def exists(self, path: Path | str) -> bool:
+        """Whether an earlier build's output at `path` can be kept as is."""
+        return False
+
+    def copy_from(self, source: SourceTree, name: str, path: Path | str) -> None:
+        local: Optional[str] = source.local_path(name)
+        if local is not None:
+            self.copy_file(local, path)
+        else:
+            self.write_bytes(path, source.read_bytes(name))
+
+    def close(self) -> None:
+        return
+
+    def abort(self) -> None:
+        """Ends a failed build, without finishing its output."""
+        return
+
+
+class DirectoryWriter(OutputWriter):
+    """Writes into a directory tree, leaving files whose contents are unchanged.
+
+    Files are written aside and renamed into place, so a reader (or a sync
+    running alongside the build) never sees a partly written file, and a
+    file whose new contents equal the old keeps its mtime. After a build,
+    `prune()` removes the files it did not produce, and `changes()` lists
+    what was added, changed and removed, e.g. for purging a CDN.
+    """
+
+    writes_to_disk: bool = True
+
+    def __init__(self, root: Path | str = ".") -> None:
+        super().__init__(root)
+        self._produced: set[str] = set()
+        self._added: list[str] = []
+        self._changed: list[str] = []
+        self._removed: list[str] = []
+        # sha256 of each file written through write_bytes, by name
+        self.digests: dict[str, str] = {}
+
+    def _target(self, path: Path | str) -> str:
+        p: str = os.fspath(path)
+        return os.path.abspath(p if os.path.isabs(p) else os.path.join(self.root, p))
+
+    def make_dir(self, path: Path | str) -> None:
+        target: str = self._target(path)
+        self._produced.add(target)
+        os.makedirs(target, exist_ok=True)
+
+    def keep(self, path: Path | str) -> None:
+        self._produced.add(self._target(path))
+
+    def exists(self, path: Path | str) -> bool:
+        return os.path.isfile(self._target(path))
+
+    def produced(self, path: Path | str) -> bool:
+        """Whether this build wrote or kept `path`, so `prune()` leaves it."""
+        return self._target(path) in self._produced
+
+    def write_bytes(self, path: Path | str, data: bytes) -> None:
+        target: str = self._target(path)
+        self.digests[self.name(target)] = hashlib.sha256(data).hexdigest()
+        if _has_contents(target, data):
+            self.keep(target)
+            return
+        self._replace(target, lambda tmp: _write(tmp, data))
+
+    def write_stream(self, path: Path | str, chunks: Iterable[bytes]) -> None:
+        target: str = self._target(path)
+        sha = hashlib.sha256()
+
+        def write(tmp: str) -> None:
+            with open(tmp, "wb") as f:
+                for chunk in chunks:
+                    sha.update(chunk)
+                    f.write(chunk)
+
+        # the contents are only known once written, so are compared after
+        self._replace(target, write, compare=True)
+        self.digests[self.name(target)] = sha.hexdigest()
+
+    def copy_file(self, source: Path | str, path: Path | str) -> None:
+        target: str = self._target(path)
+        if os.path.isfile(target) and filecmp.cmp(source, target, shallow=False):
+            self.keep(target)
+            return
+        self._replace(target, lambda tmp: shutil.copyfile(source, tmp))
+
+    def _replace(
+        self, target: str, write: Callable[[str], object], compare: bool = False
+    ) -> None:
+        directory: str = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        existed: bool = os.path.exists(target)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp)
+            if compare and existed and filecmp.cmp(tmp, target, shallow=False):
+                os.remove(tmp)
+                self.keep(target)
+                return
+            # mkstemp creates files only their owner can read
+            os.chmod(tmp, _FILE_MODE)
+            os.replace(tmp, target)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp)
+            raise
+
+        self.keep(target)
+        (self._changed if existed else self._added).append(self.name(target))
+
+    def prune(self) -> list[str]:
+        """Removes the files and directories under `root` which were not produced."""
+        for directory, dirnames, filenames in os.walk(self.root, topdown=False):
+            for filename in filenames:
+                path: str = os.path.join(directory, filename)
+                if path not in self._produced:
+                    os.remove(path)
+                    self._removed.append(self.name(path))
+            for dirname in dirnames:
+                path: str = os.path.join(directory, dirname)
+                if path not in self._produced and not os.listdir(path):
+                    os.rmdir(path)
+        return self._removed
+
+    def changes(self) -> dict[str, list[str]]:
+        return {
+            "added": sorted(self._added),
+            "changed": sorted(self._changed),
+            "removed": sorted(self._removed),
+        }
+
+    def write_changes(self, manifest: Path | str) -> None:
+        """Writes `changes()` as json, for deploy tooling to act on."""
+        os.makedirs(os.path.dirname(os.path.abspath(manifest)), exist_ok=True)
+        with open(manifest, "w") as f:
+            json.dump(self.changes(), f, indent=2)
+            f.write("\n")
+
+
+def _current_umask() -> int:
+    umask: int = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+_FILE_MODE: int = 0o666 & ~_current_umask()
+
+
+def _has_contents(path: str, data: bytes) -> bool:
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def _write(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class ArchiveWriter(OutputWriter):
+    """Writes the output as one reproducible zip or tar(.gz) stream.
+
+    Entries are collected while the site builds and written sorted by name,
+    with fixed timestamps and ownership, once the writer is closed. With
+    `bounded_memory`, entries are collected in an on-disk sorted manifest,
+    and written page contents are spilled to a temporary file. A writer
+    left by an exception writes nothing, and removes an archive file it
+    created, so a failed build never produces an archive that looks complete.
+    """
+
+    def __init__(
+        self,
+        root: Path | str,
+        stream: BinaryIO,
+        archive_format: str,
+        bounded_memory: bool = False,
+    ) -> None:
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unsupported archive format `{archive_format}`")
+        super().__init__(root)
+        self.stream: BinaryIO = stream
+        self.archive_format: str = archive_format
+        self._entries: dict[str, Entry] = {}
+        self._manifest: Optional[SortedManifest] = None
+        self._spill: Optional[BinaryIO] = None
+        self._sources: list[SourceTree] = []
+        self._parents: set[str] = set()
+        if bounded_memory:
+            self._manifest = SortedManifest()
+            self._spill = tempfile.TemporaryFile()
+
+    def make_dir(self, path: Path | str) -> None:
+        name: str = self.name(path).rstrip("/")
+        if name and name != ".":
+            self._record(f"{name}/", None)
+
+    def write_bytes(self, path: Path | str, data: bytes) -> None:
+        self._add_parents(self.name(path))
+        self._record(self.name(path), data)
+
+    def write_stream(self, path: Path | str, chunks: Iterable[bytes]) -> None:
+        if self._manifest is None:
+            super().write_stream(path, chunks)
+            return
+        # spilled as it arrives, rather than joined in memory first
+        name: str = self.name(path)
+        self._add_parents(name)
+        offset: int = self._spill.seek(0, io.SEEK_END)
+        size: int = 0
+        for chunk in chunks:
+            self._spill.write(chunk)
+            size += len(chunk)
+        self._manifest.add(name, json.dumps(["data", offset, size]))
+
+    def copy_file(self, source: Path | str, path: Path | str) -> None:
+        self._add_parents(self.name(path))
+        self._record(self.name(path), os.fspath(source))
+
+    def copy_from(self, source: SourceTree, name: str, path: Path | str) -> None:
+        local: Optional[str] = source.local_path(name)
+        if local is not None:
+            self.copy_file(local, path)
+            return
+        self._add_parents(self.name(path))
+        self._record(self.name(path), (source, name))
+
+    def _add_parents(self, name: str) -> None:
+        parts: list[str] = name.split("/")[:-1]
+        parents: set[str] = {f"{'/'.join(parts[:i])}/" for i in range(1, len(parts) + 1)}
+        # entries arrive depth first, so siblings share the previous parents
+        for parent in parents - self._parents:
+            self._record(parent, None)
+        self._parents = parents
+
+    def _record(self, name: str, entry: Entry) -> None:
+        if self._manifest is None:
+            self._entries[name] = entry
+            return
+
+        record: list
+        if entry is None:
+            record = ["dir"]
+        elif isinstance(entry, str):
+            record = ["file", entry]
+        elif isinstance(entry, tuple):
+            source, member = entry
+            if not any(s is source for s in self._sources):
+                self._sources.append(source)
+            index: int = next(i for i, s in enumerate(self._sources) if s is source)
+            record = ["member", index, member]
+        else:
+            offset: int = self._spill.seek(0, io.SEEK_END)
+            self._spill.write(entry)
+            record = ["data", offset, len(entry)]
+        self._manifest.add(name, json.dumps(record))
+
+    def _sorted_entries(self) -> Iterator[tuple[str, Entry]]:
+        if self._manifest is None:
+            for name in sorted(self._entries):
+                yield name, self._entries[name]
+            return
+
+        for name, value in self._manifest.latest():
+            record: list = json.loads(value)
+            match record[0]:
+                case "dir":
+                    yield name, None
+                case "file":
+                    yield name, record[1]
+                case "member":
+                    yield name, (self._sources[record[1]], record[2])
+                case "data":
+                    self._spill.seek(record[1])
+                    yield name, self._spill.read(record[2])
+
+    def _payload(self, entry: Entry) -> bytes:
+        if isinstance(entry, str):
+            with open(entry, "rb") as f:
+                return f.read()
+        if isinstance(entry, tuple):
+            source, name = entry
+            return source.read_bytes(name)
+        return entry or b""
+
+    def close(self) -> None:
+        try:
+            if self.archive_format == "zip":
+                self._write_zip()
+            else:
+                self._write_tar()
+            self.stream.flush()
+        finally:
+            self._release()
+
+    def abort(self) -> None:
+        # nothing is written to the stream before close()
+        self._release()
+
+    def _release(self) -> None:
+        if self._manifest is not None:
+            self._manifest.close()
+            self._spill.close()
+
+    def _write_zip(self) -> None:
+        with zipfile.ZipFile(self.stream, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, entry in self._sorted_entries():
+                info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+                if entry is None:
+                    info.external_attr = (0o40755 << 16) | 0x10
+                    archive.writestr(info, b"")
+                    continue
+                info.external_attr = 0o100644 << 16
+                if isinstance(entry, tuple) and isinstance(entry[0], ZipSource):
+                    _copy_zip_member(archive, info, *entry)
+                    continue
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, self._payload(entry))
+
+    def _write_tar(self) -> None:
+        stream: BinaryIO = self.stream
+        gz: Optional[gzip.GzipFile] = None
+        if self.archive_format == "tar.gz":
+            gz = gzip.GzipFile(filename="", mode="wb", fileobj=stream, mtime=0)
+            stream = gz
+
+        with tarfile.open(fileobj=stream, mode="w|", format=tarfile.PAX_FORMAT) as archive:
+            for name, entry in self._sorted_entries():
+                info = tarfile.TarInfo(name.rstrip("/"))
+                info.mtime = ARCHIVE_EPOCH
+                if entry is None:
+                    info.type = tarfile.DIRTYPE
+                    info.mode = 0o755
+                    archive.addfile(info)
+                    archive.members.clear()
+                    continue
+                payload: bytes = self._payload(entry)
+                info.mode = 0o644
+                info.size = len(payload)
+                archive.addfile(info, io.BytesIO(payload))
+                # a streamed tar needs no record of the members already written
+                archive.members.clear()
+
+        if gz is not None:
+            gz.close()
+
+
+def _copy_zip_member(
+    archive: zipfile.ZipFile, info: zipfile.ZipInfo, source: ZipSource, name: str
+) -> None:
+    """Streams a zip member into `archive`, recompressing it with its own method.
+
+    zipfile has no public API for copying compressed data as is, so the
+    member is decompressed and compressed again; stored members stay stored.
+    It is never held in memory whole. Its size is set up front so that the
+    archive knows whether the entry needs zip64 extensions.
+    """
+    member: zipfile.ZipInfo = source.member(name)
+    info.compress_type = member.compress_type
+    info.file_size = member.file_size
+    with source.open(name) as src, archive.open(info, "w") as dst:
+        shutil.copyfileobj(src, dst)
+
+
+def archive_format_of(target: str) -> Optional[str]:
+    for archive_format in sorted(ARCHIVE_FORMATS, key=len, reverse=True):
+        if target.endswith(f".{archive_format}"):
+            return archive_format
+    if target.endswith(".tgz"):
+        return "tar.gz"
+    return None
+
+
+def open_writer(
+    root: Path | str,
+    archive: Optional[str] = None,
+    archive_format: Optional[str] = None,
+    bounded_memory: bool = False,
+) -> OutputWriter:
+    """Returns a writer to `root`, or to the `archive` file (`-` for stdout)."""
+
+    if archive is None:
+        return DirectoryWriter(root)
+
+    archive_format = archive_format or archive_format_of(archive)
+    if archive_format is None:
+        msg = f"Archive format of `{archive}` could not be inferred"
+        raise ValueError(msg)
+
+    if archive == "-":
+        return ArchiveWriter(root, sys.stdout.buffer, archive_format, bounded_memory)
+    pathlib.Path(archive).parent.mkdir(parents=True, exist_ok=True)
+    stream: BinaryIO = open(archive, "wb")
+    return _ClosingArchiveWriter(root, stream, archive_format, bounded_memory)
+
+
+class _ClosingArchiveWriter(ArchiveWriter):
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self.stream.close()
+
+    def abort(self) -> None:
+        try:
+            super().abort()
+        finally:
+            self.stream.close()
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.stream.name)
@@ -0,0 +1,139 @@
+#!/usr/bin/python3.12
+
+"""Splitting oversized pages into numbered parts at heading boundaries.
+
+A page goes over its budget when its markdown blocks (as split by
+`markdown_to_blocks`) add up to more than `split_page_bytes` bytes or
+`split_page_blocks` blocks; front matter keys of the same names set a
+page's own budget. Parts are planned from the parsed blocks before
+anything is rendered: a part ends before the first heading at which it
+would go over budget, so a part only goes over when it has no heading to
+end at. The parts are then rendered one at a time, so the whole page is
+never held as html.
+
+Part 1 keeps the page's output, `ref.html`; later parts are
+`ref-part-2.html`, `ref-part-3.html`, .... Every part carries the table of
+contents of the whole page, linking into the other parts, and links to its
+neighbours.
+"""
+
+
+import html
+import posixpath
+from typing import Iterable, Optional
+
+from htmlnode import ParentNode
+from markdown_blocks import BlockType
+from markdown_to_html import ParsedBlock, TableOfContents, heading_text
+
+
+class PagePart:
+    def __init__(self, dest: str, number: int, count: int, start: int, stop: int) -> None:
+        # the output of the whole page, which part 1 is written to
+        self.dest: str = dest
+        self.number: int = number
+        self.count: int = count
+        # the page's blocks in this part
+        self.start: int = start
+        self.stop: int = stop
+
+    def __repr__(self) -> str:
+        return f"PagePart({vars(self)})"
+
+    @property
+    def output(self) -> str:
+        return part_name(self.dest, self.number)
+
+    def pager(self) -> str:
+        """Links to the previous and next parts."""
+        links: list[str] = []
+        if self.number > 1:
+            href: str = posixpath.basename(part_name(self.dest, self.number - 1))
+            links.append(f"<a href='{html.escape(href)}'>Previous</a>")
+        links.append(f"Part {self.number} of {self.count}")
+        if self.number < self.count:
+            href: str = posixpath.basename(part_name(self.dest, self.number + 1))
+            links.append(f"<a href='{html.escape(href)}'>Next</a>")
+        return f"<nav class='page-parts'>{' | '.join(links)}</nav>"
+
+
+def part_name(dest: str, number: int) -> str:
+    if number == 1:
+        return dest
+    stem, extension = posixpath.splitext(dest)
+    return f"{stem}-part-{number}{extension}"
+
+
+def split_budget(max_bytes: int, max_blocks: int, front_matter: dict[str, str]) -> tuple[int, int]:
+    """A page's budget, the build's unless its front matter sets its own.
+
+    Raises ValueError for a budget in the front matter which is not a number.
+    """
+    try:
+        max_bytes = int(front_matter.get("split_page_bytes", max_bytes))
+        max_blocks = int(front_matter.get("split_page_blocks", max_blocks))
+    except ValueError as e:
+        raise ValueError(f"Invalid split budget in front matter: {e}") from e
+    return max_bytes, max_blocks
+
+
+def plan_parts(
+    blocks: list[ParsedBlock], sizes: Iterable[int], max_bytes: int, max_blocks: int
+) -> list[tuple[int, int]]:
+    """The ranges of blocks in each part, given each block's size in bytes."""
+    if max_bytes <= 0 and max_blocks <= 0:
+        return [(0, len(blocks))]
+    ranges: list[tuple[int, int]] = []
+    start: int = 0
+    used: int = 0
+    for i, (block, size) in enumerate(zip(blocks, sizes)):
+        over: bool = (max_bytes > 0 and used + size > max_bytes) or (
+            max_blocks > 0 and i - start >= max_blocks
+        )
+        if over and i > start and block.block_type == BlockType.HEADING.value:
+            ranges.append((start, i))
+            start, used = i, 0
+        used += size
+    ranges.append((start, len(blocks)))
+    return ranges
+
+
+def page_parts(dest: str, ranges: list[tuple[int, int]]) -> list[PagePart]:
+    return [
+        PagePart(dest, number, len(ranges), start, stop)
+        for number, (start, stop) in enumerate(ranges, 1)
+    ]
+
+
+class SharedContents:
+    """The table of contents of a split page, with links into each part."""
+
+    def __init__(self, blocks: list[ParsedBlock], parts: list[PagePart]) -> None:
+        self.toc = TableOfContents()
+        # the part each heading id is in
+        self.parts: dict[str, PagePart] = {}
+        # the ids taken by the parts before each part
+        self._taken: list[set[str]] = []
+        for part in parts:
+            self._taken.append(set(self.parts))
+            for block in blocks[part.start : part.stop]:
+                if block.block_type == BlockType.HEADING.value:
+                    slug: str = self.toc.add(block.level, heading_text(block))
+                    self.parts[slug] = part
+
+    def __repr__(self) -> str:
+        return f"SharedContents({len(self.parts)} headings)"
+
+    def part_toc(self, part: PagePart) -> TableOfContents:
+        """An empty table of contents for rendering `part`, with the same ids as the page."""
+        return TableOfContents(self._taken[part.number - 1])
+
+    def hrefs(self, part: PagePart) -> dict[str, str]:
+        hrefs: dict[str, str] = {}
+        for slug, other in self.parts.items():
+            page: str = "" if other is part else posixpath.basename(other.output)
+            hrefs[slug] = f"{page}#{slug}"
+        return hrefs
+
+    def to_html_node(self, part: PagePart) -> Optional[ParentNode]:
+        return self.toc.to_html_node(self.hrefs(part))
@@ -0,0 +1,453 @@
+#!/usr/bin/python3.12
+
+"""Serves the website straight from its sources, rendering pages on request.
+
+`/`, `/majesty/` and `/majesty/index.html` render `index.md` and
+`majesty/index.md` of the content tree; other paths are static files.
+Rendered pages are kept, with a gzipped copy when compression pays off, in
+an LRU bounded by `cache_bytes`, and are rendered again once their source,
+the template, the site nav, the critical-css stylesheet or the build
+options change. Pages carry strong ETags derived from those, one for each
+encoding, so `If-None-Match` revalidation costs no rendering; static
+files answer `Range` requests. See load_test.py for measuring throughput.
+
+    python3.12 src/render_server.py --port 8888 [main.py options]
+"""
+
+
+import argparse
+import collections
+import contextlib
+import contextvars
+import gzip
+import hashlib
+import http.server
+import mimetypes
+import os
+import posixpath
+import re
+import sys
+import threading
+from typing import Optional, Self
+from urllib.parse import unquote, urlsplit
+
+from assets import configure_asset_inlining
+from config import BuildOptions, Path
+from generate_webpages import BuildError, collect_titles, render_page
+from main import configure
+from site_nav import ContentHierarchy, content_hierarchy, uses_site_nav
+from sources import SourceTree, open_source, read_file, split_spec
+
+
+DEFAULT_CACHE_BYTES: int = 64 << 20
+# smaller pages are sent as is, as compressing them saves next to nothing
+GZIP_MIN_BYTES: int = 512
+
+_byte_range: re.Pattern = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RenderedPage:
+    def __init__(self, key: tuple, etag: str, body: bytes, gzipped: Optional[bytes]) -> None:
+        self.key: tuple = key
+        self.etag: str = etag
+        self.body: bytes = body
+        self.gzipped: Optional[bytes] = gzipped
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gzipped or b"")
+
+
+class PageCache:
+    """A thread-safe LRU of rendered pages, bounded by their total size."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes: int = max_bytes
+        self.size: int = 0
+        self._pages: collections.OrderedDict[str, RenderedPage] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[RenderedPage]:
+        with self._lock:
+            page: Optional[RenderedPage] = self._pages.get(name)
+            if page is not None:
+                self._pages.move_to_end(name)
+            return page
+
+    def put(self, name: str, page: RenderedPage) -> None:
+        with self._lock:
+            old: Optional[RenderedPage] = self._pages.pop(name, None)
+            if old is not None:
+                self.size -= old.size
+            if page.size > self.max_bytes:
+                return
+            self._pages[name] = page
+            self.size += page.size
+            while self.size > self.max_bytes:
+                _, evicted = self._pages.popitem(last=False)
+                self.size -= evicted.size
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+
+class RenderServer(http.server.ThreadingHTTPServer):
+    def __init__(
+        self,
+        content: Path | str,
+        static: Path | str,
+        template: Path | str,
+        options: Optional[BuildOptions] = None,
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+        verbose: bool = False,
+    ) -> None:
+        self.options: BuildOptions = options or BuildOptions()
+        self.content_root: str = str(content)
+        self.content: SourceTree = open_source(content)
+        self.static: SourceTree = open_source(static)
+        self.template_path: str = str(template)
+        self.pages = PageCache(cache_bytes)
+        self.verbose: bool = verbose
+        self.renders: int = 0
+        # archive handles cannot be read from several threads at once
+        self._archive_lock = threading.Lock()
+        # the text and digest of the template and stylesheet, by path
+        self._files: dict[str, tuple[tuple, str, str]] = {}
+        self._files_lock = threading.Lock()
+        self._options_digest: str = hashlib.sha256(repr(self.options).encode()).hexdigest()
+
+        configure_asset_inlining(self.options.assets_dir, self.options.inline_assets_below)
+        # each render runs in a copy, as one context cannot be entered by two threads
+        self.render_context: contextvars.Context = contextvars.copy_context()
+        super().__init__(address, RenderRequestHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> Self:
+        """Serves from a background thread, e.g. within tests or load_test.py."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.content.close()
+        self.static.close()
+
+    def read(self, tree: SourceTree, name: str) -> bytes:
+        if tree.local_path(name) is not None:
+            return tree.read_bytes(name)
+        with self._archive_lock:
+            return tree.read_bytes(name)
+
+    def static_size(self, name: str) -> int:
+        local: Optional[str] = self.static.local_path(name)
+        if local is not None:
+            return os.path.getsize(local)
+        return len(self.read(self.static, name))
+
+    def read_static(self, name: str, first: int, last: int) -> bytes:
+        """Reads bytes `first` to `last` of a static file, only those if on disk."""
+        local: Optional[str] = self.static.local_path(name)
+        if local is None:
+            return self.read(self.static, name)[first : last + 1]
+        with open(local, "rb") as f:
+            f.seek(first)
+            return f.read(last - first + 1)
+
+    def stat_key(self, tree: SourceTree, name: str) -> tuple:
+        if tree.local_path(name) is not None:
+            return tree.stat_key(name)
+        with self._archive_lock:
+            return tree.stat_key(name)
+
+    def file(self, path: str) -> tuple[str, str]:
+        """Returns a file's text and digest, read again once it changes."""
+        stat: os.stat_result = os.stat(split_spec(path)[0])
+        key: tuple = (stat.st_mtime_ns, stat.st_size)
+        with self._files_lock:
+            if path not in self._files or self._files[path][0] != key:
+                text: str = read_file(path)
+                self._files[path] = (key, text, hashlib.sha256(text.encode()).hexdigest())
+            return self._files[path][1], self._files[path][2]
+
+    def inputs(self) -> tuple[str, Optional[ContentHierarchy], str]:
+        """Returns the template, the site nav and a digest of all a page depends on but its source.
+
+        A template with nav slots has the content tree walked for its titles
+        on each call, reading only the pages changed since.
+        """
+        template_html, template_digest = self.file(self.template_path)
+        digests: list[str] = [template_digest, self._options_digest]
+        hierarchy: Optional[ContentHierarchy] = None
+        if uses_site_nav(template_html):
+            with contextlib.ExitStack() as stack:
+                if self.content.local_path("") is None:
+                    stack.enter_context(self._archive_lock)
+                titles: dict[str, str] = collect_titles(self.content, self.content_root)
+            hierarchy = content_hierarchy(self.content_root, titles)
+            digests.append(hierarchy.signature)
+        if self.options.critical_css:
+            digests.append(self.file(str(self.options.stylesheet))[1])
+        return template_html, hierarchy, hashlib.sha256("\0".join(digests).encode()).hexdigest()
+
+    def etag(self, markdown: bytes, inputs_digest: str) -> str:
+        sha = hashlib.sha256(markdown)
+        sha.update(f"\0{inputs_digest}".encode())
+        return f'"{sha.hexdigest()[:32]}"'
+
+    def cached_page(self, name: str) -> Optional[RenderedPage]:
+        """Returns the page rendered from `name`, if it is cached and current."""
+        key: tuple = (self.stat_key(self.content, name), self.inputs()[2])
+        page: Optional[RenderedPage] = self.pages.get(name)
+        return page if page is not None and page.key == key else None
+
+    def current_etag(self, name: str) -> str:
+        """Returns the ETag `name` would be rendered with, without rendering it."""
+        return self.etag(self.read(self.content, name), self.inputs()[2])
+
+    def page(self, name: str) -> RenderedPage:
+        """Returns the rendered page for the markdown source `name`."""
+        page: Optional[RenderedPage] = self.cached_page(name)
+        if page is not None:
+            return page
+
+        template_html, hierarchy, inputs_digest = self.inputs()
+        key: tuple = (self.stat_key(self.content, name), inputs_digest)
+        markdown: bytes = self.read(self.content, name)
+        slots: dict[str, str] = {} if hierarchy is None else hierarchy.slots(name)
+        html: str = self.render_context.copy().run(
+            render_page, markdown.decode(), template_html, self.options, name, None, slots
+        )
+        body: bytes = html.encode()
+        gzipped: Optional[bytes] = None
+        if len(body) >= GZIP_MIN_BYTES:
+            gzipped = gzip.compress(body, mtime=0)
+            if len(gzipped) >= len(body):
+                gzipped = None
+
+        page = RenderedPage(key, self.etag(markdown, inputs_digest), body, gzipped)
+        self.pages.put(name, page)
+        self.renders += 1
+        return page
+
+
+class RenderRequestHandler(http.server.BaseHTTPRequestHandler):
+    server: RenderServer
+    # keep-alive, so clients such as load_test.py reuse their connections
+    protocol_version: str = "HTTP/1.1"
+    # headers and body go out in one write, rather than waiting on delayed ACKs
+    wbufsize: int = -1
+
+    def do_HEAD(self) -> None:
+        self.do_GET(head=True)
+
+    def do_GET(self, head: bool = False) -> None:
+        path: str = unquote(urlsplit(self.path).path)
+        name: str = posixpath.normpath(path).lstrip("/")
+        if name == ".":
+            name = ""
+        if name.startswith("..") or "\0" in name:
+            self.send_error(404)
+            return
+        if path.endswith("/") and name:
+            name += "/"
+
+        markdown: Optional[str] = None
+        if name == "" or name.endswith("/"):
+            markdown = f"{name}index.md"
+        elif name.endswith(".html"):
+            markdown = f"{name[:-5]}.md"
+
+        try:
+            if markdown is not None and self._exists(self.server.content, markdown):
+                self._send_page(markdown, head)
+            elif name and not name.endswith("/") and self._exists(self.server.static, name):
+                self._send_static(name, head)
+            elif name and self._exists(self.server.content, f"{name}/index.md"):
+                self.send_response(301)
+                self.send_header("Location", f"/{name}/")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                self.send_error(404)
+        except BuildError as e:
+            self.send_error(500, str(e))
+        except ConnectionError:
+            raise
+        except Exception as e:
+            self.log_error("Failed to serve %s: %r", self.path, e)
+            self.send_error(500)
+
+    def _exists(self, tree: SourceTree, name: str) -> bool:
+        try:
+            self.server.stat_key(tree, name)
+        except (OSError, KeyError):
+            return False
+        local: Optional[str] = tree.local_path(name)
+        return local is None or os.path.isfile(local)
+
+    def _not_modified(self, *etags: str) -> bool:
+        """Answers 304 if the request's If-None-Match holds any of `etags`."""
+        if_none_match: Optional[str] = self.headers.get("If-None-Match")
+        if if_none_match is None:
+            return False
+        tags: list[str] = [t.strip() for t in if_none_match.split(",")]
+        matched: Optional[str] = next((e for e in etags if e in tags or "*" in tags), None)
+        if matched is None:
+            return False
+        self.send_response(304)
+        self.send_header("ETag", matched)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return True
+
+    def _accepts_gzip(self) -> bool:
+        for coding in self.headers.get("Accept-Encoding", "").split(","):
+            name, _, params = coding.strip().partition(";")
+            if name.strip() == "gzip":
+                return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+        return False
+
+    def _send_page(self, markdown: str, head: bool) -> None:
+        accepts_gzip: bool = self._accepts_gzip()
+        page: Optional[RenderedPage] = self.server.cached_page(markdown)
+        if page is None and "If-None-Match" in self.headers:
+            # revalidating a page which is not cached needs no rendering
+            etag: str = self.server.current_etag(markdown)
+            etags: tuple[str, ...] = (_gzip_etag(etag), etag) if accepts_gzip else (etag,)
+            if self._not_modified(*etags):
+                return
+        page = page or self.server.page(markdown)
+        gzipped: bool = page.gzipped is not None and accepts_gzip
+        etag: str = _gzip_etag(page.etag) if gzipped else page.etag
+        if self._not_modified(etag):
+            return
+
+        body: bytes = page.gzipped if gzipped else page.body
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _send_static(self, name: str, head: bool) -> None:
+        stat_key: tuple = self.server.stat_key(self.server.static, name)
+        etag: str = f'"{hashlib.sha256(repr((name, stat_key)).encode()).hexdigest()[:32]}"'
+        if self._not_modified(etag):
+            return
+
+        size: int = self.server.static_size(name)
+        content_type: str = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        byte_range: Optional[tuple[int, int]] = None
+        requested: Optional[str] = self.headers.get("Range")
+        if requested is not None and self._if_range_matches(etag):
+            try:
+                byte_range = _parse_range(requested, size)
+            except RangeNotSatisfiable:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+        first, last = byte_range or (0, size - 1)
+        self.send_response(200 if byte_range is None else 206)
+        self.send_header("Content-Type", content_type)
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        if byte_range is not None:
+            self.send_header("Content-Range", f"bytes {first}-{last}/{size}")
+        self.send_header("Content-Length", str(last - first + 1))
+        self.end_headers()
+        if not head:
+            self.wfile.write(self.server.read_static(name, first, last))
+
+    def _if_range_matches(self, etag: str) -> bool:
+        if_range: Optional[str] = self.headers.get("If-Range")
+        return if_range is None or if_range.strip() == etag
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def _gzip_etag(etag: str) -> str:
+    """The ETag of a page's gzipped copy, which must differ from its identity ETag."""
+    return f'{etag[:-1]}-gzip"'
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """Returns the first and last byte of a single byte range.
+
+    None stands for the whole file, which is also the answer to ranges this
+    server does not support, such as several ranges in one request.
+    """
+    m: re.Match[str] | None = _byte_range.match(header.strip())
+    if m is None or m.groups() == ("", ""):
+        return None
+    first, last = m.groups()
+    if not first:
+        # a suffix range, of the last `last` bytes
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(size - int(last), 0), size - 1
+    if int(first) >= size or (last and int(last) < int(first)):
+        raise RangeNotSatisfiable(header)
+    return int(first), min(int(last), size - 1) if last else size - 1
+
+
+def parse_args(argv: list[str] | None = None) -> tuple[argparse.Namespace, list[str]]:
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        epilog="Other arguments are passed on to main.py, e.g. --content",
+    )
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument(
+        "--cache-bytes",
+        type=int,
+        default=DEFAULT_CACHE_BYTES,
+        metavar="BYTES",
+        help="memory to keep rendered pages in",
+    )
+    return parser.parse_known_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args, build_argv = parse_args(argv)
+    res, _, options = configure(build_argv)
+    server = RenderServer(
+        res.content,
+        res.static,
+        res.page_template,
+        options,
+        args.cache_bytes,
+        ("127.0.0.1", args.port),
+        verbose=True,
+    )
+    with server:
+        print(f"Serving {res.content} at {server.url}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
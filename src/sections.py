@@ -0,0 +1,182 @@
+#!/usr/bin/python3.12
+
+"""Paginated index pages listing the pages of each content directory.
+
+Listings are built from a `MetadataIndex` of each page's title and dates,
+which the build fills in as it renders pages and keeps in the cache dir, so
+pages left out of a build (unchanged, or outside `--only`) are not read
+again. feeds.py builds the sitemap and the feed from the same index.
+
+Listing pages are numbered from the end of the listing, the oldest
+entries being on page 1, and the newest page holds the newest entries
+left over. Each listing page is keyed by its own entries and links, so a
+new post only re-renders the newest page, and the one before it when it
+starts a new page.
+"""
+
+
+import hashlib
+import json
+import os
+import posixpath
+import tempfile
+from typing import Iterator, Optional
+
+from site_nav import page_url
+
+
+SORT_ORDERS: tuple[str, ...] = ("date", "title")
+
+
+class PageMetadata:
+    def __init__(
+        self, source: str, title: str, date: str = "", lastmod: str = "", digest: str = ""
+    ) -> None:
+        self.source: str = source
+        self.title: str = title
+        # as written in the front matter, ISO dates sort correctly as text
+        self.date: str = date
+        # when the page's markdown last changed, as a W3C datetime in UTC
+        self.lastmod: str = lastmod
+        self.digest: str = digest
+
+    def __repr__(self) -> str:
+        return f"PageMetadata({vars(self)})"
+
+
+class SectionPage:
+    def __init__(
+        self, directory: str, title: str, number: int, count: int, entries: list[PageMetadata]
+    ) -> None:
+        self.directory: str = directory
+        self.title: str = title
+        self.number: int = number
+        self.count: int = count
+        self.entries: list[PageMetadata] = entries
+
+    def __repr__(self) -> str:
+        return f"SectionPage({self.output}, {len(self.entries)} entries)"
+
+    @property
+    def output(self) -> str:
+        return posixpath.join(self.directory, "page", str(self.number), "index.html")
+
+    def url(self, number: int) -> str:
+        return f"/{posixpath.join(self.directory, 'page', str(number))}/"
+
+    def markdown(self) -> str:
+        """The page as markdown, which leaves out the page count so that adding
+        a page does not change every listing page."""
+        lines: list[str] = [f"# {self.title}", ""]
+        for entry in self.entries:
+            date: str = f" ({entry.date})" if entry.date else ""
+            lines.append(f"- [{entry.title}]({page_url(entry.source)}){date}")
+        if self.count > 1:
+            links: list[str] = []
+            if self.number < self.count:
+                links.append(f"[Newer]({self.url(self.number + 1)})")
+            links.append(f"Page {self.number}")
+            if self.number > 1:
+                links.append(f"[Older]({self.url(self.number - 1)})")
+            lines += ["", " | ".join(links)]
+        return "\n".join(lines) + "\n"
+
+
+class MetadataIndex:
+    def __init__(self) -> None:
+        # metadata by source, with the stat key of the source it was read from
+        self.pages: dict[str, tuple[tuple, PageMetadata]] = {}
+        # the key each generated page (listings, sitemaps, the feed) was last
+        # written with, by output path
+        self.outputs: dict[str, str] = {}
+
+    def __repr__(self) -> str:
+        return f"MetadataIndex({len(self.pages)} pages, {len(self.outputs)} outputs)"
+
+    @classmethod
+    def load(cls, path: str) -> "MetadataIndex":
+        """Reads an index written by `save`, or starts an empty one."""
+        index = cls()
+        try:
+            with open(path) as f:
+                data: dict = json.load(f)
+            for source, (stat_key, *fields) in data["pages"].items():
+                index.pages[source] = (tuple(stat_key), PageMetadata(source, *fields))
+            index.outputs = dict(data["outputs"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls()
+        return index
+
+    def save(self, path: str) -> None:
+        data: dict = {
+            "pages": {
+                source: [list(stat_key), meta.title, meta.date, meta.lastmod, meta.digest]
+                for source, (stat_key, meta) in self.pages.items()
+            },
+            "outputs": self.outputs,
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def current(self, source: str, stat_key: tuple) -> bool:
+        known: Optional[tuple[tuple, PageMetadata]] = self.pages.get(source)
+        return known is not None and known[0] == tuple(stat_key)
+
+    def add(
+        self,
+        source: str,
+        stat_key: tuple,
+        title: str,
+        front_matter: dict[str, str],
+        lastmod: str = "",
+        digest: str = "",
+    ) -> None:
+        """Records a page, keeping its earlier `lastmod` if its `digest` is unchanged."""
+        known: Optional[tuple[tuple, PageMetadata]] = self.pages.get(source)
+        if known is not None and digest and known[1].digest == digest:
+            lastmod = known[1].lastmod
+        meta = PageMetadata(
+            source,
+            front_matter.get("title") or title,
+            front_matter.get("date", ""),
+            lastmod,
+            digest,
+        )
+        self.pages[source] = (tuple(stat_key), meta)
+
+    def retain(self, sources: set[str]) -> None:
+        """Forgets pages which are no longer in the content tree."""
+        for source in [s for s in self.pages if s not in sources]:
+            del self.pages[source]
+
+    def sections(self, per_page: int, sort: str = "date") -> Iterator[SectionPage]:
+        """Yields the listing pages of every directory with pages besides its index."""
+        directories: dict[str, list[PageMetadata]] = {}
+        for source, (_, meta) in self.pages.items():
+            if posixpath.basename(source) != "index.md":
+                directories.setdefault(posixpath.dirname(source), []).append(meta)
+
+        for directory in sorted(directories):
+            entries: list[PageMetadata] = sorted(
+                directories[directory], key=lambda m: (m.title.casefold(), m.source)
+            )
+            if sort == "date":
+                # newest first, undated pages last; stable, so ties keep title order
+                entries.sort(key=lambda m: m.date, reverse=True)
+            index: Optional[tuple[tuple, PageMetadata]] = self.pages.get(
+                posixpath.join(directory, "index.md")
+            )
+            title: str = index[1].title if index is not None else directory or "Index"
+            count: int = -(-len(entries) // per_page)
+            # numbered from the end of the listing, so new entries only change the newest page
+            for number in range(count, 0, -1):
+                stop: int = len(entries) - (number - 1) * per_page
+                page_entries: list[PageMetadata] = entries[max(stop - per_page, 0) : stop]
+                yield SectionPage(directory, title, number, count, page_entries)
+
+
+def section_key(page: SectionPage, page_inputs: tuple) -> str:
+    return hashlib.sha256(f"{page.markdown()}\0{page_inputs!r}".encode()).hexdigest()
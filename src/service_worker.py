@@ -0,0 +1,221 @@
+#!/usr/bin/python3.12
+
+"""An opt-in service worker which precaches the site for offline use.
+
+After a build, every output gets a content hash: the writer's own for
+files written this build, otherwise one kept in the cache dir by stat key,
+so unchanged outputs are not read again. Outputs are precached in priority
+order (the home page, stylesheets and scripts, pages by depth, then other
+files) until `precache_budget` bytes are used. Everything else is cached
+at runtime, network first.
+
+Precache entries are stored under a url carrying their hash, so after a
+deploy clients only fetch the entries whose hash changed. `sw.js` embeds
+the precache list, so browsers see a new worker exactly when it changes.
+`precache-manifest.json` lists every output with its hash, for deploy
+tooling.
+"""
+
+
+import hashlib
+import json
+import os
+import posixpath
+from typing import Optional
+
+from output import DirectoryWriter
+
+
+SERVICE_WORKER: str = "sw.js"
+MANIFEST: str = "precache-manifest.json"
+
+REGISTRATION: str = (
+    '<script>if ("serviceWorker" in navigator) '
+    'navigator.serviceWorker.register("/sw.js")</script>'
+)
+
+_WORKER_JS: str = """\
+// Generated by the site build from precache-manifest.json; do not edit.
+const PRECACHE_ENTRIES = %(entries)s;
+const PRECACHE = "precache";
+const RUNTIME = "runtime";
+
+function cacheKey(entry) {
+  return new URL(entry.url + "?__revision=" + entry.revision, self.location).href;
+}
+
+const PRECACHED = new Map();
+for (const entry of PRECACHE_ENTRIES) {
+  PRECACHED.set(new URL(entry.url, self.location).href, cacheKey(entry));
+  if (entry.url.endsWith("/")) {
+    PRECACHED.set(new URL(entry.url + "index.html", self.location).href, cacheKey(entry));
+  }
+}
+
+self.addEventListener("install", (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(PRECACHE);
+    await Promise.all(PRECACHE_ENTRIES.map(async (entry) => {
+      // entries whose hash did not change since the last deploy are kept
+      if (await cache.match(cacheKey(entry))) return;
+      const response = await fetch(entry.url, { cache: "no-cache" });
+      if (response.ok) await cache.put(cacheKey(entry), response);
+    }));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil((async () => {
+    const current = new Set(PRECACHE_ENTRIES.map(cacheKey));
+    const cache = await caches.open(PRECACHE);
+    for (const request of await cache.keys()) {
+      if (!current.has(request.url)) await cache.delete(request);
+    }
+    await self.clients.claim();
+  })());
+});
+
+async function networkFirst(request) {
+  const cache = await caches.open(RUNTIME);
+  try {
+    const response = await fetch(request);
+    if (response.ok) await cache.put(request, response.clone());
+    return response;
+  } catch (error) {
+    const cached = await cache.match(request);
+    if (cached) return cached;
+    throw error;
+  }
+}
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (request.method !== "GET" || url.origin !== self.location.origin) return;
+  const key = PRECACHED.get(url.origin + url.pathname);
+  if (key) {
+    event.respondWith(caches.match(key).then((cached) => cached || fetch(request)));
+  } else {
+    event.respondWith(networkFirst(request));
+  }
+});
+"""
+
+
+class PrecacheEntry:
+    def __init__(self, name: str, revision: str, size: int) -> None:
+        self.name: str = name
+        self.revision: str = revision
+        self.size: int = size
+
+    def __repr__(self) -> str:
+        return f"PrecacheEntry({vars(self)})"
+
+    @property
+    def url(self) -> str:
+        if self.name == "index.html" or self.name.endswith("/index.html"):
+            return f"/{self.name.removesuffix('index.html')}"
+        return f"/{self.name}"
+
+    def priority(self) -> tuple:
+        extension: str = posixpath.splitext(self.name)[1]
+        rank: int = (
+            0 if self.name == "index.html"
+            else 1 if extension in (".css", ".js")
+            else 2 if extension == ".html"
+            else 3
+        )
+        return rank, self.name.count("/"), self.size, self.name
+
+    def to_json(self) -> dict:
+        return {"url": self.url, "revision": self.revision, "size": self.size}
+
+
+class OutputDigests:
+    """Content hashes of outputs, kept by stat key between builds."""
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self._known: dict[str, list] = {}
+        try:
+            with open(path) as f:
+                self._known = dict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            self._known = {}
+        self._current: dict[str, list] = {}
+
+    def digest(self, root: str, name: str, written: Optional[str] = None) -> tuple[str, int]:
+        """Returns the hash and size of output `name`, using `written` if given."""
+        stat: os.stat_result = os.stat(os.path.join(root, name))
+        key: list = [stat.st_mtime_ns, stat.st_size]
+        known: Optional[list] = self._known.get(name)
+        if written is not None:
+            digest: str = written
+        elif known is not None and known[:2] == key:
+            digest: str = known[2]
+        else:
+            sha = hashlib.sha256()
+            with open(os.path.join(root, name), "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    sha.update(chunk)
+            digest: str = sha.hexdigest()
+        self._current[name] = key + [digest]
+        return digest, stat.st_size
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self._current, f)
+
+
+def write_service_worker(
+    writer: DirectoryWriter, cache_dir: str, budget: int, partial: bool = False
+) -> list[PrecacheEntry]:
+    """Writes sw.js and its manifest, returning the precached entries.
+
+    Lists the outputs this build produced, or with `partial` every file
+    on disk, as a partial build leaves the others in place.
+    """
+    root: str = str(writer.root)
+    digests = OutputDigests(os.path.join(cache_dir, "output-digests.json"))
+    entries: list[PrecacheEntry] = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for filename in filenames:
+            name: str = writer.name(os.path.join(directory, filename))
+            if filename.startswith(".") or name in (SERVICE_WORKER, MANIFEST):
+                continue
+            if not partial and not writer.produced(name):
+                continue
+            digest, size = digests.digest(root, name, writer.digests.get(name))
+            entries.append(PrecacheEntry(name, digest[:16], size))
+    digests.save()
+
+    entries.sort(key=PrecacheEntry.priority)
+    precache: list[PrecacheEntry] = []
+    runtime: list[PrecacheEntry] = []
+    used: int = 0
+    for entry in entries:
+        if used + entry.size <= budget:
+            precache.append(entry)
+            used += entry.size
+        else:
+            runtime.append(entry)
+
+    manifest: dict = {
+        "precache": [e.to_json() for e in precache],
+        "runtime": [e.to_json() for e in runtime],
+    }
+    writer.write_bytes(MANIFEST, (json.dumps(manifest, indent=1) + "\n").encode())
+    worker: str = _WORKER_JS % {"entries": json.dumps(manifest["precache"])}
+    writer.write_bytes(SERVICE_WORKER, worker.encode())
+    return precache
+
+
+def register_service_worker(page_html: str) -> str:
+    """Adds the script registering sw.js before a page's `</body>`."""
+    end: int = page_html.rfind("</body>")
+    if end == -1:
+        return page_html + REGISTRATION
+    return page_html[:end] + REGISTRATION + page_html[end:]
@@ -0,0 +1,148 @@
+#!/usr/bin/python3.12
+
+"""Site-wide navigation and breadcrumbs, rendered once per content tree.
+
+The hierarchy is built from each page's source path and title. The nav
+fragment is rendered once and the breadcrumb fragment once per directory,
+and both are spliced into pages through the `{{ Nav }}` and
+`{{ Breadcrumbs }}` template slots.
+"""
+
+
+import hashlib
+import posixpath
+from typing import Optional
+
+from htmlnode import LeafNode, ParentNode
+
+
+NAV_SLOT: str = "{{ Nav }}"
+BREADCRUMBS_SLOT: str = "{{ Breadcrumbs }}"
+
+
+def uses_site_nav(template_html: str) -> bool:
+    return NAV_SLOT in template_html or BREADCRUMBS_SLOT in template_html
+
+
+def page_url(source: str) -> str:
+    """Maps `index.md` to `/`, `majesty/index.md` to `/majesty/` and `a/b.md` to `/a/b.html`."""
+    if source == "index.md" or source.endswith("/index.md"):
+        return f"/{source.removesuffix('index.md')}"
+    return f"/{source[:-3]}.html"
+
+
+def hierarchy_signature(titles: dict[str, str]) -> str:
+    return hashlib.sha256(repr(sorted(titles.items())).encode()).hexdigest()
+
+
+class ContentHierarchy:
+    def __init__(self, titles: dict[str, str], signature: Optional[str] = None) -> None:
+        # the title of each markdown source, by its path within the content tree
+        self.titles: dict[str, str] = titles
+        self.signature: str = signature or hierarchy_signature(titles)
+        self._pages: dict[str, list[str]] = {}
+        self._subdirs: dict[str, list[str]] = {}
+        for source in sorted(titles):
+            directory: str = posixpath.dirname(source)
+            self._pages.setdefault(directory, [])
+            if posixpath.basename(source) != "index.md":
+                self._pages[directory].append(source)
+            while directory:
+                parent: str = posixpath.dirname(directory)
+                subdirs: list[str] = self._subdirs.setdefault(parent, [])
+                if directory in subdirs:
+                    break
+                subdirs.append(directory)
+                directory = parent
+        self._nav: Optional[str] = None
+        self._breadcrumbs: dict[str, str] = {}
+
+    def __repr__(self) -> str:
+        return f"ContentHierarchy({len(self.titles)} pages, {self.signature[:12]})"
+
+    def slots(self, source: str) -> dict[str, str]:
+        return {
+            NAV_SLOT: self.nav_html(),
+            BREADCRUMBS_SLOT: self.breadcrumbs_html(posixpath.dirname(source)),
+        }
+
+    def nav_html(self) -> str:
+        if self._nav is None:
+            self._nav = self._render_nav()
+        return self._nav
+
+    def breadcrumbs_html(self, directory: str) -> str:
+        """Links the index pages of `directory` and each directory above it."""
+        if directory not in self._breadcrumbs:
+            self._breadcrumbs[directory] = self._render_breadcrumbs(directory)
+        return self._breadcrumbs[directory]
+
+    def _index(self, directory: str) -> Optional[str]:
+        source: str = posixpath.join(directory, "index.md")
+        return source if source in self.titles else None
+
+    def _link(self, source: str) -> LeafNode:
+        return LeafNode("a", self.titles[source], {"href": page_url(source)})
+
+    def _items(self, directory: str) -> list[ParentNode]:
+        items: list[ParentNode] = [
+            ParentNode("li", [self._link(s)]) for s in self._pages.get(directory, [])
+        ]
+        for subdir in self._subdirs.get(directory, []):
+            index: Optional[str] = self._index(subdir)
+            label: LeafNode = (
+                self._link(index)
+                if index is not None
+                else LeafNode("span", posixpath.basename(subdir))
+            )
+            children: list[ParentNode] = self._items(subdir)
+            if children:
+                items.append(ParentNode("li", [label, ParentNode("ul", children)]))
+            else:
+                items.append(ParentNode("li", [label]))
+        return items
+
+    def _render_nav(self) -> str:
+        items: list[ParentNode] = self._items("")
+        index: Optional[str] = self._index("")
+        if index is not None:
+            home: list = [self._link(index)]
+            if items:
+                home.append(ParentNode("ul", items))
+            items = [ParentNode("li", home)]
+        if not items:
+            return ""
+        nav = ParentNode("nav", [ParentNode("ul", items)], {"class": "site-nav"})
+        return nav.to_html()
+
+    def _render_breadcrumbs(self, directory: str) -> str:
+        ancestors: list[str] = [""]
+        for part in directory.split("/") if directory else []:
+            ancestors.append(posixpath.join(ancestors[-1], part))
+
+        crumbs: list[LeafNode] = []
+        for ancestor in ancestors:
+            index: Optional[str] = self._index(ancestor)
+            if index is None:
+                continue
+            if crumbs:
+                crumbs.append(LeafNode(None, " / "))
+            crumbs.append(self._link(index))
+        if not crumbs:
+            return ""
+        return ParentNode("nav", crumbs, {"class": "breadcrumbs"}).to_html()
+
+
+# the last hierarchy of each content tree, so that its fragments are
+# rendered again only once pages are added, removed or renamed
+_hierarchies: dict[str, ContentHierarchy] = {}
+
+
+def content_hierarchy(root: str, titles: dict[str, str]) -> ContentHierarchy:
+    signature: str = hierarchy_signature(titles)
+    previous: Optional[ContentHierarchy] = _hierarchies.get(root)
+    if previous is not None and previous.signature == signature:
+        return previous
+    hierarchy = ContentHierarchy(titles, signature)
+    _hierarchies[root] = hierarchy
+    return hierarchy
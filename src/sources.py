@@ -0,0 +1,326 @@
+#!/usr/bin/python3.12
+
+"""Read-only access to the website's source trees: directories or archives.
+
+An archive source is given as the path of a zip or tar(.gz) file, optionally
+followed by `!` and a directory (or, for a single file, a member) inside it,
+e.g. `site.tar.gz!content` or `site.zip!template.html`.
+"""
+
+
+import itertools
+import os
+import pathlib
+import tarfile
+from typing import BinaryIO, Iterable, Iterator, Optional, Self
+import zipfile
+
+
+type Path = os.PathLike | pathlib.Path
+
+
+ARCHIVE_SUFFIXES: tuple[str, ...] = (".zip", ".tar", ".tar.gz", ".tgz")
+MEMBER_SEPARATOR: str = "!"
+
+
+class UnsafeMemberError(ValueError):
+    """An archive member's name would place it outside the tree it is copied to."""
+
+
+def split_spec(spec: Path | str) -> tuple[str, str]:
+    """Splits a source into its file system path and a path inside it."""
+    path, _, inner = str(spec).partition(MEMBER_SEPARATOR)
+    return path, inner.strip("/")
+
+
+def join_spec(spec: Path | str, name: str) -> str:
+    """Returns the source of the file `name` within the source tree `spec`."""
+    if not is_archive(spec):
+        return str(pathlib.Path(spec) / name)
+    path, inner = split_spec(spec)
+    return f"{path}{MEMBER_SEPARATOR}{inner}/{name}".replace("!/", "!")
+
+
+def is_archive(spec: Path | str) -> bool:
+    path, _ = split_spec(spec)
+    return path.endswith(ARCHIVE_SUFFIXES) and os.path.isfile(path)
+
+
+class SourceTree:
+    """A tree of source files, named by posix paths relative to its root.
+
+    Directory names end with a slash.
+    """
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def walk(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def select(self, names: Iterable[str]) -> Iterator[str]:
+        """Walks only the files and subtrees `names`, and their parent directories.
+
+        Raises FileNotFoundError for a name which is not in the tree.
+        """
+        wanted: set[str] = {n.strip("/") for n in names}
+        found: set[str] = set()
+        for name in self.walk():
+            bare: str = name.rstrip("/")
+            for w in wanted:
+                if bare == w or bare.startswith(f"{w}/"):
+                    found.add(w)
+                    yield name
+                    break
+                if w.startswith(f"{bare}/"):
+                    yield name
+                    break
+        missing: set[str] = wanted - found
+        if missing:
+            raise FileNotFoundError(f"{', '.join(sorted(missing))} not found in the source tree")
+
+    def read_bytes(self, name: str) -> bytes:
+        raise NotImplementedError
+
+    def read_text(self, name: str) -> str:
+        return self.read_bytes(name).decode()
+
+    def size(self, name: str) -> int:
+        """Returns the size of the file `name` in bytes, without reading it where possible."""
+        return len(self.read_bytes(name))
+
+    def local_path(self, name: str) -> Optional[str]:
+        """Returns the file system path of `name`, if it has one."""
+        return None
+
+    def stat_key(self, name: str) -> tuple:
+        """Returns a cheap key which changes whenever `name`'s content does."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        return
+
+
+class DirectorySource(SourceTree):
+    def __init__(self, root: Path | str) -> None:
+        self.root: pathlib.Path = pathlib.Path(root).resolve()
+        if not self.root.is_dir():
+            raise NotADirectoryError(f"Source {root} is not a directory")
+
+    def walk(self, directory: str = "") -> Iterator[str]:
+        """Yields names depth first, holding one listing per level in memory."""
+        with os.scandir(os.path.join(self.root, directory)) as it:
+            entries: list[tuple[str, bool]] = sorted((e.name, e.is_dir()) for e in it)
+        for name, is_dir in entries:
+            if is_dir:
+                yield f"{directory}{name}/"
+                yield from self.walk(f"{directory}{name}/")
+            else:
+                yield f"{directory}{name}"
+
+    def select(self, names: Iterable[str]) -> Iterator[str]:
+        """Walks only the selected subtrees, not the whole tree."""
+        wanted: list[str] = sorted({n.strip("/") for n in names})
+        parents: set[str] = set()
+        for i, w in enumerate(wanted):
+            if any(w.startswith(f"{other}/") for other in wanted[:i]):
+                continue  # within a subtree already walked
+            parts: list[str] = w.split("/")[:-1]
+            for parent in (f"{'/'.join(parts[:j])}/" for j in range(1, len(parts) + 1)):
+                if parent not in parents:
+                    parents.add(parent)
+                    yield parent
+            path: str = self.local_path(w)
+            if os.path.isdir(path):
+                yield f"{w}/"
+                yield from self.walk(f"{w}/")
+            elif os.path.isfile(path):
+                yield w
+            else:
+                raise FileNotFoundError(f"{w} not found in the source tree")
+
+    def read_bytes(self, name: str) -> bytes:
+        with open(self.local_path(name), "rb") as f:
+            return f.read()
+
+    def local_path(self, name: str) -> Optional[str]:
+        # not a pathlib.Path, which would intern every name walked
+        return os.path.join(self.root, name)
+
+    def stat_key(self, name: str) -> tuple:
+        stat: os.stat_result = os.stat(self.local_path(name))
+        return stat.st_mtime_ns, stat.st_size
+
+    def size(self, name: str) -> int:
+        return os.path.getsize(self.local_path(name))
+
+
+class _ArchiveSource(SourceTree):
+    """Reads an archive's members through its index, opening it on first use."""
+
+    def __init__(self, spec: Path | str) -> None:
+        self.path, inner = split_spec(spec)
+        self.prefix: str = f"{inner}/" if inner else ""
+        self._handle = None
+
+    def _member_names(self) -> list[str]:
+        raise NotImplementedError
+
+    def _check_name(self, member: str) -> None:
+        if member.startswith("/") or ".." in member.rstrip("/").split("/"):
+            raise UnsafeMemberError(f"Archive {self.path} has an unsafe member name: {member}")
+
+    def walk(self) -> Iterator[str]:
+        """Yields names in archive order, each directory before its contents."""
+        directories: set[str] = set()
+        for member in self._member_names():
+            if not member.startswith(self.prefix) or member == self.prefix:
+                continue
+            name: str = member[len(self.prefix) :]
+            # archives need not store entries for the directories they contain
+            parts: list[str] = name.rstrip("/").split("/")[:-1]
+            for parent in (f"{'/'.join(parts[:i])}/" for i in range(1, len(parts) + 1)):
+                if parent not in directories:
+                    directories.add(parent)
+                    yield parent
+            if name.endswith("/"):
+                if name in directories:
+                    continue
+                directories.add(name)
+            yield name
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+class ZipSource(_ArchiveSource):
+    def _archive(self) -> zipfile.ZipFile:
+        if self._handle is None:
+            archive = zipfile.ZipFile(self.path)
+            try:
+                for member in archive.namelist():
+                    self._check_name(member)
+            except UnsafeMemberError:
+                archive.close()
+                raise
+            self._handle = archive
+        return self._handle
+
+    def _member_names(self) -> list[str]:
+        return self._archive().namelist()
+
+    def member(self, name: str) -> zipfile.ZipInfo:
+        return self._archive().getinfo(f"{self.prefix}{name}")
+
+    def read_bytes(self, name: str) -> bytes:
+        return self._archive().read(self.member(name))
+
+    def open(self, name: str) -> BinaryIO:
+        """Opens a member for reading, decompressing it as it is read."""
+        return self._archive().open(self.member(name))
+
+    def stat_key(self, name: str) -> tuple:
+        info: zipfile.ZipInfo = self.member(name)
+        return info.CRC, info.file_size
+
+    def size(self, name: str) -> int:
+        return self.member(name).file_size
+
+
+class TarSource(_ArchiveSource):
+    def __init__(self, spec: Path | str) -> None:
+        super().__init__(spec)
+        self._index: dict[str, tarfile.TarInfo] = {}
+
+    def _archive(self) -> tarfile.TarFile:
+        if self._handle is None:
+            archive: tarfile.TarFile = tarfile.open(self.path, "r:*")
+            self._index = {}
+            try:
+                for m in archive.getmembers():
+                    name: str = m.name.removeprefix("./") + ("/" if m.isdir() else "")
+                    self._check_name(name)
+                    self._index[name] = m
+            except UnsafeMemberError:
+                archive.close()
+                raise
+            self._handle = archive
+        return self._handle
+
+    def _member_names(self) -> list[str]:
+        self._archive()
+        return list(self._index)
+
+    def stat_key(self, name: str) -> tuple:
+        self._archive()
+        member: tarfile.TarInfo = self._index[f"{self.prefix}{name}"]
+        return member.mtime, member.size
+
+    def size(self, name: str) -> int:
+        self._archive()
+        return self._index[f"{self.prefix}{name}"].size
+
+    def read_bytes(self, name: str) -> bytes:
+        archive: tarfile.TarFile = self._archive()
+        member: tarfile.TarInfo = self._index[f"{self.prefix}{name}"]
+        f = archive.extractfile(member)
+        if f is None:
+            raise IsADirectoryError(f"{name} is not a regular file")
+        with f:
+            return f.read()
+
+
+def open_source(spec: Path | str) -> SourceTree:
+    path, _ = split_spec(spec)
+    if not is_archive(spec):
+        return DirectorySource(spec)
+    if path.endswith(".zip"):
+        return ZipSource(spec)
+    return TarSource(spec)
+
+
+def read_file(spec: Path | str) -> str:
+    """Reads a single file, which may be a member of an archive.
+
+    An archive given without a member must contain exactly one file.
+    """
+    if not is_archive(spec):
+        with open(spec) as f:
+            return f.read()
+
+    path, inner = split_spec(spec)
+    parent, _, member = inner.rpartition("/")
+    with open_source(f"{path}{MEMBER_SEPARATOR}{parent}") as archive:
+        if member:
+            return archive.read_text(member)
+        files: list[str] = list(
+            itertools.islice((n for n in archive.walk() if not n.endswith("/")), 2)
+        )
+        if len(files) != 1:
+            raise FileNotFoundError(f"Archive {path} does not name a single file")
+        return archive.read_text(files[0])
+
+
+def paths_to_create(
+    source: SourceTree, destination: Path | str, only: Optional[Iterable[str]] = None
+) -> Iterator[tuple[str, str]]:
+    """Pairs each name in `source` with its path under `destination`.
+
+    Pairs are yielded as the source is walked, each directory before its
+    contents; directory names keep their trailing slash. With `only`, just
+    those names (files or directories) of `source` are walked.
+    """
+
+    dest: str = str(pathlib.Path(destination).resolve())
+    if os.path.exists(dest) and not os.path.isdir(dest):
+        msg = "Both source and destination must be directories"
+        raise NotADirectoryError(msg)
+
+    names: Iterator[str] = source.walk() if only is None else source.select(only)
+    for name in names:
+        yield name, os.path.join(dest, name).rstrip("/")
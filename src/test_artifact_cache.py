@@ -0,0 +1,147 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for the shared cache of rendered pages."""
+
+
+import contextlib
+import http.client
+import io
+import os
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+
+import generate_webpages
+from artifact_cache import (
+    ArtifactCache,
+    CorruptArtifact,
+    DirectoryStore,
+    HTTPStore,
+    pack,
+    unpack,
+)
+from artifact_server import ArtifactServer
+from config import BuildOptions
+from generate_webpages import generate_pages_recursive
+
+
+KEY = "0" * 64
+
+
+class TestArtifactEntries(unittest.TestCase):
+    def test_round_trip(self):
+        self.assertEqual(unpack(KEY, pack(KEY, b"<p></p>")), b"<p></p>")
+
+    def test_tampered_entry_rejected(self):
+        entry = pack(KEY, b"<p></p>")
+        with self.assertRaises(CorruptArtifact):
+            unpack(KEY, entry[:-1] + b"!")
+        with self.assertRaises(CorruptArtifact):
+            unpack("1" * 64, entry)
+        with self.assertRaises(CorruptArtifact):
+            unpack(KEY, b"<p></p>")
+
+    def test_unreachable_store_disables_cache(self):
+        cache = ArtifactCache(HTTPStore("http://127.0.0.1:9", timeout=1))
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertIsNone(cache.fetch(KEY))
+        self.assertTrue(cache.broken)
+        cache.save(KEY, b"<p></p>")
+
+    def test_dropped_response_disables_cache(self):
+        store = HTTPStore("http://127.0.0.1:9")
+        cache = ArtifactCache(store)
+        dropped = http.client.IncompleteRead(b"SSGART1", 100)
+        with (
+            mock.patch.object(store, "get", side_effect=dropped),
+            contextlib.redirect_stderr(io.StringIO()),
+        ):
+            self.assertIsNone(cache.fetch(KEY))
+        self.assertTrue(cache.broken)
+
+    def test_failed_put_leaves_no_temp_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DirectoryStore(tmp)
+            with mock.patch("os.replace", side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    store.put(KEY, b"entry")
+            self.assertListEqual(os.listdir(os.path.join(tmp, KEY[:2])), [])
+
+
+class TestCachedBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp.name)
+        (self.root / "content" / "majesty").mkdir(parents=True)
+        (self.root / "content" / "index.md").write_text("# Home\n\nWelcome")
+        (self.root / "content" / "majesty" / "index.md").write_text("# Majesty\n\nA page")
+        (self.root / "template.html").write_text("<title>{{ Title }}</title>{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, public, location, **options):
+        options = BuildOptions(artifact_cache=location, **options)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            generate_pages_recursive(
+                self.root / "content", self.root / "template.html", self.root / public, options
+            )
+        return (self.root / public / "majesty" / "index.html").read_text()
+
+    def assert_second_build_fetches(self, location):
+        first = self.build("public", location)
+        with mock.patch.object(generate_webpages, "render_page") as render:
+            self.assertEqual(self.build("elsewhere", location), first)
+            render.assert_not_called()
+
+    def test_shared_directory(self):
+        self.assert_second_build_fetches(str(self.root / "artifacts"))
+
+    def test_http_store(self):
+        server = ArtifactServer(str(self.root / "served")).start()
+        try:
+            self.assert_second_build_fetches(server.url)
+        finally:
+            server.stop()
+
+    def test_template_change_misses(self):
+        location = str(self.root / "artifacts")
+        self.build("public", location)
+        (self.root / "template.html").write_text("<h2>{{ Title }}</h2>{{ Content }}")
+        self.assertTrue(self.build("public", location).startswith("<h2>Majesty</h2>"))
+
+    def test_service_worker_misses(self):
+        location = str(self.root / "artifacts")
+        self.build("public", location)
+        self.assertIn("serviceWorker", self.build("public", location, service_worker=True))
+
+    def test_resource_hints_not_shared(self):
+        location = str(self.root / "artifacts")
+        (self.root / "content" / "index.md").write_text("# Home\n\n[Majesty](/majesty/)")
+        self.build("public", location)
+        # the first build with hints only fills in the link graph
+        for public in ("public", "elsewhere"):
+            self.build(public, location, resource_hints=3, cache_dir=str(self.root / "cache"))
+        home = (self.root / "elsewhere" / "index.html").read_text()
+        self.assertIn('<link rel="prefetch" href="/majesty/">', home)
+
+    def test_corrupt_entries_are_rendered_and_replaced(self):
+        location = str(self.root / "artifacts")
+        first = self.build("public", location)
+        for dirpath, _, files in os.walk(location):
+            for name in files:
+                pathlib.Path(dirpath, name).write_bytes(b"garbage")
+
+        self.assertEqual(self.build("elsewhere", location), first)
+        store = DirectoryStore(location)
+        for dirpath, _, files in os.walk(location):
+            for name in files:
+                unpack(name, store.get(name))
+
+    def test_unreachable_store_falls_back_to_rendering(self):
+        self.assertIn("A page", self.build("public", "http://127.0.0.1:9"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for inlining small assets as data URIs."""
+
+
+import base64
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+import zipfile
+
+from assets import AssetInliner, asset_source, configure_asset_inlining
+from sources import DirectorySource
+from textnode import TextNode, TextType, text_node_to_html_node
+
+
+class TestAssetInliner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = pathlib.Path(self.tmp.name)
+        (self.static / "images").mkdir()
+        (self.static / "images" / "icon.png").write_bytes(b"\x89PNG tiny")
+        (self.static / "images" / "photo.png").write_bytes(b"x" * 4096)
+
+    def tearDown(self):
+        configure_asset_inlining(self.static, 0)
+        self.tmp.cleanup()
+
+    def test_small_asset_inlined(self):
+        inliner = AssetInliner(self.static, 2048)
+        encoded = base64.b64encode(b"\x89PNG tiny").decode()
+        self.assertEqual(
+            inliner.source("/images/icon.png"), f"data:image/png;base64,{encoded}"
+        )
+
+    def test_large_and_remote_assets_untouched(self):
+        inliner = AssetInliner(self.static, 2048)
+        self.assertEqual(inliner.source("/images/photo.png"), "/images/photo.png")
+        self.assertEqual(
+            inliner.source("https://example.com/icon.png"), "https://example.com/icon.png"
+        )
+        self.assertEqual(inliner.source("/../secret.png"), "/../secret.png")
+        self.assertEqual(inliner.source("/images/missing.png"), "/images/missing.png")
+
+    def test_asset_encoded_once(self):
+        inliner = AssetInliner(self.static, 2048)
+        with mock.patch.object(
+            DirectorySource, "read_bytes", autospec=True, return_value=b"icon"
+        ) as read:
+            for _ in range(10):
+                inliner.source("/images/icon.png")
+        self.assertEqual(read.call_count, 1)
+
+    def test_archive_static_tree(self):
+        with zipfile.ZipFile(self.static / "site.zip", "w") as archive:
+            archive.writestr("static/images/icon.png", b"\x89PNG tiny")
+            archive.writestr("static/images/photo.png", b"x" * 4096)
+        inliner = AssetInliner(f"{self.static / 'site.zip'}!static", 2048)
+        encoded = base64.b64encode(b"\x89PNG tiny").decode()
+        self.assertEqual(inliner.source("/images/icon.png"), f"data:image/png;base64,{encoded}")
+        self.assertEqual(inliner.source("/images/photo.png"), "/images/photo.png")
+        self.assertEqual(inliner.source("/images/missing.png"), "/images/missing.png")
+
+    def test_text_node_to_html_node(self):
+        node = TextNode("icon", TextType.IMAGE, "/images/icon.png")
+        configure_asset_inlining(self.static, 0)
+        self.assertEqual(text_node_to_html_node(node).props["src"], "/images/icon.png")
+        configure_asset_inlining(self.static, 2048)
+        self.assertTrue(
+            text_node_to_html_node(node).props["src"].startswith("data:image/png;base64,")
+        )
+        self.assertEqual(asset_source("/images/photo.png"), "/images/photo.png")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for the on-disk cache of parsed markdown."""
+
+
+import tempfile
+import unittest
+from unittest import mock
+
+import ast_cache
+from ast_cache import cache_path, decode_blocks, encode_blocks, load_parsed
+from config import BuildOptions
+from generate_webpages import render_page
+from markdown_to_html import blocks_to_html_node, markdown_to_html_node, parse_markdown
+
+
+MARKDOWN = """
+# A **heading**
+
+A paragraph with *italic*, `code`, a [link](https://boot.dev)
+and an ![image](/images/rivendell.png).
+
+> A quote
+
+* one
+* two
+
+1. first
+2. second
+
+```
+code block
+```
+"""
+
+
+class TestASTCache(unittest.TestCase):
+    def test_round_trip(self):
+        blocks = parse_markdown(MARKDOWN)
+        self.assertEqual(decode_blocks(encode_blocks(blocks)), blocks)
+        self.assertEqual(
+            blocks_to_html_node(decode_blocks(encode_blocks(blocks))).to_html(),
+            markdown_to_html_node(MARKDOWN).to_html(),
+        )
+
+    def test_rejects_foreign_data(self):
+        with self.assertRaises(ValueError):
+            decode_blocks(b"<html></html>")
+
+    def test_hit_skips_parsing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            blocks = load_parsed(MARKDOWN, tmp)
+            self.assertTrue(cache_path(tmp, MARKDOWN).is_file())
+            with mock.patch.object(ast_cache, "parse_markdown") as parse:
+                self.assertEqual(load_parsed(MARKDOWN, tmp), blocks)
+                parse.assert_not_called()
+
+    def test_keyed_by_source_and_parser_version(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = cache_path(tmp, MARKDOWN)
+            self.assertNotEqual(path, cache_path(tmp, MARKDOWN + "\nmore"))
+            with mock.patch.object(ast_cache, "PARSER_VERSION", ast_cache.PARSER_VERSION + 1):
+                self.assertNotEqual(path, cache_path(tmp, MARKDOWN))
+
+    def test_corrupt_entry_is_reparsed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = cache_path(tmp, MARKDOWN)
+            path.parent.mkdir(parents=True)
+            path.write_bytes(b"SSGAST\x00garbage")
+            self.assertEqual(load_parsed(MARKDOWN, tmp), parse_markdown(MARKDOWN))
+
+    def test_render_page_uses_cache(self):
+        template = "<title>{{ Title }}</title>{{ Content }}"
+        with tempfile.TemporaryDirectory() as tmp:
+            options = BuildOptions(ast_cache=True, cache_dir=tmp)
+            first = render_page(MARKDOWN, template, options)
+            self.assertEqual(first, render_page(MARKDOWN, template))
+            self.assertEqual(first, render_page(MARKDOWN, template, options))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for the in-memory build API."""
+
+
+import concurrent.futures
+import unittest
+from unittest import mock
+
+from assets import configure_asset_inlining
+from build_api import (
+    BuildError,
+    InvalidSourcePath,
+    PageError,
+    StylesheetError,
+    iter_render_site,
+    output_path,
+    render_site,
+)
+
+
+TEMPLATE = "<html><head><title>{{ Title }}</title></head><body>{{ Content }}</body></html>"
+
+SOURCES = {
+    "index.md": "# Home\n\n![logo](/images/logo.png)",
+    "majesty/index.md": "# Majesty\n\n- *one*\n- two",
+}
+
+
+class TestBuildAPI(unittest.TestCase):
+    def test_render_site(self):
+        self.assertDictEqual(
+            render_site(SOURCES, "<title>{{ Title }}</title>{{ Content }}"),
+            {
+                "index.html": "<title>Home</title><div><h1 id='home'>Home</h1>"
+                "<p><img src='/images/logo.png' alt='logo'></img></p></div>",
+                "majesty/index.html": "<title>Majesty</title><div><h1 id='majesty'>Majesty</h1>"
+                "<ul><li><i>one</i></li><li>two</li></ul></div>",
+            },
+        )
+
+    def test_does_not_touch_file_system(self):
+        # asset inlining configured by an earlier build must not apply either
+        configure_asset_inlining(".", 1 << 20)
+        try:
+            with mock.patch("builtins.open", side_effect=AssertionError("file opened")):
+                pages = render_site(SOURCES, TEMPLATE, stylesheet="h1 { color: red }")
+        finally:
+            configure_asset_inlining(".", 0)
+        self.assertIn("<style>h1{color: red}</style>", pages["index.html"])
+        self.assertIn("src='/images/logo.png'", pages["index.html"])
+
+    def test_lazy_and_typed_errors(self):
+        pages = iter_render_site({"index.md": "# Home", "broken.md": "no title"}, TEMPLATE)
+        self.assertEqual(next(pages)[0], "index.html")
+        with self.assertRaises(PageError) as raised:
+            next(pages)
+        self.assertEqual(raised.exception.source, "broken.md")
+        self.assertIsInstance(raised.exception, BuildError)
+
+    def test_invalid_stylesheet(self):
+        with self.assertRaises(StylesheetError) as raised:
+            render_site({"index.md": "# Home"}, TEMPLATE, stylesheet="h1 { color: red")
+        self.assertIsInstance(raised.exception, BuildError)
+        self.assertIn("unbalanced braces", str(raised.exception))
+
+    def test_output_paths(self):
+        self.assertEqual(output_path("./majesty/index.md"), "majesty/index.html")
+        for source in ("/etc/passwd.md", "../outside.md"):
+            with self.assertRaises(InvalidSourcePath):
+                output_path(source)
+
+    def test_concurrent_calls(self):
+        sites = [
+            {f"page{i}/index.md": f"# Page {i}\n\n**{n}**" for i in range(20)}
+            for n in range(16)
+        ]
+        expected = [render_site(site, TEMPLATE) for site in sites]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda site: render_site(site, TEMPLATE), sites))
+        self.assertListEqual(results, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
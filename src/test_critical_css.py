@@ -0,0 +1,124 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for inlining critical CSS."""
+
+
+import pathlib
+import tempfile
+import unittest
+
+from config import BuildOptions
+from critical_css import (
+    ANY_TAG,
+    CSSRule,
+    StylesheetIndex,
+    inline_critical_css,
+    load_stylesheet_index,
+    parse_stylesheet,
+    selector_tags,
+    template_tags,
+)
+from generate_webpages import StylesheetError, render_page
+
+
+CSS = """
+/* page body */
+body { margin: 0; }
+h1,
+h2 { color: #58a6ff; }
+pre code { padding: 0; }
+a:hover { text-decoration: underline; }
+.note { color: red; }
+@media (max-width: 600px) {
+    img { max-width: 100%; }
+}
+"""
+
+
+class TestParseStylesheet(unittest.TestCase):
+    def test_rules(self):
+        self.assertListEqual(
+            parse_stylesheet(CSS),
+            [
+                CSSRule(["body"], "margin: 0"),
+                CSSRule(["h1", "h2"], "color: #58a6ff"),
+                CSSRule(["pre code"], "padding: 0"),
+                CSSRule(["a:hover"], "text-decoration: underline"),
+                CSSRule([".note"], "color: red"),
+                CSSRule(["img"], "max-width: 100%", ["@media (max-width: 600px)"]),
+            ],
+        )
+
+    def test_selector_tags(self):
+        self.assertEqual(selector_tags("pre code"), ("code", frozenset({"pre", "code"})))
+        self.assertEqual(selector_tags("a:hover"), ("a", frozenset({"a"})))
+        self.assertEqual(selector_tags(".note"), (ANY_TAG, frozenset()))
+        self.assertEqual(selector_tags("ul > li[data-x='a b']"), ("li", frozenset({"ul", "li"})))
+
+
+class TestCriticalCSS(unittest.TestCase):
+    def setUp(self):
+        self.index = StylesheetIndex(parse_stylesheet(CSS))
+
+    def test_only_used_tags(self):
+        self.assertEqual(
+            self.index.critical_css({"body", "h2", "code"}),
+            "body{margin: 0}h2{color: #58a6ff}.note{color: red}",
+        )
+
+    def test_descendant_requires_all_tags(self):
+        self.assertIn("pre code{padding: 0}", self.index.critical_css({"pre", "code"}))
+
+    def test_media_wrapper_kept(self):
+        self.assertIn(
+            "@media (max-width: 600px){img{max-width: 100%}}",
+            self.index.critical_css({"img"}),
+        )
+
+    def test_json_roundtrip(self):
+        index = StylesheetIndex.from_json(self.index.to_json())
+        self.assertListEqual(index.rules, self.index.rules)
+
+    def test_cached_between_builds(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            stylesheet = f"{tmp}/index.css"
+            with open(stylesheet, "w") as f:
+                f.write(CSS)
+            index = load_stylesheet_index(stylesheet, f"{tmp}/cache")
+            self.assertIs(load_stylesheet_index(stylesheet, f"{tmp}/cache"), index)
+
+            cached = list(pathlib.Path(tmp, "cache", "critical_css").glob("*.json"))
+            self.assertEqual(len(cached), 1)
+            self.assertListEqual(
+                StylesheetIndex.from_json(cached[0].read_text()).rules, index.rules
+            )
+
+    def test_invalid_stylesheet_names_its_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            stylesheet = f"{tmp}/broken.css"
+            with open(stylesheet, "w") as f:
+                f.write("h1 { color: red")
+            options = BuildOptions(
+                critical_css=True, stylesheet=stylesheet, cache_dir=f"{tmp}/cache"
+            )
+            with self.assertRaises(StylesheetError) as raised:
+                render_page("# Home", "{{ Content }}", options)
+        self.assertEqual(raised.exception.path, stylesheet)
+        self.assertIn("broken.css: Invalid stylesheet", str(raised.exception))
+
+
+class TestInlineCriticalCSS(unittest.TestCase):
+    def test_stylesheet_deferred(self):
+        html = '<html><head><link href="/index.css" rel="stylesheet"></head><body></body></html>'
+        inlined = inline_critical_css(html, "p{color: red}", "/index.css")
+        self.assertTrue(inlined.startswith("<html><head><style>p{color: red}</style>"))
+        self.assertIn('<link rel="preload" href="/index.css" as="style"', inlined)
+        self.assertIn('<noscript><link rel="stylesheet" href="/index.css"></noscript>', inlined)
+        self.assertNotIn('<link href="/index.css" rel="stylesheet">', inlined)
+
+    def test_template_tags(self):
+        self.assertEqual(template_tags("<html><Body><article></article>"), {"html", "body", "article"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for the build daemon and its client."""
+
+
+import io
+import os
+import pathlib
+import tempfile
+import threading
+import unittest
+import zipfile
+
+from build_client import request_build
+from daemon import BuildServer
+
+
+class TestBuildDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.tmp.name)
+        self.content = root / "content"
+        (self.content / "majesty").mkdir(parents=True)
+        (self.content / "index.md").write_text("# Home\n\nWelcome")
+        (self.content / "majesty" / "index.md").write_text("# Majesty\n\nA page")
+        (root / "static").mkdir()
+        (root / "static" / "index.css").write_text("body {}")
+        (root / "template.html").write_text("<title>{{ Title }}</title>{{ Content }}")
+        self.public = root / "public"
+        self.public.mkdir()
+        self.argv = [
+            f"--content={self.content}",
+            f"--static={root / 'static'}",
+            f"--template={root / 'template.html'}",
+            f"--public={self.public}",
+            f"--changes={root / 'changes.json'}",
+        ]
+
+        self.socket_path = str(root / "build.sock")
+        self.server = BuildServer(self.socket_path)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def build(self):
+        out = io.StringIO()
+        reply = request_build(self.argv, self.socket_path, out)
+        self.assertEqual(reply["status"], "ok", reply.get("error"))
+        return reply, out.getvalue()
+
+    def test_rebuilds_only_what_changed(self):
+        reply, progress = self.build()
+        self.assertEqual(reply["built"], 3)
+        self.assertIn("Generating page from", progress)
+        self.assertEqual(
+            (self.public / "majesty" / "index.html").read_text(),
+            "<title>Majesty</title><div><h1 id='majesty'>Majesty</h1><p>A page</p></div>",
+        )
+
+        reply, progress = self.build()
+        self.assertEqual((reply["built"], reply["skipped"]), (0, 3))
+        self.assertEqual(progress, "")
+
+        (self.content / "majesty" / "index.md").write_text("# Majesty\n\nAn edited page")
+        reply, _ = self.build()
+        self.assertEqual((reply["built"], reply["skipped"]), (1, 2))
+        self.assertIn("An edited page", (self.public / "majesty" / "index.html").read_text())
+
+        (self.content / "majesty" / "index.md").unlink()
+        reply, _ = self.build()
+        self.assertEqual(reply["removed"], [str(self.public / "majesty" / "index.html")])
+        self.assertFalse((self.public / "majesty" / "index.html").exists())
+
+    def test_failed_build_keeps_daemon_running(self):
+        reply = request_build(["--content=/nonexistent"], self.socket_path, io.StringIO())
+        self.assertEqual(reply["status"], "failed")
+        self.build()
+
+    def test_source_errors_reported_as_by_main(self):
+        static = pathlib.Path(self.tmp.name) / "static.zip"
+        with zipfile.ZipFile(static, "w") as archive:
+            archive.writestr("../index.css", "body {}")
+        reply = request_build([*self.argv, f"--static={static}"], self.socket_path, io.StringIO())
+        self.assertEqual(reply["status"], "failed")
+        self.assertEqual(
+            reply["error"], f"Archive {static} has an unsafe member name: ../index.css"
+        )
+
+    def test_failed_page_built_again(self):
+        self.build()
+        page = self.content / "majesty" / "index.md"
+        page.write_text("# Majesty\n\nAn **unclosed page")
+        for _ in range(2):
+            reply = request_build(self.argv, self.socket_path, io.StringIO())
+            self.assertEqual(reply["status"], "failed")
+            self.assertIn("majesty", reply["error"])
+
+        page.write_text("# Majesty\n\nA **fixed** page")
+        reply, _ = self.build()
+        self.assertEqual(reply["built"], 1)
+        self.assertIn("<b>fixed</b>", (self.public / "majesty" / "index.html").read_text())
+
+    def test_rejects_other_working_directory(self):
+        reply = request_build(self.argv, self.socket_path, io.StringIO())
+        self.assertEqual(reply["status"], "ok")
+        cwd = os.getcwd()
+        try:
+            os.chdir(self.tmp.name)
+            reply = request_build(self.argv, self.socket_path, io.StringIO())
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(reply["status"], "failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for csv and tsv tables included in pages."""
+
+
+import contextlib
+import io
+import pathlib
+import tempfile
+import unittest
+
+from build_state import BuildState
+from config import BuildOptions
+from data_tables import DataTable, split_page_name
+from generate_webpages import PageError, generate_pages_recursive, render_page
+from markdown_to_html import parse_markdown
+from sources import DirectorySource
+
+
+class TestDataTables(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp.name)
+        (self.root / "content" / "reports").mkdir(parents=True)
+        (self.root / "template.html").write_text("<h1>{{ Title }}</h1>{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, state=None, **options):
+        options = BuildOptions(cache_dir=str(self.root / "cache"), **options)
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            generate_pages_recursive(
+                self.root / "content",
+                self.root / "template.html",
+                self.root / "public",
+                options,
+                state=state,
+            )
+        return [line.split()[3] for line in log.getvalue().splitlines() if "Generating" in line]
+
+    def test_include_block(self):
+        blocks = parse_markdown("{{ Table data/q3.csv }}\n\n{{ Table }}")
+        self.assertEqual(blocks[0].block_type, "table")
+        self.assertEqual(blocks[0].info, "data/q3.csv")
+        self.assertEqual(blocks[1].block_type, "paragraph")
+
+    def test_streamed_table(self):
+        (self.root / "content" / "reports" / "q3.csv").write_text('name,total\n"a, b",1\n<c>,2\n')
+        (self.root / "content" / "reports" / "q3.md").write_text(
+            "# Q3\n\n{{ Table q3.csv }}\n\nSee above."
+        )
+        self.build()
+        self.assertEqual(
+            (self.root / "public" / "reports" / "q3.html").read_text(),
+            "<h1>Q3</h1><div><h1 id='q3'>Q3</h1><table><thead><tr><th>name</th><th>total</th>"
+            "</tr></thead><tbody><tr><td>a, b</td><td>1</td></tr><tr><td>&lt;c&gt;</td>"
+            "<td>2</td></tr></tbody></table><p>See above.</p></div>",
+        )
+
+    def test_tsv_and_data_changes(self):
+        data = self.root / "content" / "reports" / "q3.tsv"
+        data.write_text("a\tb\n1\t2\n")
+        (self.root / "content" / "reports" / "q3.md").write_text("# Q3\n\n{{ Table q3.tsv }}")
+        self.build()
+        data.write_text("a\tb\n3\t4\n")
+        self.build()
+        page = (self.root / "public" / "reports" / "q3.html").read_text()
+        self.assertIn("<tr><td>3</td><td>4</td></tr>", page)
+
+    def test_pages_keyed_on_their_own_data(self):
+        reports = self.root / "content" / "reports"
+        (reports / "q3.csv").write_text("a\n1\n")
+        (reports / "other.csv").write_text("a\n1\n")
+        (reports / "q3.md").write_text("# Q3\n\n{{ Table q3.csv }}")
+        (reports / "notes.md").write_text("# Notes")
+        state = BuildState()
+        self.assertEqual(len(self.build(state)), 2)
+        self.assertListEqual(self.build(state), [])
+
+        (reports / "other.csv").write_text("a\n2\n")
+        self.assertListEqual(self.build(state), [])
+        (reports / "q3.csv").write_text("a\n3\n")
+        self.assertListEqual(self.build(state), [str(self.root / "content/reports/q3.md")])
+
+    def test_split_pages(self):
+        rows = "".join(f"{n},{n * n}\n" for n in range(5))
+        (self.root / "content" / "reports" / "squares.csv").write_text("n,square\n" + rows)
+        (self.root / "content" / "reports" / "squares.md").write_text(
+            "# Squares\n\n{{ Table squares.csv }}"
+        )
+        self.build(table_page_rows=2)
+        public = self.root / "public" / "reports"
+        self.assertListEqual(
+            sorted(p.name for p in public.iterdir()),
+            ["squares-2.html", "squares-3.html", "squares.html"],
+        )
+        second = (public / "squares-2.html").read_text()
+        self.assertIn("<th>n</th><th>square</th>", second)
+        self.assertIn("<tr><td>2</td><td>4</td></tr><tr><td>3</td><td>9</td></tr></tbody>", second)
+        self.assertNotIn("<td>1</td>", second)
+        self.assertIn(
+            "<nav class='table-pages'><a href='squares.html'>Previous</a> | Page 2 of 3 | "
+            "<a href='squares-3.html'>Next</a></nav>",
+            second,
+        )
+
+        self.build(table_page_rows=3)
+        self.assertIn("Page 2 of 2", (public / "squares-2.html").read_text())
+
+    def test_missing_or_outside_data(self):
+        content = DirectorySource(self.root / "content")
+        with self.assertRaisesRegex(ValueError, "not found"):
+            DataTable(content, "reports/q3.md", "missing.csv")
+        with self.assertRaisesRegex(ValueError, "outside"):
+            DataTable(content, "reports/q3.md", "../../secrets.csv")
+        (self.root / "content" / "bad.md").write_text("# Bad\n\n{{ Table missing.csv }}")
+        with self.assertRaises(PageError):
+            self.build()
+
+    def test_nul_in_page_text(self):
+        (self.root / "content" / "reports" / "q3.csv").write_text("a\n1\n")
+        (self.root / "content" / "reports" / "q3.md").write_text(
+            "# Q3\n\nBefore\x00table:q3.csv\x00after.\n\n{{ Table q3.csv }}"
+        )
+        (self.root / "content" / "reports" / "notes.md").write_text("# Notes\n\nA \x00 b")
+        self.build()
+        page = (self.root / "public" / "reports" / "q3.html").read_text()
+        self.assertIn("Before\x00table:q3.csv\x00after.", page)
+        self.assertEqual(page.count("<table>"), 1)
+        notes = (self.root / "public" / "reports" / "notes.html").read_text()
+        self.assertIn("A \x00 b", notes)
+
+    def test_tables_dropped_without_streaming(self):
+        page = render_page("# T\n\n{{ Table t.csv }}", "{{ Content }}")
+        self.assertEqual(page, "<div><h1 id='t'>T</h1></div>")
+
+    def test_split_page_name(self):
+        self.assertEqual(split_page_name("a/index.html", 1), "a/index.html")
+        self.assertEqual(split_page_name("a/index.html", 3), "a/index-3.html")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for the sitemap and Atom feed."""
+
+
+import contextlib
+import hashlib
+import io
+import os
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+import xml.etree.ElementTree as ET
+
+from config import BuildOptions
+from feeds import newest_entries, write_feed, write_sitemap
+from generate_webpages import generate_pages_recursive
+from output import DirectoryWriter
+from sections import MetadataIndex
+
+
+SITE = "https://example.com/"
+SM = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+def index_of(count):
+    index = MetadataIndex()
+    index.add("index.md", (0,), "Home & co", {}, "2024-01-01T00:00:00Z")
+    for i in range(count):
+        front_matter = {"date": f"2024-02-{i + 1:02d}"}
+        index.add(f"posts/p{i}.md", (i,), f"Post {i}", front_matter, f"2024-03-{i + 1:02d}T00:00:00Z")
+    return index
+
+
+class TestFeeds(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.writer = DirectoryWriter(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, name):
+        return ET.parse(os.path.join(self.tmp.name, name)).getroot()
+
+    def write(self, function, *args):
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            outputs = function(*args)
+        return outputs, log.getvalue().split()[1::2]
+
+    def test_single_sitemap(self):
+        self.write(write_sitemap, index_of(2), SITE, self.writer)
+        urls = self.read("sitemap.xml").findall(f"{SM}url")
+        self.assertListEqual(
+            [u.find(f"{SM}loc").text for u in urls],
+            ["https://example.com/", "https://example.com/posts/p0.html", "https://example.com/posts/p1.html"],
+        )
+        self.assertEqual(urls[1].find(f"{SM}lastmod").text, "2024-03-01T00:00:00Z")
+
+    def test_sharded_sitemap_rewrites_changed_shards(self):
+        index = index_of(5)
+        outputs, written = self.write(write_sitemap, index, SITE, self.writer, 2)
+        self.assertListEqual(written, ["sitemap-1.xml", "sitemap-2.xml", "sitemap-3.xml", "sitemap.xml"])
+        shards = self.read("sitemap.xml").findall(f"{SM}sitemap")
+        self.assertEqual(shards[2].find(f"{SM}loc").text, "https://example.com/sitemap-3.xml")
+        self.assertEqual(shards[2].find(f"{SM}lastmod").text, "2024-03-05T00:00:00Z")
+
+        index.outputs = outputs
+        index.add("posts/p4.md", (9,), "Post 4", {}, "2024-04-01T00:00:00Z")
+        _, written = self.write(write_sitemap, index, SITE, self.writer, 2)
+        self.assertListEqual(written, ["sitemap-3.xml", "sitemap.xml"])
+
+    def test_sitemap_shards_streamed(self):
+        index = index_of(5)
+        with mock.patch.object(self.writer, "write_bytes") as write_bytes:
+            outputs, _ = self.write(write_sitemap, index, SITE, self.writer, 2)
+        write_bytes.assert_not_called()
+        with open(os.path.join(self.tmp.name, "sitemap-1.xml"), "rb") as f:
+            self.assertEqual(outputs["sitemap-1.xml"], hashlib.sha256(f.read()).hexdigest())
+
+    def test_feed_keeps_newest_entries(self):
+        index = index_of(5)
+        self.assertListEqual([m.title for m in newest_entries(index, 2)], ["Post 4", "Post 3"])
+        outputs, written = self.write(write_feed, index, SITE, 2, self.writer)
+        feed = self.read("feed.xml")
+        self.assertEqual(feed.find(f"{ATOM}title").text, "Home & co")
+        self.assertEqual(feed.find(f"{ATOM}updated").text, "2024-03-05T00:00:00Z")
+        self.assertListEqual(
+            [e.find(f"{ATOM}id").text for e in feed.findall(f"{ATOM}entry")],
+            ["https://example.com/posts/p4.html", "https://example.com/posts/p3.html"],
+        )
+        index.outputs = outputs
+        self.assertEqual(self.write(write_feed, index, SITE, 2, self.writer)[1], [])
+
+
+class TestFeedBuild(unittest.TestCase):
+    def test_build_writes_sitemap_and_feed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = pathlib.Path(tmp)
+            (root / "content").mkdir()
+            (root / "content" / "index.md").write_text("# Home")
+            (root / "content" / "post.md").write_text("---\ndate: 2024-05-01\n---\n# Post")
+            (root / "template.html").write_text("{{ Content }}")
+            options = BuildOptions(
+                site_url=SITE, sitemap=True, feed_entries=10, cache_dir=str(root / "cache")
+            )
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(root / "content", root / "template.html", root / "public", options)
+            sitemap = (root / "public" / "sitemap.xml").read_text()
+            self.assertIn("<loc>https://example.com/post.html</loc>", sitemap)
+            feed = (root / "public" / "feed.xml").read_text()
+            self.assertIn("<title>Post</title>", feed)
+            self.assertNotIn("<entry><title>Home", feed)
+
+            # a touched but unchanged page keeps its lastmod
+            lastmod = MetadataIndex.load(str(root / "cache" / "metadata.json")).pages["post.md"][1].lastmod
+            os.utime(root / "content" / "post.md", (0, 0))
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(root / "content", root / "template.html", root / "public", options)
+            self.assertIn(f"<lastmod>{lastmod}</lastmod>", (root / "public" / "sitemap.xml").read_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
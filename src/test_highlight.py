@@ -0,0 +1,70 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for syntax highlighting of fenced code blocks."""
+
+
+import unittest
+
+from ast_cache import decode_blocks, encode_blocks
+from highlight import HighlightCache, language_of, tokenize
+from markdown_to_html import markdown_to_html_node, parse_markdown
+
+
+class TestTokenize(unittest.TestCase):
+    def test_python(self):
+        self.assertEqual(
+            tokenize('def f(x):  # <b>\n    return "a" + 1', "python"),
+            "<span class='tok-keyword'>def</span> f(x):  "
+            "<span class='tok-comment'># &lt;b&gt;</span>\n"
+            "    <span class='tok-keyword'>return</span> "
+            "<span class='tok-string'>\"a\"</span> + <span class='tok-number'>1</span>",
+        )
+
+    def test_keywords_inside_words_and_strings(self):
+        self.assertEqual(
+            tokenize("const format = 'if';", "js"),
+            "<span class='tok-keyword'>const</span> format = "
+            "<span class='tok-string'>'if'</span>;",
+        )
+
+    def test_unknown_language_is_escaped(self):
+        self.assertEqual(tokenize("a < b && c", "cobol"), "a &lt; b &amp;&amp; c")
+
+    def test_language_of(self):
+        self.assertEqual(language_of(" Python title=a.py"), "python")
+        self.assertEqual(language_of(""), "")
+
+
+class TestCodeBlocks(unittest.TestCase):
+    def test_fence_body_is_literal(self):
+        html = markdown_to_html_node("```python\nx = '**not bold**'  # [a](b)\n```").to_html()
+        self.assertEqual(
+            html,
+            "<div><pre><code class='language-python'>x = "
+            "<span class='tok-string'>'**not bold**'</span>  "
+            "<span class='tok-comment'># [a](b)</span>\n</code></pre></div>",
+        )
+
+    def test_fence_without_info(self):
+        html = markdown_to_html_node("```\n<p>*x*</p>\n```").to_html()
+        self.assertEqual(html, "<div><pre><code>&lt;p&gt;*x*&lt;/p&gt;\n</code></pre></div>")
+
+    def test_info_survives_the_ast_cache(self):
+        blocks = parse_markdown("```sh\necho hi\n```")
+        self.assertEqual(blocks[0].info, "sh")
+        self.assertEqual(decode_blocks(encode_blocks(blocks)), blocks)
+
+    def test_cache_by_language_and_code(self):
+        cache = HighlightCache(max_entries=2)
+        first = cache.highlight("if x: pass", "python")
+        self.assertIs(cache.highlight("if x: pass", "python"), first)
+        cache.highlight("if x: pass", "text")
+        cache.highlight("y = 1", "python")
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        # the least recently used entry was evicted
+        cache.highlight("if x: pass", "python")
+        self.assertEqual(cache.misses, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
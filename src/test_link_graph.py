@@ -0,0 +1,130 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for the link graph and resource hints."""
+
+
+import contextlib
+import io
+import json
+import pathlib
+import tempfile
+import unittest
+
+from config import BuildOptions
+from generate_webpages import generate_pages_recursive
+from link_graph import LinkGraph, PageLinks, internal_url, outgoing_links
+from markdown_to_html import parse_markdown
+
+
+class TestLinks(unittest.TestCase):
+    def test_internal_urls(self):
+        self.assertEqual(internal_url("/majesty/", "crown.html"), "/majesty/crown.html")
+        self.assertEqual(internal_url("/majesty/", "../index.html#top"), "/")
+        self.assertEqual(internal_url("/a.html", "/b/?q=1"), "/b/")
+        self.assertIsNone(internal_url("/", "https://example.com/"))
+        self.assertIsNone(internal_url("/", "mailto:me@example.com"))
+
+    def test_outgoing_links(self):
+        blocks = parse_markdown(
+            "# Majesty\n\n[Home](/) and [crown](crown.html), ![logo](/images/logo.png)\n\n"
+            "- [again](crown.html) [self](/majesty/) [out](https://boot.dev)\n\n"
+            "```\n[in code](/code.html)\n```"
+        )
+        links = outgoing_links(blocks, "majesty/index.md")
+        self.assertListEqual(links.pages, ["/", "/majesty/crown.html"])
+        self.assertListEqual(links.images, ["/images/logo.png"])
+
+    def test_backlinks_follow_updates(self):
+        graph = LinkGraph()
+        graph.update("a.md", (1,), PageLinks(["/b.html", "/c.html"], []), "A")
+        graph.update("b.md", (1,), PageLinks(["/c.html"], []), "B")
+        self.assertEqual(graph.backlinks["/c.html"], {"a.md", "b.md"})
+        graph.update("a.md", (2,), PageLinks(["/b.html"], []), "A")
+        self.assertEqual(graph.in_degree("/c.html"), 1)
+        graph.retain({"a.md"})
+        self.assertNotIn("/c.html", graph.backlinks)
+
+    def test_backlinks_html_and_staleness(self):
+        graph = LinkGraph()
+        graph.update("b.md", (1,), PageLinks(["/c.html"], []), "Bee")
+        self.assertEqual(
+            graph.backlinks_html("c.md"),
+            "<ul class='backlinks'><li><a href='/b.html'>Bee</a></li></ul>",
+        )
+        self.assertEqual(graph.backlinks_html("b.md"), "")
+        self.assertListEqual(graph.stale_backlinks(["b.md", "c.md"]), [])
+        graph.update("a.md", (1,), PageLinks(["/c.html"], []), "Ay")
+        self.assertListEqual(graph.stale_backlinks(["a.md", "b.md", "c.md"]), ["a.md", "c.md"])
+
+    def test_hints_rank_and_cap(self):
+        graph = LinkGraph()
+        graph.update("x.md", (1,), PageLinks(["/popular.html"], []), "X")
+        links = PageLinks(["/rare.html", "/popular.html", "/other.html"], ["/1.png", "/2.png"])
+        self.assertEqual(
+            graph.hints(links, 2),
+            '<link rel="prefetch" href="/popular.html"><link rel="prefetch" href="/rare.html">'
+            '<link rel="preload" href="/1.png" as="image"><link rel="preload" href="/2.png" as="image">',
+        )
+
+
+class TestLinkGraphBuild(unittest.TestCase):
+    def test_incremental_graph(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = pathlib.Path(tmp)
+            (root / "content").mkdir()
+            (root / "content" / "index.md").write_text("# Home\n\n[About](/about.html)")
+            (root / "content" / "about.md").write_text("# About\n\n![me](/me.png)")
+            (root / "template.html").write_text("<head></head>{{ Content }}")
+            options = BuildOptions(resource_hints=3, cache_dir=str(root / "cache"))
+
+            def build():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_pages_recursive(
+                        root / "content", root / "template.html", root / "public", options
+                    )
+                return json.loads((root / "cache" / "link-graph.json").read_text())["pages"]
+
+            graph = build()
+            self.assertEqual(graph["index.md"][1:], [["/about.html"], [], "Home"])
+            self.assertIn(
+                '<head><link rel="prefetch" href="/about.html"></head>',
+                (root / "public" / "index.html").read_text(),
+            )
+            about = (root / "public" / "about.html").read_text()
+            self.assertIn('<link rel="preload" href="/me.png" as="image">', about)
+
+            (root / "content" / "about.md").unlink()
+            self.assertNotIn("about.md", build())
+
+    def test_only_pages_with_changed_backlinks_rerendered(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = pathlib.Path(tmp)
+            (root / "content").mkdir()
+            # "a.md" is walked before the page linking to it
+            (root / "content" / "a.md").write_text("# A")
+            (root / "content" / "b.md").write_text("# B\n\n[to a](/a.html)")
+            (root / "content" / "c.md").write_text("# C")
+            (root / "template.html").write_text("{{ Content }}{{ Backlinks }}")
+            options = BuildOptions(cache_dir=str(root / "cache"))
+
+            def build():
+                log = io.StringIO()
+                with contextlib.redirect_stdout(log):
+                    generate_pages_recursive(
+                        root / "content", root / "template.html", root / "public", options
+                    )
+                return [line for line in log.getvalue().splitlines() if "backlinks" in line]
+
+            self.assertEqual(build(), ["Updating the backlinks of a.html"])
+            self.assertIn("<a href='/b.html'>B</a>", (root / "public" / "a.html").read_text())
+            self.assertEqual(build(), [])
+
+            # "c.md" renders after "b.md" is parsed, so has its backlink already
+            (root / "content" / "b.md").write_text("# B\n\n[to c](c.html)")
+            self.assertEqual(build(), ["Updating the backlinks of a.html"])
+            self.assertNotIn("backlinks", (root / "public" / "a.html").read_text())
+            self.assertIn("<a href='/b.html'>B</a>", (root / "public" / "c.html").read_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for building the website from the command line."""
+
+
+import contextlib
+import io
+import os
+import pathlib
+import tempfile
+import unittest
+import zipfile
+
+from main import main
+
+
+class TestPartialBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp.name)
+        for name, text in {
+            "content/index.md": "# Home",
+            "content/majesty/index.md": "# Majesty",
+            "content/contact/index.md": "# Contact",
+            "static/index.css": "body {}",
+            "static/images/logo.png": "png",
+            "template.html": "<title>{{ Title }}</title>{{ Content }}",
+        }.items():
+            (self.root / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.root / name).write_text(text)
+        (self.root / "public").mkdir()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, *argv):
+        with contextlib.redirect_stdout(io.StringIO()):
+            main(
+                [
+                    f"--content={self.root / 'content'}",
+                    f"--static={self.root / 'static'}",
+                    f"--template={self.root / 'template.html'}",
+                    f"--public={self.root / 'public'}",
+                    f"--changes={self.root / 'changes.json'}",
+                    *argv,
+                ]
+            )
+
+    def test_only_selected_outputs_change(self):
+        self.build()
+        public = self.root / "public"
+        (public / "stale.html").write_text("kept")
+        for page in ("index.md", "majesty/index.md", "contact/index.md"):
+            (self.root / "content" / page).write_text("# Edited")
+        (self.root / "static" / "index.css").write_text("body { margin: 0 }")
+
+        self.build("--only", str(self.root / "content" / "majesty"))
+
+        self.assertIn("Edited", (public / "majesty" / "index.html").read_text())
+        self.assertNotIn("Edited", (public / "index.html").read_text())
+        self.assertNotIn("Edited", (public / "contact" / "index.html").read_text())
+        self.assertEqual((public / "index.css").read_text(), "body {}")
+        self.assertTrue((public / "stale.html").exists())
+
+    def test_static_selection(self):
+        self.build()
+        (self.root / "static" / "images" / "logo.png").write_text("new png")
+        (self.root / "static" / "index.css").write_text("body { margin: 0 }")
+        self.build("--only", str(self.root / "static" / "images"))
+        self.assertEqual((self.root / "public" / "images" / "logo.png").read_text(), "new png")
+        self.assertEqual((self.root / "public" / "index.css").read_text(), "body {}")
+
+    def test_template_still_validated(self):
+        (self.root / "template.html").write_text("<title>{{ Title }}</title>")
+        with self.assertRaises(SystemExit) as raised:
+            self.build("--only", str(self.root / "static" / "index.css"))
+        self.assertIn("{{ Content }}", str(raised.exception.code))
+
+    def test_unsafe_static_archive(self):
+        with zipfile.ZipFile(self.root / "static.zip", "w") as archive:
+            archive.writestr("../index.css", "body {}")
+        with self.assertRaises(SystemExit) as raised:
+            self.build(f"--static={self.root / 'static.zip'}")
+        self.assertIn("unsafe member name: ../index.css", str(raised.exception.code))
+        self.assertFalse((self.root / "index.css").exists())
+
+    def test_selection_outside_sources(self):
+        with self.assertRaises(SystemExit):
+            self.build("--only", os.path.abspath(self.root / "elsewhere"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for on-disk sorted manifests and bounded-memory builds."""
+
+
+import contextlib
+import functools
+import os
+import pathlib
+import tarfile
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+import output
+from config import BuildOptions
+from generate_webpages import generate_pages_recursive
+from manifest import SortedManifest
+from output import open_writer
+
+
+# set SSG_HWM_PAGES=1000000 to run the high-water-mark test at full scale
+HWM_PAGES: int = int(os.environ.get("SSG_HWM_PAGES", "2000"))
+HWM_CEILING: int = 8 * 1024 * 1024
+
+
+class TestSortedManifest(unittest.TestCase):
+    def test_sorted_across_runs(self):
+        with SortedManifest(run_size=3) as manifest:
+            for key in ["e", "b", "d", "a", "c", "f", "b"]:
+                manifest.add(key, key.upper())
+            self.assertListEqual(
+                [k for k, _ in manifest], ["a", "b", "b", "c", "d", "e", "f"]
+            )
+
+    def test_latest_record_wins(self):
+        with SortedManifest(run_size=2) as manifest:
+            manifest.add("index.html", "first")
+            manifest.add("about.html", "about")
+            manifest.add("index.html", "second")
+            self.assertListEqual(
+                list(manifest.latest()),
+                [("about.html", "about"), ("index.html", "second")],
+            )
+
+
+class TestBoundedMemoryBuild(unittest.TestCase):
+    def build(self, pages):
+        """Builds `pages` pages into an archive, returning the peak traced memory."""
+        with tempfile.TemporaryDirectory() as tmp:
+            content = pathlib.Path(tmp, "content")
+            for i in range(pages):
+                page = content / f"section{i // 1000:04d}" / f"page{i:07d}.md"
+                if i % 1000 == 0:
+                    page.parent.mkdir(parents=True)
+                page.write_text(f"# Page {i}\n\nSome *text* for page {i}.")
+            template = pathlib.Path(tmp, "template.html")
+            template.write_text("<title>{{ Title }}</title>{{ Content }}")
+
+            options = BuildOptions(bounded_memory=True)
+            archive = f"{tmp}/site.tar.gz"
+            # small runs, so that both sizes spill and merge runs
+            manifest = functools.partial(SortedManifest, run_size=100, merge_width=4)
+            tracemalloc.start()
+            try:
+                with (
+                    mock.patch.object(output, "SortedManifest", manifest),
+                    open(os.devnull, "w") as devnull,
+                    contextlib.redirect_stdout(devnull),
+                ):
+                    with open_writer(f"{tmp}/public", archive, None, True) as writer:
+                        generate_pages_recursive(
+                            content, template, f"{tmp}/public", options, writer
+                        )
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+            with tarfile.open(archive) as built:
+                names = built.getnames()
+            self.assertEqual(len(names), pages + -(-pages // 1000))
+            self.assertListEqual(names, sorted(names))
+        return peak
+
+    def test_high_water_mark(self):
+        small = self.build(HWM_PAGES // 4)
+        large = self.build(HWM_PAGES)
+        # memory held per page would show as the peak growing with the site
+        self.assertLess(large, small * 1.25)
+        self.assertLess(large, HWM_CEILING)
+
+    def test_merged_runs_stay_sorted(self):
+        with SortedManifest(run_size=2, merge_width=2) as manifest:
+            for value, key in enumerate("ebdacfb"):
+                manifest.add(key, str(value))
+            self.assertListEqual(
+                list(manifest),
+                [("a", "3"), ("b", "1"), ("b", "6"), ("c", "4"), ("d", "2"), ("e", "0"), ("f", "5")],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
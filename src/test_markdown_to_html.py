@@ -1,10 +1,31 @@
 #!/usr/bin/python3.12
 
 """Unit tests for converting markdown text to html."""
-from markdown_to_html import markdown_to_html_node, markdown_to_blocks
+from generate_webpages import render_page
+from markdown_to_html import (
+    ParsedBlock,
+    TableOfContents,
+    block_to_html_node,
+    markdown_to_html_node,
+    markdown_to_blocks,
+    parse_markdown,
+    register_block,
+    syntax_names,
+    text_to_html_nodes,
+    unregister_block,
+)
 
 import unittest
+from ast_cache import decode_blocks, encode_blocks
+from htmlnode import ParentNode
+from inline_markdown import (
+    register_inline,
+    split_nodes_delimiter,
+    text_to_textnodes,
+    unregister_inline,
+)
 from markdown_blocks import markdown_to_blocks, block_to_block_type, BlockType
+from textnode import TextType
 
 
 class TestMarkdownToHTML(unittest.TestCase):
@@ -72,7 +93,7 @@ this is paragraph text
         html = node.to_html()
         self.assertEqual(
             html,
-            "<div><h1>this is an h1</h1><p>this is paragraph text</p><h2>this is an h2</h2></div>",
+            "<div><h1 id='this-is-an-h1'>this is an h1</h1><p>this is paragraph text</p><h2 id='this-is-an-h2'>this is an h2</h2></div>",
         )
 
     def test_blockquote(self):
@@ -91,6 +112,106 @@ this is paragraph text
             "<div><blockquote>This is a blockquote block</blockquote><p>this is paragraph text</p></div>",
         )
 
+    def test_heading_ids_are_deduplicated(self):
+        md = """
+# **Setup** & install!
+
+## Usage
+
+## Usage
+
+## Usage-1
+"""
+
+        toc = TableOfContents()
+        html = markdown_to_html_node(md, toc).to_html()
+        self.assertIn("<h1 id='setup-install'><b>Setup</b> & install!</h1>", html)
+        self.assertListEqual(
+            [slug for _, _, slug in toc.entries],
+            ["setup-install", "usage", "usage-1", "usage-1-1"],
+        )
+
+    def test_table_of_contents(self):
+        md = """
+# Title
+
+## First
+
+### Nested
+
+## Second
+"""
+
+        toc = TableOfContents()
+        markdown_to_html_node(md, toc)
+        self.assertEqual(
+            toc.to_html_node().to_html(),
+            "<nav class='toc'><ul><li><a href='#title'>Title</a>"
+            "<ul><li><a href='#first'>First</a>"
+            "<ul><li><a href='#nested'>Nested</a></li></ul></li>"
+            "<li><a href='#second'>Second</a></li></ul></li></ul></nav>",
+        )
+        self.assertIsNone(TableOfContents().to_html_node())
+
+    def test_toc_template_slot(self):
+        html = render_page("# Title\n\n## Part", "{{ Toc }}|{{ Content }}")
+        toc, content = html.split("|")
+        self.assertIn("<a href='#part'>Part</a>", toc)
+        self.assertIn("<h2 id='part'>Part</h2>", content)
+
+
+class TestSyntaxRegistry(unittest.TestCase):
+    def register_admonition(self, matched):
+        def match(block):
+            matched.append(block)
+            return block.startswith("!!! ")
+
+        def parse(block):
+            kind, _, text = block.removeprefix("!!! ").partition("\n")
+            return ParsedBlock("admonition", [text_to_textnodes(text)], info=kind)
+
+        def render(block, toc):
+            children = text_to_html_nodes(block.parts[0])
+            return ParentNode("aside", children, {"class": block.info})
+
+        register_block("admonition", "!", match, parse, render)
+        self.addCleanup(unregister_block, "admonition")
+
+    def test_block_extension(self):
+        matched = []
+        self.register_admonition(matched)
+        html = markdown_to_html_node("!!! note\nMind the **gap**\n\nPlain text\n\n# Title")
+        self.assertEqual(
+            html.to_html(),
+            "<div><aside class='note'>Mind the <b>gap</b></aside><p>Plain text</p>"
+            "<h1 id='title'>Title</h1></div>",
+        )
+        # only blocks starting with a trigger reach the matcher
+        self.assertListEqual(matched, ["!!! note\nMind the **gap**"])
+
+    def test_extension_blocks_cached(self):
+        self.register_admonition([])
+        blocks = parse_markdown("!!! tip\nHello\n\n## Part")
+        self.assertListEqual(decode_blocks(encode_blocks(blocks)), blocks)
+        self.assertIn("admonition", syntax_names())
+
+    def test_inline_extension(self):
+        def strike(nodes):
+            split = split_nodes_delimiter(nodes, "~~", TextType.HTML)
+            for node in split:
+                if node.text_type == TextType.HTML.value:
+                    node.text = f"<del>{node.text}</del>"
+            return split
+
+        register_inline("strikethrough", "~~", strike)
+        self.addCleanup(unregister_inline, "strikethrough")
+        html = markdown_to_html_node("Was ~~free~~ **cheap**").to_html()
+        self.assertEqual(html, "<div><p>Was <del>free</del> <b>cheap</b></p></div>")
+
+    def test_unregistered_type(self):
+        with self.assertRaisesRegex(ValueError, "Invalid block type"):
+            block_to_html_node(ParsedBlock("admonition", []))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for profiling the memory use of pages."""
+
+
+import contextlib
+import io
+import pathlib
+import tempfile
+import tracemalloc
+import unittest
+
+from config import BuildOptions
+from generate_webpages import MemoryBudgetExceeded, generate_pages_recursive
+from main import parse_args
+from memory_profile import MemoryProfiler, PageMemory, memory_profiling
+
+
+class TestPageMemory(unittest.TestCase):
+    def test_stages(self):
+        with contextlib.redirect_stdout(io.StringIO()), memory_profiling(1, 0) as profiler:
+            page = PageMemory("big.md")
+            with page.stage("parse"):
+                kept = [str(n) for n in range(20000)]
+            with page.stage("render"):
+                dropped = "x" * 1_000_000
+                del dropped
+            profiler.finish(page)
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertGreater(page.net["parse"], 20000 * 40)
+        self.assertLess(abs(page.net["render"]), 10_000)
+        self.assertEqual(page.peak_stage, "render")
+        self.assertGreater(page.peak, page.net["parse"] + 1_000_000)
+        self.assertIn("test_memory_profile.py", page.sites["parse"])
+        self.assertEqual(len(kept), 20000)
+
+    def test_top_pages(self):
+        profiler = MemoryProfiler(2)
+        for source, peak in (("a.md", 5), ("b.md", 30), ("c.md", 10)):
+            page = PageMemory(source)
+            page.peak = peak
+            profiler.finish(page)
+        self.assertListEqual([page.source for page in profiler.largest()], ["b.md", "c.md"])
+        self.assertTrue(profiler.report().startswith("Peak memory of the 2 largest of 3 pages"))
+
+    def test_disabled(self):
+        with memory_profiling(0, 0) as profiler:
+            self.assertIsNone(profiler)
+            self.assertFalse(tracemalloc.is_tracing())
+
+    def test_flags(self):
+        self.assertEqual(parse_args(["--memprofile"]).memprofile, 10)
+        self.assertEqual(parse_args(["--memprofile", "3"]).memprofile, 3)
+        self.assertEqual(parse_args([]).memprofile, 0)
+
+
+class TestProfiledBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp.name)
+        (self.root / "content").mkdir()
+        (self.root / "content" / "small.md").write_text("# Small")
+        (self.root / "content" / "large.md").write_text("# Large\n\n" + "Text. " * 50000)
+        (self.root / "template.html").write_text("{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, **options):
+        options = BuildOptions(cache_dir=str(self.root / "cache"), **options)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            generate_pages_recursive(
+                self.root / "content", self.root / "template.html", self.root / "public", options
+            )
+        return out.getvalue()
+
+    def test_report(self):
+        report = self.build(memprofile=1).split("Peak memory of the ")[1]
+        self.assertTrue(report.startswith("1 largest of 2 pages"))
+        self.assertIn("large.md: peak", report)
+        self.assertNotIn("small.md", report)
+        self.assertIn("net read +", report)
+
+    def test_budget(self):
+        with self.assertRaises(MemoryBudgetExceeded) as raised:
+            self.build(memory_budget=100_000)
+        self.assertTrue(raised.exception.source.endswith("large.md"))
+        self.assertGreater(raised.exception.peak, 100_000)
+        self.build(memory_budget=100_000_000)
+
+
+if __name__ == "__main__":
+    unittest.main()
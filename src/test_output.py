@@ -0,0 +1,191 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for the directory and archive output writers."""
+
+
+import hashlib
+import io
+import json
+import os
+import pathlib
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+import output
+from output import ArchiveWriter, DirectoryWriter, archive_format_of, open_writer
+from sources import ZipSource
+
+
+class TestDirectoryWriter(unittest.TestCase):
+    def test_writes_tree(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = pathlib.Path(tmp, "source.css")
+            source.write_text("body {}")
+            with open_writer(f"{tmp}/public") as writer:
+                self.assertIsInstance(writer, DirectoryWriter)
+                writer.write_bytes(f"{tmp}/public/majesty/index.html", b"<p></p>")
+                writer.make_dir("images")
+                writer.copy_file(source, "index.css")
+
+            public = pathlib.Path(tmp, "public")
+            self.assertEqual((public / "majesty" / "index.html").read_bytes(), b"<p></p>")
+            self.assertTrue((public / "images").is_dir())
+            self.assertEqual((public / "index.css").read_text(), "body {}")
+
+
+    def test_skips_unchanged_and_lists_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            public = pathlib.Path(tmp, "public")
+            with open_writer(public) as writer:
+                writer.write_bytes("index.html", b"<p>home</p>")
+                writer.write_bytes("majesty/index.html", b"<p>majesty</p>")
+                writer.write_bytes("stale.html", b"<p>stale</p>")
+            os.utime(public / "index.html", ns=(0, 0))
+
+            with open_writer(public) as writer:
+                writer.write_bytes("index.html", b"<p>home</p>")
+                writer.write_bytes("majesty/index.html", b"<p>edited</p>")
+                writer.write_bytes("new.html", b"<p>new</p>")
+                writer.prune()
+                writer.write_changes(pathlib.Path(tmp, "changes.json"))
+
+            self.assertEqual((public / "index.html").stat().st_mtime_ns, 0)
+            self.assertEqual((public / "majesty" / "index.html").read_bytes(), b"<p>edited</p>")
+            self.assertFalse((public / "stale.html").exists())
+            self.assertEqual(
+                json.loads(pathlib.Path(tmp, "changes.json").read_text()),
+                {
+                    "added": ["new.html"],
+                    "changed": ["majesty/index.html"],
+                    "removed": ["stale.html"],
+                },
+            )
+            # files are written aside and renamed, leaving nothing behind
+            self.assertListEqual(
+                sorted(p.name for p in public.iterdir()), ["index.html", "majesty", "new.html"]
+            )
+            self.assertEqual((public / "new.html").stat().st_mode & 0o777, output._FILE_MODE)
+
+    def test_copy_skips_identical_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = pathlib.Path(tmp, "index.css")
+            source.write_text("body {}")
+            with open_writer(f"{tmp}/public") as writer:
+                writer.copy_file(source, "index.css")
+            os.utime(pathlib.Path(tmp, "public", "index.css"), ns=(0, 0))
+            with open_writer(f"{tmp}/public") as writer:
+                writer.copy_file(source, "index.css")
+                self.assertEqual(writer.changes()["changed"], [])
+            self.assertEqual(pathlib.Path(tmp, "public", "index.css").stat().st_mtime_ns, 0)
+
+    def test_stream_skips_unchanged_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            page = pathlib.Path(tmp, "public", "table.html")
+            with open_writer(f"{tmp}/public") as writer:
+                writer.write_stream("table.html", iter([b"<table>", b"</table>"]))
+            os.utime(page, ns=(0, 0))
+            with open_writer(f"{tmp}/public") as writer:
+                writer.write_stream("table.html", iter([b"<table></table>"]))
+                self.assertEqual(writer.changes()["changed"], [])
+                digest = hashlib.sha256(b"<table></table>").hexdigest()
+                self.assertEqual(writer.digests["table.html"], digest)
+                writer.write_stream("table.html", iter([b"<table>", b"<tr></tr></table>"]))
+                self.assertEqual(writer.changes()["changed"], ["table.html"])
+            self.assertEqual(page.read_bytes(), b"<table><tr></tr></table>")
+            self.assertEqual(os.listdir(page.parent), ["table.html"])
+
+
+class TestArchiveWriter(unittest.TestCase):
+    def build(self, archive_format, order):
+        stream = io.BytesIO()
+        with ArchiveWriter("/site/public", stream, archive_format) as writer:
+            for name in order:
+                writer.write_bytes(f"/site/public/{name}", name.encode())
+        return stream.getvalue()
+
+    def test_zip_sorted_and_reproducible(self):
+        names = ["majesty/index.html", "index.html", "index.css"]
+        first = self.build("zip", names)
+        self.assertEqual(first, self.build("zip", reversed(names)))
+
+        with zipfile.ZipFile(io.BytesIO(first)) as archive:
+            self.assertListEqual(
+                archive.namelist(),
+                ["index.css", "index.html", "majesty/", "majesty/index.html"],
+            )
+            self.assertEqual(archive.read("majesty/index.html"), b"majesty/index.html")
+            self.assertEqual(archive.getinfo("index.html").date_time, (1980, 1, 1, 0, 0, 0))
+
+    def test_tar_gz_sorted_and_reproducible(self):
+        names = ["majesty/index.html", "index.html"]
+        first = self.build("tar.gz", names)
+        self.assertEqual(first, self.build("tar.gz", reversed(names)))
+
+        with tarfile.open(fileobj=io.BytesIO(first), mode="r:gz") as archive:
+            self.assertListEqual(
+                archive.getnames(), ["index.html", "majesty", "majesty/index.html"]
+            )
+            self.assertEqual({m.mtime for m in archive.getmembers()}, {315532800})
+
+    def test_zip_members_keep_their_method(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            css = b"body { margin: 0; }" * 50
+            with zipfile.ZipFile(f"{tmp}/static.zip", "w", zipfile.ZIP_STORED) as archive:
+                archive.writestr("index.css", css)
+            static = ZipSource(f"{tmp}/static.zip")
+
+            stream = io.BytesIO()
+            with ArchiveWriter("/site/public", stream, "zip") as writer:
+                writer.copy_from(static, "index.css", "/site/public/index.css")
+
+            with zipfile.ZipFile(io.BytesIO(stream.getvalue())) as archive:
+                self.assertIsNone(archive.testzip())
+                self.assertEqual(archive.read("index.css"), css)
+                copied = archive.getinfo("index.css")
+            # recompressed, but with the member's own method rather than the archive's
+            self.assertEqual(copied.compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(copied.compress_size, len(css))
+            self.assertEqual(copied.date_time, (1980, 1, 1, 0, 0, 0))
+
+    def test_bounded_memory_stream_spilled(self):
+        stream = io.BytesIO()
+        with ArchiveWriter("/site/public", stream, "tar", bounded_memory=True) as writer:
+            writer.write_stream("a/table.html", iter([b"<table>", b"</table>"]))
+            writer.write_bytes("index.html", b"home")
+        with tarfile.open(fileobj=io.BytesIO(stream.getvalue())) as archive:
+            self.assertListEqual(archive.getnames(), ["a", "a/table.html", "index.html"])
+            self.assertEqual(archive.extractfile("a/table.html").read(), b"<table></table>")
+
+    def test_failed_build_leaves_no_archive(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = f"{tmp}/site.zip"
+            with self.assertRaises(SystemExit):
+                with open_writer(f"{tmp}/public", archive) as writer:
+                    writer.write_bytes("index.html", b"home")
+                    raise SystemExit("Build failed")
+            self.assertFalse(os.path.exists(archive))
+
+        stream = io.BytesIO()
+        with self.assertRaises(ValueError):
+            with ArchiveWriter("/site/public", stream, "tar", bounded_memory=True) as writer:
+                writer.write_bytes("index.html", b"home")
+                raise ValueError
+        self.assertEqual(stream.getvalue(), b"")
+
+    def test_paths_outside_root_rejected(self):
+        writer = ArchiveWriter("/site/public", io.BytesIO(), "tar")
+        with self.assertRaises(ValueError):
+            writer.write_bytes("/elsewhere/index.html", b"")
+
+    def test_archive_format_of(self):
+        self.assertEqual(archive_format_of("site.zip"), "zip")
+        self.assertEqual(archive_format_of("site.tar"), "tar")
+        self.assertEqual(archive_format_of("site.tar.gz"), "tar.gz")
+        self.assertEqual(archive_format_of("site.tgz"), "tar.gz")
+        self.assertIsNone(archive_format_of("-"))
+
+
+if __name__ == "__main__":
+    unittest.main()
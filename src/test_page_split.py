@@ -0,0 +1,122 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for splitting oversized pages into parts."""
+
+
+import contextlib
+import io
+import pathlib
+import tempfile
+import unittest
+
+from config import BuildOptions
+from generate_webpages import PageError, generate_pages_recursive, render_parts
+from markdown_to_html import parse_markdown
+from page_split import part_name, plan_parts, split_budget
+
+
+MARKDOWN = """\
+# Reference
+
+Intro.
+
+## Alpha
+
+Alpha text.
+
+## Beta
+
+Beta text.
+
+Beta more.
+
+## Alpha
+
+Alpha again.
+"""
+
+
+class TestPlanParts(unittest.TestCase):
+    def test_split_at_headings(self):
+        blocks = parse_markdown(MARKDOWN)
+        self.assertListEqual(plan_parts(blocks, [0] * 9, 0, 3), [(0, 4), (4, 7), (7, 9)])
+        self.assertListEqual(plan_parts(blocks, [0] * 9, 0, 0), [(0, 9)])
+
+    def test_parts_only_end_at_headings(self):
+        blocks = parse_markdown("# A\n\none\n\ntwo\n\nthree")
+        self.assertListEqual(plan_parts(blocks, [10] * 4, 15, 0), [(0, 4)])
+        blocks = parse_markdown("# A\n\none\n\n## B\n\ntwo")
+        self.assertListEqual(plan_parts(blocks, [10] * 4, 15, 0), [(0, 2), (2, 4)])
+
+    def test_front_matter_budget(self):
+        self.assertEqual(split_budget(100, 0, {"split_page_blocks": "5"}), (100, 5))
+        with self.assertRaises(ValueError):
+            split_budget(0, 0, {"split_page_bytes": "lots"})
+
+    def test_part_name(self):
+        self.assertEqual(part_name("ref/index.html", 1), "ref/index.html")
+        self.assertEqual(part_name("ref/index.html", 2), "ref/index-part-2.html")
+
+
+class TestRenderParts(unittest.TestCase):
+    def test_shared_toc_and_pager(self):
+        options = BuildOptions(split_page_blocks=3)
+        template = "<title>{{ Title }}</title>{{ Toc }}{{ Content }}"
+        parts = list(render_parts(MARKDOWN, template, options, dest="ref.html"))
+        self.assertListEqual(
+            [output for output, _ in parts], ["ref.html", "ref-part-2.html", "ref-part-3.html"]
+        )
+
+        second = parts[1][1]
+        self.assertTrue(second.startswith("<title>Reference (part 2 of 3)</title>"))
+        self.assertIn(
+            "<ul><li><a href='ref.html#alpha'>Alpha</a></li><li><a href='#beta'>Beta</a></li>"
+            "<li><a href='ref-part-3.html#alpha-1'>Alpha</a></li></ul>",
+            second,
+        )
+        self.assertIn("<h2 id='beta'>Beta</h2>", second)
+        self.assertIn(
+            "<nav class='page-parts'><a href='ref.html'>Previous</a> | Part 2 of 3 | "
+            "<a href='ref-part-3.html'>Next</a></nav>",
+            second,
+        )
+        # ids stay unique across the whole page
+        self.assertIn("<h2 id='alpha-1'>Alpha</h2>", parts[2][1])
+
+    def test_unsplit_without_dest(self):
+        options = BuildOptions(split_page_blocks=3)
+        self.assertEqual(len(list(render_parts(MARKDOWN, "{{ Content }}", options))), 1)
+
+    def test_toc_leads_parts_without_slot(self):
+        options = BuildOptions(split_page_blocks=3)
+        _, first = next(render_parts(MARKDOWN, "{{ Content }}", options, dest="ref.html"))
+        self.assertTrue(first.startswith("<nav class='toc'>"))
+
+
+class TestSplitBuild(unittest.TestCase):
+    def test_parts_written_and_kept(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = pathlib.Path(tmp)
+            (root / "content").mkdir()
+            (root / "content" / "ref.md").write_text("---\nsplit_page_bytes: 20\n---\n" + MARKDOWN)
+            (root / "content" / "bad.md").write_text("# Bad")
+            (root / "template.html").write_text("{{ Content }}")
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(
+                    root / "content", root / "template.html", root / "public", BuildOptions()
+                )
+            self.assertListEqual(
+                sorted(p.name for p in (root / "public").iterdir()),
+                ["bad.html", "ref-part-2.html", "ref-part-3.html", "ref-part-4.html", "ref.html"],
+            )
+
+            (root / "content" / "bad.md").write_text("---\nsplit_page_blocks: x\n---\n# Bad")
+            with self.assertRaises(PageError), contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(
+                    root / "content", root / "template.html", root / "public", BuildOptions()
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/python3.12
+
+"""Benchmark corpus of pathological markdown, parsed in linear time.
+
+Run this file directly to print parse timings for the whole corpus.
+"""
+
+
+import time
+from typing import Callable
+import unittest
+from unittest import mock
+
+from config import BuildOptions
+import highlight
+from generate_webpages import ParseBudgetExceeded, extract_title, render_page
+from markdown_to_html import markdown_to_html_node
+
+
+# each entry builds an input of roughly `n` characters
+PATHOLOGICAL: dict[str, Callable[[int], str]] = {
+    "unclosed image brackets": lambda n: "# t\n\n" + "![" * (n // 2),
+    "unclosed link brackets": lambda n: "# t\n\n" + "[" * n + "](",
+    "brackets without urls": lambda n: "# t\n\n" + "[a]" * (n // 3),
+    "urls without closing parens": lambda n: "# t\n\n" + "[a](" * (n // 4),
+    "nested image in link soup": lambda n: "# t\n\n![a](" + "[b](![" * (n // 6),
+    "thousands of backticks": lambda n: "# t\n\n```" + "`" * n + "```",
+    "huge single-line block": lambda n: "# t\n\n" + "word " * (n // 5),
+    "huge single-line code fence": lambda n: "# t\n\n```" + "x" * n + "```",
+    "title after many empty headings": lambda n: "# \n" * (n // 3) + "# t",
+    "unclosed block comments in a fence": lambda n: "# t\n\n```js\n" + "/*x" * (n // 3) + "\n```",
+    "escaped quotes in an unclosed docstring": (
+        lambda n: "# t\n\n```python\n'''" + "\\'" * (n // 2) + "\n```"
+    ),
+}
+
+
+def parse(markdown: str) -> None:
+    try:
+        extract_title(markdown)
+        # highlighted without the cache, which would hide repeated timings
+        with mock.patch.object(highlight, "_cache", highlight.HighlightCache()):
+            markdown_to_html_node(markdown)
+    except ValueError:
+        # unbalanced delimiters are rejected, which is fine as long as it's fast
+        pass
+
+
+def parse_seconds(markdown: str, repeat: int = 3) -> float:
+    timings: list[float] = []
+    for _ in range(repeat):
+        started: float = time.perf_counter()
+        parse(markdown)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+class TestPathologicalMarkdown(unittest.TestCase):
+    def test_parse_time_is_linear(self):
+        n = 20_000
+        for name, build in PATHOLOGICAL.items():
+            with self.subTest(name):
+                small = parse_seconds(build(n))
+                large = parse_seconds(build(8 * n))
+                # quadratic scanning would be 64 times slower, not ~8
+                self.assertLess(large, 24 * small + 0.005)
+                self.assertLess(large, 1.0)
+
+    def test_parse_budget_fails_the_build(self):
+        options = BuildOptions(parse_budget=1e-9)
+        with self.assertRaises(ParseBudgetExceeded) as raised:
+            render_page("# t\n\ntext", "{{ Content }}", options, source="content/t.md")
+        self.assertIn("content/t.md", str(raised.exception))
+        self.assertIn("per-page parse budget", str(raised.exception))
+
+    def test_no_budget_by_default(self):
+        self.assertEqual(
+            render_page("# t\n\ntext", "{{ Content }}"), "<div><h1 id='t'>t</h1><p>text</p></div>"
+        )
+
+
+if __name__ == "__main__":
+    for name, build in PATHOLOGICAL.items():
+        markdown = build(1_000_000)
+        print(f"{name:>32}: {parse_seconds(markdown, repeat=1):8.4f}s")
@@ -0,0 +1,190 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for the on-demand render server and its load test."""
+
+
+import gzip
+import http.client
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+
+from config import BuildOptions
+from load_test import load_test
+from render_server import (
+    PageCache,
+    RangeNotSatisfiable,
+    RenderedPage,
+    RenderServer,
+    _parse_range,
+)
+
+
+class TestPageCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = PageCache(max_bytes=30)
+        for name in "abc":
+            cache.put(name, RenderedPage((), '""', b"x" * 10, None))
+        cache.get("a")
+        cache.put("d", RenderedPage((), '""', b"x" * 10, None))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual((len(cache), cache.size), (3, 30))
+
+    def test_skips_pages_larger_than_cache(self):
+        cache = PageCache(max_bytes=10)
+        cache.put("a", RenderedPage((), '""', b"x" * 11, None))
+        self.assertEqual(len(cache), 0)
+
+
+class TestParseRange(unittest.TestCase):
+    def test_ranges(self):
+        self.assertEqual(_parse_range("bytes=2-5", 10), (2, 5))
+        self.assertEqual(_parse_range("bytes=2-", 10), (2, 9))
+        self.assertEqual(_parse_range("bytes=5-100", 10), (5, 9))
+        self.assertEqual(_parse_range("bytes=-3", 10), (7, 9))
+        self.assertIsNone(_parse_range("bytes=0-1,4-5", 10))
+        for header in ("bytes=10-", "bytes=5-2", "bytes=-0"):
+            with self.assertRaises(RangeNotSatisfiable):
+                _parse_range(header, 10)
+
+
+class TestRenderServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = root = pathlib.Path(self.tmp.name)
+        (root / "content" / "majesty").mkdir(parents=True)
+        (root / "content" / "index.md").write_text("# Home\n\n" + "A long page. " * 100)
+        self.majesty = root / "content" / "majesty" / "index.md"
+        self.majesty.write_text("# Majesty\n\nA page")
+        (root / "static").mkdir()
+        (root / "static" / "index.css").write_text("0123456789")
+        (root / "template.html").write_text("<title>{{ Title }}</title>{{ Content }}")
+        self.server = RenderServer(
+            root / "content", root / "static", root / "template.html"
+        ).start()
+        self.connection = http.client.HTTPConnection(*self.server.server_address[:2])
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def get(self, path, **headers):
+        self.connection.request("GET", path, headers=headers)
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_renders_once_and_revalidates(self):
+        response, body = self.get("/majesty/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<title>Majesty</title><div><h1 id='majesty'>Majesty</h1><p>A page</p></div>")
+        etag = response.getheader("ETag")
+        self.assertTrue(etag.startswith('"'))
+
+        response, body = self.get("/majesty/index.html")
+        self.assertEqual((response.status, self.server.renders), (200, 1))
+
+        response, body = self.get("/majesty/", **{"If-None-Match": etag})
+        self.assertEqual((response.status, body), (304, b""))
+
+        self.majesty.write_text("# Majesty\n\nAn edited page")
+        response, body = self.get("/majesty/", **{"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertNotEqual(response.getheader("ETag"), etag)
+        self.assertEqual(self.server.renders, 2)
+
+    def test_revalidating_uncached_page_does_not_render(self):
+        response, _ = self.get("/majesty/")
+        self.server.pages = PageCache(self.server.pages.max_bytes)
+        response, _ = self.get("/majesty/", **{"If-None-Match": response.getheader("ETag")})
+        self.assertEqual((response.status, self.server.renders), (304, 1))
+
+    def test_gzip_negotiation(self):
+        response, plain = self.get("/")
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        response, body = self.get("/", **{"Accept-Encoding": "br, gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(gzip.decompress(body), plain)
+        response, _ = self.get("/", **{"Accept-Encoding": "gzip;q=0"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        # too small for compression to pay off
+        response, _ = self.get("/majesty/", **{"Accept-Encoding": "gzip"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+
+    def test_etag_per_encoding(self):
+        response, _ = self.get("/")
+        plain = response.getheader("ETag")
+        response, _ = self.get("/", **{"Accept-Encoding": "gzip"})
+        gzipped = response.getheader("ETag")
+        self.assertNotEqual(gzipped, plain)
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+
+        self.server.pages = PageCache(self.server.pages.max_bytes)
+        response, _ = self.get("/", **{"If-None-Match": gzipped, "Accept-Encoding": "gzip"})
+        self.assertEqual((response.status, response.getheader("ETag")), (304, gzipped))
+        # a gzipped copy is not a match for a client which no longer accepts it
+        response, body = self.get("/", **{"If-None-Match": gzipped})
+        self.assertEqual((response.status, response.getheader("ETag")), (200, plain))
+
+    def test_site_nav_and_stylesheet(self):
+        (self.root / "template.html").write_text(
+            "<head><link rel='stylesheet' href='/index.css'></head>{{ Nav }}{{ Content }}"
+        )
+        (self.root / "static" / "index.css").write_text("h1 { color: red }")
+        self.server.options = BuildOptions(
+            critical_css=True,
+            stylesheet=str(self.root / "static" / "index.css"),
+            cache_dir=str(self.root / "cache"),
+        )
+        response, body = self.get("/majesty/")
+        self.assertIn(b"<a href='/majesty/'>Majesty</a>", body)
+        self.assertIn(b"<style>h1{color: red}</style>", body)
+        etag = response.getheader("ETag")
+
+        (self.root / "static" / "index.css").write_text("h1 { color: darkblue }")
+        response, body = self.get("/majesty/", **{"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertIn(b"darkblue", body)
+
+        (self.root / "content" / "contact.md").write_text("# Contact")
+        response, body = self.get("/majesty/", **{"If-None-Match": response.getheader("ETag")})
+        self.assertEqual(response.status, 200)
+        self.assertIn(b"<a href='/contact.html'>Contact</a>", body)
+
+    def test_unexpected_error(self):
+        with mock.patch("render_server.render_page", side_effect=RuntimeError("broken")):
+            response, _ = self.get("/majesty/")
+        self.assertEqual(response.status, 500)
+        self.assertEqual(self.get("/majesty/")[0].status, 200)
+
+    def test_static_ranges(self):
+        response, body = self.get("/index.css", Range="bytes=2-5")
+        self.assertEqual((response.status, body), (206, b"2345"))
+        self.assertEqual(response.getheader("Content-Range"), "bytes 2-5/10")
+        response, body = self.get("/index.css", Range="bytes=-3")
+        self.assertEqual(body, b"789")
+        response, body = self.get("/index.css", Range="bytes=20-")
+        self.assertEqual(response.status, 416)
+        response, body = self.get("/index.css")
+        self.assertEqual((response.status, body), (200, b"0123456789"))
+
+    def test_missing_and_redirected_paths(self):
+        self.assertEqual(self.get("/missing.html")[0].status, 404)
+        self.assertEqual(self.get("/../etc/passwd")[0].status, 404)
+        response, _ = self.get("/majesty")
+        self.assertEqual((response.status, response.getheader("Location")), (301, "/majesty/"))
+
+    def test_load_test(self):
+        results = load_test(self.server, requests=50, concurrency=4, static="index.css")
+        self.assertListEqual(
+            [r.name for r in results], ["cold", "warm", "warm gzip", "revalidate", "static range"]
+        )
+        self.assertEqual(results[1].statuses, {200: 50})
+        self.assertEqual(results[3].statuses, {304: 50})
+        self.assertEqual(results[4].statuses, {206: 50})
+
+
+if __name__ == "__main__":
+    unittest.main()
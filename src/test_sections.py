@@ -0,0 +1,174 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for front matter and the paginated section index pages."""
+
+
+import contextlib
+import io
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from config import BuildOptions
+from front_matter import split_front_matter
+from generate_webpages import generate_pages_recursive, render_page
+from sections import MetadataIndex
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_split(self):
+        fields, body = split_front_matter("---\ndate: 2024-05-01\nTitle: 'Crown'\n---\n# Crowning")
+        self.assertEqual(fields, {"date": "2024-05-01", "title": "Crown"})
+        self.assertEqual(body, "# Crowning")
+
+    def test_without_front_matter(self):
+        for markdown in ("# Title\n\n---\n", "---\ndate: 2024\n", "---x\n---\n"):
+            self.assertEqual(split_front_matter(markdown), ({}, markdown))
+
+    def test_not_rendered(self):
+        html = render_page("---\ndate: 2024-05-01\n---\n# Title", "{{ Content }}")
+        self.assertEqual(html, "<div><h1 id='title'>Title</h1></div>")
+
+
+class TestMetadataIndex(unittest.TestCase):
+    def index(self):
+        index = MetadataIndex()
+        index.add("blog/index.md", (1,), "Blog", {})
+        index.add("blog/a.md", (1,), "Alpha", {"date": "2024-01-01"})
+        index.add("blog/b.md", (1,), "Beta", {"date": "2024-03-01"})
+        index.add("blog/c.md", (1,), "Gamma", {})
+        index.add("about.md", (1,), "About", {"title": "About us"})
+        return index
+
+    def test_sections(self):
+        pages = list(self.index().sections(2))
+        self.assertListEqual(
+            [p.output for p in pages],
+            ["page/1/index.html", "blog/page/2/index.html", "blog/page/1/index.html"],
+        )
+        self.assertListEqual([e.title for e in pages[0].entries], ["About us"])
+        # the newest page holds what is left over from full pages of the oldest
+        self.assertListEqual([e.title for e in pages[1].entries], ["Beta"])
+        self.assertListEqual([e.title for e in pages[2].entries], ["Alpha", "Gamma"])
+        self.assertEqual(
+            pages[1].markdown(),
+            "# Blog\n\n- [Beta](/blog/b.html) (2024-03-01)\n\nPage 2 | [Older](/blog/page/1/)\n",
+        )
+        self.assertEqual(
+            pages[2].markdown(),
+            "# Blog\n\n- [Alpha](/blog/a.html) (2024-01-01)\n- [Gamma](/blog/c.html)\n"
+            "\n[Newer](/blog/page/2/) | Page 1\n",
+        )
+        by_title = list(self.index().sections(3, "title"))
+        self.assertListEqual([e.title for e in by_title[1].entries], ["Alpha", "Beta", "Gamma"])
+
+    def test_older_pages_stable(self):
+        index = self.index()
+        before = {p.output: p.markdown() for p in index.sections(2)}
+        index.add("blog/d.md", (1,), "Delta", {"date": "2024-04-01"})
+        after = {p.output: p.markdown() for p in index.sections(2)}
+        self.assertEqual(after["blog/page/1/index.html"], before["blog/page/1/index.html"])
+        self.assertNotEqual(after["blog/page/2/index.html"], before["blog/page/2/index.html"])
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "metadata.json")
+            index = self.index()
+            index.outputs = {"page/1/index.html": "key"}
+            index.save(path)
+            loaded = MetadataIndex.load(path)
+            self.assertTrue(loaded.current("blog/a.md", (1,)))
+            self.assertFalse(loaded.current("blog/a.md", (2,)))
+            self.assertEqual(loaded.outputs, index.outputs)
+            with open(path, "w") as f:
+                f.write("{")
+            self.assertEqual(MetadataIndex.load(path).pages, {})
+
+
+class TestSectionBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp.name)
+        (self.root / "content" / "blog").mkdir(parents=True)
+        (self.root / "content" / "blog" / "index.md").write_text("# Blog")
+        for day in range(1, 6):
+            self.post(day)
+        (self.root / "template.html").write_text("<title>{{ Title }}</title>{{ Content }}")
+        self.options = BuildOptions(section_pages=2, cache_dir=str(self.root / "cache"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def post(self, day):
+        path = self.root / "content" / "blog" / f"post{day}.md"
+        path.write_text(f"---\ndate: 2024-01-0{day}\n---\n# Post {day}\n")
+
+    def build(self):
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            generate_pages_recursive(
+                self.root / "content",
+                self.root / "template.html",
+                self.root / "public",
+                self.options,
+            )
+        return [line for line in log.getvalue().splitlines() if "section page" in line]
+
+    def build_in_process(self, seed):
+        """Builds with inlined assets in a new process, with its own string hashes."""
+        code = (
+            "import pathlib, sys\n"
+            "from config import BuildOptions\n"
+            "from generate_webpages import generate_pages_recursive\n"
+            "root = pathlib.Path(sys.argv[1])\n"
+            "options = BuildOptions(section_pages=2, cache_dir=str(root / 'cache'),\n"
+            "    inline_assets_below=1024, assets_dir=str(root / 'static'))\n"
+            "generate_pages_recursive(\n"
+            "    root / 'content', root / 'template.html', root / 'public', options)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code, str(self.root)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return [line for line in result.stdout.splitlines() if "section page" in line]
+
+    def test_only_changed_listings_rendered(self):
+        self.assertEqual(len(self.build()), 3)
+        newest = (self.root / "public" / "blog" / "page" / "3" / "index.html").read_text()
+        self.assertIn("<a href='/blog/post5.html'>Post 5</a>", newest)
+        self.assertIn("<a href='/blog/page/2/'>Older</a>", newest)
+        self.assertEqual(self.build(), [])
+
+        # a new post only lands on the newest page
+        self.post(6)
+        self.assertEqual(self.build(), ["Generating section page blog/page/3/index.html"])
+
+    def test_inlined_assets_key_stable_across_runs(self):
+        (self.root / "static").mkdir()
+        (self.root / "static" / "logo.svg").write_text("<svg></svg>")
+        self.assertEqual(len(self.build_in_process("1")), 3)
+        self.assertEqual(self.build_in_process("2"), [])
+
+    def test_newest_post_starting_a_page(self):
+        self.post(6)
+        self.assertEqual(len(self.build()), 3)
+        # the page before the new one gains a link to it; older pages are left alone
+        self.post(7)
+        self.assertEqual(
+            self.build(),
+            [
+                "Generating section page blog/page/4/index.html",
+                "Generating section page blog/page/3/index.html",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
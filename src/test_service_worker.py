@@ -0,0 +1,86 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for the service worker and its precache manifest."""
+
+
+import contextlib
+import io
+import json
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+
+from main import main
+from service_worker import OutputDigests, register_service_worker
+
+
+class TestServiceWorker(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp.name)
+        for name, text in {
+            "content/index.md": "# Home",
+            "content/majesty/index.md": "# Majesty\n\n" + "A long page. " * 50,
+            "static/index.css": "body {}",
+            "static/images/logo.png": "png" * 1000,
+            "template.html": "<body>{{ Content }}</body>",
+        }.items():
+            (self.root / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.root / name).write_text(text)
+        (self.root / "public").mkdir()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, *argv):
+        cache = mock.patch("config.Resources._cache", str(self.root / "cache"))
+        with cache, contextlib.redirect_stdout(io.StringIO()):
+            main(
+                [
+                    f"--content={self.root / 'content'}",
+                    f"--static={self.root / 'static'}",
+                    f"--template={self.root / 'template.html'}",
+                    f"--public={self.root / 'public'}",
+                    "--service-worker",
+                    "--precache-budget=1500",
+                    *argv,
+                ]
+            )
+        return json.loads((self.root / "public" / "precache-manifest.json").read_text())
+
+    def test_budget_and_priority(self):
+        manifest = self.build()
+        self.assertListEqual([e["url"] for e in manifest["precache"]], ["/", "/index.css", "/majesty/"])
+        self.assertListEqual([e["url"] for e in manifest["runtime"]], ["/images/logo.png"])
+        worker = (self.root / "public" / "sw.js").read_text()
+        self.assertIn(json.dumps(manifest["precache"]), worker)
+        self.assertIn('register("/sw.js")</script></body>', (self.root / "public" / "index.html").read_text())
+
+        (self.root / "content" / "majesty" / "index.md").write_text("# Majesty\n\nEdited")
+        changed = self.build()
+        changes = json.loads((self.root / "cache" / "changes.json").read_text())
+        revisions = {e["url"]: e["revision"] for e in manifest["precache"]}
+        for entry in changed["precache"]:
+            self.assertEqual(entry["revision"] == revisions[entry["url"]], entry["url"] != "/majesty/")
+        self.assertListEqual(
+            changes["changed"], ["majesty/index.html", "precache-manifest.json", "sw.js"]
+        )
+        self.assertListEqual(changes["removed"], [])
+
+    def test_digests_reused_by_stat_key(self):
+        path = self.root / "public" / "a.txt"
+        path.write_text("a")
+        digests = OutputDigests(str(self.root / "digests.json"))
+        first, size = digests.digest(str(self.root / "public"), "a.txt")
+        digests.save()
+        again = OutputDigests(str(self.root / "digests.json"))
+        with mock.patch("builtins.open", side_effect=AssertionError("read")):
+            self.assertEqual(again.digest(str(self.root / "public"), "a.txt"), (first, 1))
+
+    def test_registration(self):
+        self.assertTrue(register_service_worker("<p>x</p>").endswith("</script>"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for the site-wide nav and breadcrumbs."""
+
+
+import contextlib
+import io
+import pathlib
+import tempfile
+import unittest
+
+from build_api import render_site
+from generate_webpages import generate_pages_recursive
+from site_nav import ContentHierarchy, content_hierarchy, page_url
+
+
+TITLES = {
+    "index.md": "Home",
+    "about.md": "About",
+    "majesty/index.md": "Majesty",
+    "majesty/crown.md": "Crown",
+    "notes/draft/index.md": "Draft",
+}
+
+
+class TestContentHierarchy(unittest.TestCase):
+    def test_page_urls(self):
+        self.assertEqual(page_url("index.md"), "/")
+        self.assertEqual(page_url("majesty/index.md"), "/majesty/")
+        self.assertEqual(page_url("majesty/crown.md"), "/majesty/crown.html")
+
+    def test_nav(self):
+        self.assertEqual(
+            ContentHierarchy(TITLES).nav_html(),
+            "<nav class='site-nav'><ul><li><a href='/'>Home</a><ul>"
+            "<li><a href='/about.html'>About</a></li>"
+            "<li><a href='/majesty/'>Majesty</a>"
+            "<ul><li><a href='/majesty/crown.html'>Crown</a></li></ul></li>"
+            "<li><span>notes</span>"
+            "<ul><li><a href='/notes/draft/'>Draft</a></li></ul></li>"
+            "</ul></li></ul></nav>",
+        )
+        self.assertEqual(ContentHierarchy({}).nav_html(), "")
+
+    def test_breadcrumbs(self):
+        hierarchy = ContentHierarchy(TITLES)
+        self.assertEqual(
+            hierarchy.breadcrumbs_html("majesty"),
+            "<nav class='breadcrumbs'><a href='/'>Home</a> / "
+            "<a href='/majesty/'>Majesty</a></nav>",
+        )
+        self.assertEqual(
+            hierarchy.slots("notes/draft/index.md")["{{ Breadcrumbs }}"],
+            "<nav class='breadcrumbs'><a href='/'>Home</a> / "
+            "<a href='/notes/draft/'>Draft</a></nav>",
+        )
+        self.assertEqual(ContentHierarchy({"a/b.md": "B"}).breadcrumbs_html("a"), "")
+
+    def test_rebuilt_only_when_pages_change(self):
+        first = content_hierarchy("site", dict(TITLES))
+        first.nav_html()
+        self.assertIs(content_hierarchy("site", dict(TITLES)), first)
+        renamed = content_hierarchy("site", {**TITLES, "about.md": "About us"})
+        self.assertIsNot(renamed, first)
+        self.assertIn("About us", renamed.nav_html())
+
+
+class TestSiteNavSlots(unittest.TestCase):
+    template = "<header>{{ Breadcrumbs }}</header>{{ Nav }}{{ Content }}"
+
+    def test_render_site(self):
+        pages = render_site({"index.md": "# Home", "a/index.md": "# A"}, self.template)
+        self.assertIn("<a href='/a/'>A</a>", pages["index.html"])
+        self.assertTrue(
+            pages["a/index.html"].startswith(
+                "<header><nav class='breadcrumbs'><a href='/'>Home</a> / "
+            )
+        )
+
+    def test_build(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = pathlib.Path(tmp)
+            (root / "content" / "a").mkdir(parents=True)
+            (root / "content" / "index.md").write_text("# Home")
+            (root / "content" / "a" / "page.md").write_text("# Page\n\ntext")
+            (root / "template.html").write_text(self.template)
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(
+                    root / "content", root / "template.html", root / "public"
+                )
+            html = (root / "public" / "a" / "page.html").read_text()
+            self.assertIn("<a href='/a/page.html'>Page</a>", html)
+            self.assertIn("<header><nav class='breadcrumbs'><a href='/'>Home</a></nav>", html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/python3.12
+
+"""Unit tests for reading source trees from directories and archives."""
+
+
+import io
+import pathlib
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from sources import (
+    DirectorySource,
+    TarSource,
+    UnsafeMemberError,
+    ZipSource,
+    join_spec,
+    open_source,
+    paths_to_create,
+    read_file,
+)
+
+
+FILES = {
+    "content/index.md": b"# Home",
+    "content/majesty/index.md": b"# Majesty",
+    "template.html": b"<html>{{ Content }}</html>",
+}
+
+
+class TestSources(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp.name)
+        for name, data in FILES.items():
+            (self.root / "site" / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.root / "site" / name).write_bytes(data)
+
+        with zipfile.ZipFile(self.root / "site.zip", "w") as archive:
+            for name, data in FILES.items():
+                archive.writestr(name, data)
+
+        with tarfile.open(self.root / "site.tar.gz", "w:gz") as archive:
+            archive.add(self.root / "site", arcname=".")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_open_source(self):
+        self.assertIsInstance(open_source(self.root / "site"), DirectorySource)
+        self.assertIsInstance(open_source(self.root / "site.zip"), ZipSource)
+        self.assertIsInstance(open_source(f"{self.root}/site.tar.gz!content"), TarSource)
+
+    def test_walk_is_the_same_for_every_source(self):
+        expected = ["index.md", "majesty/", "majesty/index.md"]
+        for spec in (
+            self.root / "site" / "content",
+            f"{self.root}/site.zip!content",
+            f"{self.root}/site.tar.gz!content/",
+        ):
+            with open_source(spec) as source:
+                self.assertListEqual(list(source.walk()), expected)
+                self.assertEqual(source.read_text("majesty/index.md"), "# Majesty")
+
+    def test_read_file(self):
+        self.assertEqual(
+            read_file(f"{self.root}/site.zip!template.html"), "<html>{{ Content }}</html>"
+        )
+        self.assertEqual(
+            read_file(f"{self.root}/site.tar.gz!template.html"), "<html>{{ Content }}</html>"
+        )
+        with self.assertRaises(FileNotFoundError):
+            read_file(self.root / "site.zip")
+
+    def test_join_spec(self):
+        self.assertEqual(join_spec("static", "index.css"), "static/index.css")
+        zipped = self.root / "site.zip"
+        self.assertEqual(join_spec(zipped, "index.css"), f"{zipped}!index.css")
+        self.assertEqual(join_spec(f"{zipped}!static", "index.css"), f"{zipped}!static/index.css")
+
+    def test_unsafe_member_names(self):
+        with zipfile.ZipFile(self.root / "unsafe.zip", "w") as archive:
+            archive.writestr("static/../../index.css", b"body {}")
+        with tarfile.open(self.root / "unsafe.tar", "w") as archive:
+            info = tarfile.TarInfo("/etc/index.css")
+            info.size = 7
+            archive.addfile(info, io.BytesIO(b"body {}"))
+        for source in (ZipSource(self.root / "unsafe.zip"), TarSource(self.root / "unsafe.tar")):
+            with self.assertRaises(UnsafeMemberError), source:
+                list(source.walk())
+
+    def test_paths_to_create(self):
+        with open_source(f"{self.root}/site.zip!content") as source:
+            paths = list(paths_to_create(source, "/public"))
+        self.assertListEqual(
+            paths,
+            [
+                ("index.md", "/public/index.md"),
+                ("majesty/", "/public/majesty"),
+                ("majesty/index.md", "/public/majesty/index.md"),
+            ],
+        )
+
+    def test_select_walks_only_selected_subtrees(self):
+        for spec in (f"{self.root}/site", f"{self.root}/site.zip"):
+            with open_source(spec) as source:
+                self.assertListEqual(
+                    list(source.select(["content/majesty"])),
+                    ["content/", "content/majesty/", "content/majesty/index.md"],
+                )
+                self.assertListEqual(list(source.select(["template.html"])), ["template.html"])
+                with self.assertRaises(FileNotFoundError):
+                    list(source.select(["content/missing.md"]))
+
+    def test_walk_lists_directories_before_contents(self):
+        with zipfile.ZipFile(self.root / "deep.zip", "w") as archive:
+            archive.writestr("b/c/page.md", b"")
+            archive.writestr("a.md", b"")
+            archive.writestr("b/", b"")
+        with open_source(self.root / "deep.zip") as source:
+            self.assertListEqual(list(source.walk()), ["b/", "b/c/", "b/c/page.md", "a.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
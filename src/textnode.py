@@ -6,6 +6,7 @@
 from enum import StrEnum, unique
 from typing import Callable, Iterator, NoReturn, Optional
 
+from assets import asset_source
 from htmlnode import LeafNode
 
 
@@ -17,6 +18,8 @@ class TextType(StrEnum):
     CODE = "CODE"
     LINK = "LINK"
     IMAGE = "IMAGE"
+    # html rendered as is, from a registered inline syntax
+    HTML = "HTML"
 
 
 def tt_validation(f) -> Callable:
@@ -74,10 +77,13 @@ def text_node_to_html_node(text_node: TextNode) -> LeafNode | NoReturn:
                 msg = "Invalid HTML: <img> tags must have an src attribute specified"
                 raise ValueError(msg)
             img_props: dict[str, str] = {
-                "src": text_node.url,
+                "src": asset_source(text_node.url),
                 "alt": text_node.text,
             }
             return LeafNode(tag="img", value=None, props=img_props)
 
+        case TextType.HTML.value:
+            return LeafNode(value=text_node.text)
+
         case _:
             raise ValueError("Text is not a valid text type")